@@ -0,0 +1,166 @@
+"""Run three leader-election worker processes against one database and kill the leader.
+
+Each worker is a separate Python process with its own Postgres session,
+like the bot workers cluster.py starts. Checks that:
+  - exactly one worker becomes leader, and Postgres agrees on who holds
+    the leader lock,
+  - when the leader process is killed (SIGKILL, so nothing is cleaned up)
+    its session ends, the lock is released and another worker leads,
+  - leadership doesn't flap afterwards,
+  - the front process routes every user to the same worker.
+
+    DATABASE_URL=postgres://... python -m benchmarks.cluster_failover
+"""
+import argparse
+import asyncio
+import random
+import signal
+import sys
+import time
+from typing import List, Optional
+
+import asyncpg
+
+from cluster import update_user_id
+from database.database import DATABASE_URL
+from leader import LEADER_LOCK_ID, LeaderElection
+
+NUM_WORKERS = 3
+CHECK_INTERVAL = 0.2
+
+
+# ───── WORKER PROCESS ─────
+async def run_worker():
+    """Take part in the election and report each change on stdout."""
+    election = None
+
+    async def on_elected():
+        print(f"elected {election._conn.get_server_pid()}", flush=True)
+
+    async def on_demoted():
+        print("demoted", flush=True)
+
+    election = LeaderElection(on_elected, on_demoted, check_interval=CHECK_INTERVAL)
+    election.start()
+    await asyncio.Event().wait()  # until killed
+
+
+# ───── FRONT ─────
+class WorkerProcess:
+    def __init__(self, index: int, process: asyncio.subprocess.Process):
+        self.index = index
+        self.process = process
+        self.elected = 0
+        self.demoted = 0
+        self.backend_pid: Optional[int] = None
+        self.is_leader = False
+        self._reader = asyncio.create_task(self._read())
+
+    @classmethod
+    async def spawn(cls, index: int) -> "WorkerProcess":
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.cluster_failover", "--worker", stdout=asyncio.subprocess.PIPE
+        )
+        return cls(index, process)
+
+    async def _read(self):
+        async for line in self.process.stdout:
+            event, *args = line.decode().split()
+            if event == "elected":
+                self.elected += 1
+                self.backend_pid = int(args[0])
+                self.is_leader = True
+            elif event == "demoted":
+                self.demoted += 1
+                self.is_leader = False
+        # stdout closes when the process dies.
+        self.is_leader = False
+
+    async def stop(self):
+        if self.process.returncode is None:
+            self.process.terminate()
+        await self.process.wait()
+        await self._reader
+
+
+async def wait_for(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        await asyncio.sleep(CHECK_INTERVAL / 2)
+
+
+def leaders(workers: List[WorkerProcess]) -> List[WorkerProcess]:
+    return [w for w in workers if w.is_leader]
+
+
+async def lock_holder() -> Optional[int]:
+    """Backend pid holding the leader lock, according to Postgres."""
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        # A bigint advisory key is split into classid (high half) and objid (low half).
+        return await conn.fetchval("""
+            SELECT pid FROM pg_locks
+            WHERE locktype = 'advisory' AND granted AND classid = $1 AND objid = $2
+        """, LEADER_LOCK_ID >> 32, LEADER_LOCK_ID & 0xFFFFFFFF)
+    finally:
+        await conn.close()
+
+
+async def check_failover():
+    workers = [await WorkerProcess.spawn(i) for i in range(NUM_WORKERS)]
+    try:
+        await wait_for(lambda: len(leaders(workers)) == 1)
+        # Give the followers a few more attempts to (wrongly) grab the lock.
+        await asyncio.sleep(CHECK_INTERVAL * 5)
+        assert len(leaders(workers)) == 1, "more than one leader"
+        old = leaders(workers)[0]
+        assert await lock_holder() == old.backend_pid, "Postgres has a different lock holder"
+        print(f"Worker {old.index} (pid {old.process.pid}) is leader")
+
+        # Kill the leader process outright, as if it crashed.
+        started = time.perf_counter()
+        old.process.send_signal(signal.SIGKILL)
+        await old.process.wait()
+
+        await wait_for(lambda: len(leaders(workers)) == 1)
+        new = leaders(workers)[0]
+        print(f"Worker {new.index} (pid {new.process.pid}) leads after {time.perf_counter() - started:.2f}s")
+
+        await asyncio.sleep(CHECK_INTERVAL * 5)
+        assert leaders(workers) == [new], "leadership flapped after failover"
+        assert await lock_holder() == new.backend_pid, "Postgres has a different lock holder"
+        assert sum(w.elected for w in workers) == 2
+    finally:
+        for worker in workers:
+            await worker.stop()
+
+
+def check_routing(num_users: int = 1000, updates_per_user: int = 20):
+    seen = {}
+    for _ in range(num_users * updates_per_user):
+        user_id = random.randint(1, num_users)
+        update = random.choice([
+            {"message": {"from": {"id": user_id}, "text": "💰 Balance"}},
+            {"callback_query": {"from": {"id": user_id}, "data": "bet:Heads:10"}},
+        ])
+        worker = update_user_id(update) % NUM_WORKERS
+        assert seen.setdefault(user_id, worker) == worker, f"user {user_id} moved between workers"
+    spread = [sum(1 for w in seen.values() if w == i) for i in range(NUM_WORKERS)]
+    print(f"Routing is sticky; users per worker: {spread}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        try:
+            asyncio.run(run_worker())
+        except KeyboardInterrupt:
+            pass
+    else:
+        check_routing()
+        asyncio.run(check_failover())
+        print("OK")
@@ -0,0 +1,73 @@
+"""Compare two benchmark result files and flag regressions.
+
+Works on any of the --json outputs here: every entry that has the chosen
+metric (p50_ms by default) is matched by its path in both files. Lower is
+better; a change beyond --threshold percent is flagged, and the exit
+status is 1 if anything got slower by more than that.
+
+    python -m benchmarks.compare before.json after.json [--threshold 10] [--metric p95_ms]
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+# Changes smaller than this are noise however large they are in percent.
+MIN_DELTA_MS = 0.05
+
+
+def collect(results, metric: str, path: Tuple[str, ...] = ()) -> Dict[Tuple[str, ...], float]:
+    found = {}
+    if isinstance(results, dict):
+        if isinstance(results.get(metric), (int, float)):
+            found[path] = float(results[metric])
+        for key, value in results.items():
+            found.update(collect(value, metric, path + (str(key),)))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    parser.add_argument("--metric", default="p50_ms")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before_file = json.load(f)
+    with open(args.after) as f:
+        after_file = json.load(f)
+    before = collect(before_file, args.metric)
+    after = collect(after_file, args.metric)
+
+    for name, results in (("before", before_file), ("after", after_file)):
+        env = results.get("environment", {}) if isinstance(results, dict) else {}
+        if env:
+            print(f"{name:<7} {env.get('commit') or '?'} {env.get('date', '')} {env.get('host', '')}")
+
+    regressions = improvements = 0
+    print(f"{'benchmark':<40} {'before':>10} {'after':>10} {'change':>8}  ({args.metric})")
+    for path in sorted(set(before) | set(after)):
+        name = "/".join(path)
+        if path not in before or path not in after:
+            side = "after" if path not in before else "before"
+            print(f"{name:<40} {'only in ' + side:>30}")
+            continue
+        old, new = before[path], after[path]
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        if abs(new - old) >= MIN_DELTA_MS and change > args.threshold:
+            flag = "  ❌ slower"
+            regressions += 1
+        elif abs(new - old) >= MIN_DELTA_MS and change < -args.threshold:
+            flag = "  ✅ faster"
+            improvements += 1
+        print(f"{name:<40} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%{flag}")
+
+    print(f"{regressions} regression(s), {improvements} improvement(s) beyond {args.threshold:.0f}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Benchmarks for the hot Database methods at several data scales.
+
+For each scale the suite (re)creates a scratch schema in the Postgres at
+DATABASE_URL, seeds it with generate_series, and times each method through
+a Database whose pool uses that schema. Other schemas are not touched.
+
+    scale    users      bets   pending deposits
+    small   10,000     1,000     1,000
+    medium  10,000   100,000     1,000
+    large  1,000,000 1,000,000  100,000
+
+Each method runs a fixed number of times (fewer for the ones that scan or
+settle everything); results are per call in milliseconds. Write them to
+JSON and compare two runs with benchmarks.compare:
+
+    python -m benchmarks.db_methods --scales small,medium --json before.json
+    ... change a query or index ...
+    python -m benchmarks.db_methods --scales small,medium --json after.json
+    python -m benchmarks.compare before.json after.json --threshold 15
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import asyncpg
+
+from database.database import DATABASE_URL, Database, TracedConnection, TracedPool
+
+BENCH_SCHEMA = "db_bench"
+
+# name: (users, bets, pending deposits)
+SCALES = {
+    "small": (10_000, 1_000, 1_000),
+    "medium": (10_000, 100_000, 1_000),
+    "large": (1_000_000, 1_000_000, 100_000),
+}
+
+# Tables the Database methods expect but create_tables() doesn't create.
+SCHEMA = """
+    CREATE TABLE users (
+        user_id BIGINT PRIMARY KEY,
+        full_name TEXT,
+        username TEXT,
+        balance INT DEFAULT 0,
+        referrer_id BIGINT,
+        referral_count INT DEFAULT 0,
+        referral_bonus INT DEFAULT 0,
+        referral_balance INT DEFAULT 0,
+        bonus_balance INT DEFAULT 0,
+        wagered_bonus INT DEFAULT 0,
+        wagered_referral INT DEFAULT 0,
+        welcome_shown BOOLEAN DEFAULT FALSE
+    );
+    CREATE TABLE bets (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        amount INT NOT NULL,
+        choice TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT NOW()
+    );
+    CREATE TABLE deposits (
+        id BIGSERIAL PRIMARY KEY,
+        user_id BIGINT NOT NULL,
+        transaction_id TEXT NOT NULL,
+        amount INT NOT NULL,
+        timestamp TIMESTAMP DEFAULT NOW(),
+        approved BOOLEAN DEFAULT FALSE,
+        applied BOOLEAN DEFAULT FALSE
+    );
+    CREATE TABLE admin_profit (
+        id SERIAL PRIMARY KEY,
+        hour TIMESTAMP,
+        profit BIGINT DEFAULT 0
+    );
+"""
+
+SEED_BETS = """
+    INSERT INTO bets (user_id, amount, choice, timestamp)
+    SELECT 1 + (i * 7919) % $1, 10 * (1 + i % 50),
+           CASE WHEN i % 2 = 0 THEN 'Heads' ELSE 'Tails' END,
+           NOW() - (i % 3600) * INTERVAL '1 second'
+    FROM generate_series(1, $2) AS i
+"""
+
+
+async def create_schema(dsn: str, users: int, bets: int, deposits: int):
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        await conn.execute(f"SET search_path TO {BENCH_SCHEMA}")
+        await conn.execute(SCHEMA)
+        await conn.execute("""
+            INSERT INTO users (user_id, full_name, balance)
+            SELECT i, 'User ' || i, 1000 FROM generate_series(1, $1) AS i
+        """, users)
+        await conn.execute(SEED_BETS, users, bets)
+        # Half of the deposits are still waiting for approval.
+        await conn.execute("""
+            INSERT INTO deposits (user_id, transaction_id, amount, approved, applied)
+            SELECT 1 + (i * 104729) % $1, 'pay_seed' || lpad(i::text, 10, '0'), 100, i % 2 = 0, i % 2 = 0
+            FROM generate_series(1, $2 * 2) AS i
+        """, users, deposits)
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+
+async def drop_schema(dsn: str):
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    finally:
+        await conn.close()
+
+
+async def open_database(dsn: str) -> Database:
+    database = Database()
+    database.pool = TracedPool(await asyncpg.create_pool(
+        dsn, min_size=2, max_size=10, connection_class=TracedConnection,
+        server_settings={"search_path": BENCH_SCHEMA},
+    ))
+    await database.create_tables()
+    return database
+
+
+async def time_calls(call: Callable[[int], Awaitable], iterations: int,
+                     before: Callable[[int], Awaitable] = None) -> Dict:
+    """Run `call(i)` sequentially; `before(i)` runs untimed first."""
+    samples: List[float] = []
+    for i in range(iterations):
+        if before is not None:
+            await before(i)
+        started = time.perf_counter()
+        await call(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": sum(samples) / len(samples),
+        "min_ms": samples[0],
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(int(len(samples) * 0.95), len(samples) - 1)],
+    }
+
+
+async def run_scale(dsn: str, scale: str, repeat: float) -> Dict[str, Dict]:
+    users, bets, deposits = SCALES[scale]
+    print(f"── {scale}: seeding {users:,} users, {bets:,} bets, {deposits:,} pending deposits")
+    started = time.perf_counter()
+    await create_schema(dsn, users, bets, deposits)
+    print(f"   seeded in {time.perf_counter() - started:.1f}s")
+
+    database = await open_database(dsn)
+    rng = random.Random(42)
+    light, heavy = max(int(500 * repeat), 1), max(int(5 * repeat), 1)
+    run_id = os.urandom(3).hex()
+    results = {}
+
+    async def reseed_bets(_):
+        await database.pool.execute("TRUNCATE bets")
+        await database.pool.execute(SEED_BETS, users, bets)
+
+    cases = [
+        ("get_balance", lambda i: database.get_balance(rng.randint(1, users)), light, None),
+        ("get_withdrawal_eligibility", lambda i: database.get_withdrawal_eligibility(rng.randint(1, users)),
+         light, None),
+        ("get_bet_summary", lambda i: database.get_bet_summary(), light // 5, None),
+        ("record_bet", lambda i: database.record_bet(rng.randint(1, users), 10, "Heads"), light, None),
+        ("record_deposit", lambda i: database.record_deposit(
+            rng.randint(1, users), f"pay_{run_id}{i:08d}", 100), light, None),
+        ("get_pending_deposits", lambda i: database.get_pending_deposits(), heavy, None),
+        ("get_all_user_ids", lambda i: database.get_all_user_ids(), heavy, None),
+        # Settles (and deletes) every bet, so each run starts from a fresh seed.
+        ("approve_result", lambda i: database.approve_result("Heads"), heavy, reseed_bets),
+    ]
+    try:
+        for name, call, iterations, before in cases:
+            results[name] = await time_calls(call, iterations, before)
+            stats = results[name]
+            print(f"   {name:<22} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms  "
+                  f"({iterations} calls)")
+    finally:
+        await database.close()
+    return results
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "host": platform.node(),
+    }
+
+
+async def run(scales: List[str], repeat: float) -> Dict:
+    results = {"environment": environment(), "scales": {}}
+    conn = await asyncpg.connect(DATABASE_URL)
+    results["environment"]["postgres"] = conn.get_server_version().major
+    await conn.close()
+    for scale in scales:
+        results["scales"][scale] = await run_scale(DATABASE_URL, scale, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated: {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=float, default=1.0, help="scale the number of calls per method")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {BENCH_SCHEMA} schema afterwards")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if not DATABASE_URL:
+        sys.exit("DATABASE_URL is not set; point it at a local Postgres.")
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        sys.exit(f"Unknown scale(s): {', '.join(unknown)}")
+
+    results = asyncio.run(run(scales, args.repeat))
+    if not args.keep:
+        asyncio.run(drop_schema(DATABASE_URL))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
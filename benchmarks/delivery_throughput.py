@@ -0,0 +1,83 @@
+"""Broadcast and notification delivery against the fake Bot API.
+
+Sends one message to each of N chats through messaging.deliver_all (the
+path broadcasts and settlement notifications share: the global token
+bucket, RetryAfter pauses, retries) with a real Bot and CountingRequest,
+pointed at benchmarks.fake_bot_api. The fake API enforces Telegram's
+global send limit with 429s and has a share of users who blocked the bot.
+
+Reports delivered messages per second, how many sends were answered 429,
+and checks that every chat that didn't block the bot got exactly one
+message.
+
+    python -m benchmarks.delivery_throughput [--chats 2000] [--rate 30] [--limiter 25] [--blocked 0.05]
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import sys
+import time
+
+from telegram import Bot
+
+from benchmarks.fake_bot_api import FakeBotApi
+from messaging import CountingRequest, TokenBucket, deliver_all
+
+TOKEN = "123456:DELIVERY"
+FIRST_CHAT_ID = 5_000_000
+
+
+async def run(args) -> bool:
+    api = await FakeBotApi(latency=args.latency / 1000, global_rate=args.rate,
+                           retry_after_rate=args.retry_after_rate, blocked_fraction=args.blocked,
+                           seed=1).start()
+    bot = Bot(TOKEN, base_url=api.base_url, request=CountingRequest(connection_pool_size=256))
+    await bot.initialize()
+
+    chats = range(FIRST_CHAT_ID, FIRST_CHAT_ID + args.chats)
+    messages = {chat_id: f"📢 Round settled: Heads wins. (#{chat_id})" for chat_id in chats}
+    limiter = TokenBucket(args.limiter)
+    started = time.perf_counter()
+    sent, failed = await deliver_all(bot, messages, concurrency=args.concurrency, limiter=limiter)
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+    await api.stop()
+
+    received = collections.Counter(int(params["chat_id"]) for params in api.sent("sendMessage"))
+    blocked = [chat_id for chat_id in chats if api.is_blocked(chat_id)]
+    missing = [chat_id for chat_id in chats if not api.is_blocked(chat_id) and received[chat_id] == 0]
+    duplicated = [chat_id for chat_id, count in received.items() if count > 1]
+
+    print(f"{args.chats} chats: {sent} delivered, {failed} failed in {elapsed:.1f}s "
+          f"({sent / elapsed:.1f} messages/s; limiter {args.limiter:g}/s, API limit {args.rate or 0:g}/s)")
+    print(f"Sends answered 429: {api.count('sendMessage', 429)}, "
+          f"403 blocked: {api.count('sendMessage', 403)} ({len(blocked)} blocked chats)")
+    ok = not missing and not duplicated and failed == len(blocked)
+    if missing:
+        print(f"❌ {len(missing)} chat(s) never got their message, e.g. {missing[:5]}")
+    if duplicated:
+        print(f"❌ {len(duplicated)} chat(s) got the message more than once, e.g. {duplicated[:5]}")
+    if ok:
+        print("✅ Every reachable chat got exactly one message")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--limiter", type=float, default=25, help="our sends per second (TELEGRAM_GLOBAL_RATE)")
+    parser.add_argument("--rate", type=float, default=30, help="fake API's sends per second before 429s (0: none)")
+    parser.add_argument("--retry-after-rate", type=float, default=0, help="fraction of sends answered 429 anyway")
+    parser.add_argument("--blocked", type=float, default=0.05, help="fraction of chats that blocked the bot")
+    parser.add_argument("--latency", type=float, default=40, help="ms per Bot API call")
+    args = parser.parse_args()
+    args.rate = args.rate or None
+    # One warning per blocked chat would drown the report.
+    logging.getLogger("messaging").setLevel(logging.ERROR)
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Per-update cost of routing a menu button.
+
+Compares the old chain of one MessageHandler per button (checked in turn
+until one matches) with the single ButtonRouter dispatch table.
+
+    python -m benchmarks.dispatch_cost [iterations]
+"""
+import random
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import MessageHandler, filters
+
+from router import ButtonRouter
+
+
+async def noop(update, context):
+    pass
+
+
+# The handler chain bot.main registered before the router, in order.
+OLD_CHAIN = [
+    MessageHandler(filters.Regex("^Start$"), noop),
+    MessageHandler(filters.Text("🔐 Admin"), noop),
+    MessageHandler(filters.Text("👥 Users & Balances"), noop),
+    MessageHandler(filters.Text("💰 Balance"), noop),
+    MessageHandler(filters.Text("🕘 History"), noop),
+    MessageHandler(filters.Text("🔗 Referral Program"), noop),
+    MessageHandler(filters.Text("🛠 Service"), noop),
+    MessageHandler(filters.TEXT & filters.Regex("^✅ Approve Deposits$"), noop),
+    MessageHandler(filters.TEXT & filters.Regex("^💸 Approve Withdrawals$"), noop),
+    MessageHandler(filters.TEXT & filters.Regex("^👥 View Users & Balances$"), noop),
+    MessageHandler(filters.TEXT & filters.Regex("^📊 View Admin Profit$"), noop),
+    MessageHandler(filters.TEXT & filters.Regex("^🕒 View Recent Bets$"), noop),
+    MessageHandler(filters.TEXT & filters.Regex("^🔙 Back to Menu$"), noop),
+    MessageHandler(filters.Regex("🧮 View Bet Summary"), noop),
+]
+
+BUTTONS = [
+    "Start", "🔐 Admin", "👥 Users & Balances", "💰 Balance", "🕘 History", "🔗 Referral Program",
+    "🛠 Service", "✅ Approve Deposits", "💸 Approve Withdrawals", "👥 View Users & Balances",
+    "📊 View Admin Profit", "🕒 View Recent Bets", "🔙 Back to Menu", "🧮 View Bet Summary",
+]
+
+
+def make_update(text: str) -> Update:
+    return Update.de_json({
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }, None)
+
+
+def route_chain(update: Update):
+    for handler in OLD_CHAIN:
+        if handler.check_update(update):
+            return handler
+    return None
+
+
+def route_table(router: ButtonRouter, handler: MessageHandler, update: Update):
+    if handler.check_update(update):
+        return router.routes[update.message.text]
+    return None
+
+
+def measure(label: str, fn, updates) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        fn(update)
+    per_update = (time.perf_counter() - started) / len(updates) * 1e6
+    print(f"{label:<22} {per_update:7.2f} µs/update")
+    return per_update
+
+
+def main(iterations: int):
+    # Mostly menu buttons, plus free text (bet amounts) that matches nothing.
+    texts = BUTTONS + ["250", "pay_ABCDEFGHIJKLMN"]
+    updates = [make_update(random.choice(texts)) for _ in range(iterations)]
+    router = ButtonRouter({text: noop for text in BUTTONS})
+    handler = router.handler()
+
+    chain = measure("Handler chain", route_chain, updates)
+    table = measure("Dispatch table", lambda u: route_table(router, handler, u), updates)
+    print(f"Speed-up: {chain / table:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
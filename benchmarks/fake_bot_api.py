@@ -0,0 +1,305 @@
+"""A local stand-in for the Telegram Bot API.
+
+Answers the methods the bot uses (getMe, sendMessage, editMessageText,
+answerCallbackQuery, getUpdates, setWebhook, ...) the way Telegram does,
+including its error responses, so python-telegram-bot raises the same
+RetryAfter and Forbidden errors it would in production. Everything the
+bot calls is recorded.
+
+Knobs:
+    latency, jitter     seconds added to every call (latency ± jitter)
+    global_rate         sends per second across all chats before answering
+                        429 with a retry_after, like Telegram's ~30/s limit
+    retry_after_rate    fraction of sends answered 429 at random
+    blocked             chat ids that answer 403 "bot was blocked by the user"
+    blocked_fraction    fraction of all chat ids that are blocked
+
+Point the bot at it with TELEGRAM_API_URL=http://127.0.0.1:<port>, or in
+process with Application.builder().base_url(api.base_url). Updates can be
+fed to the bot through getUpdates (queue_update) or, once the bot has
+called setWebhook, posted to its webhook (push_update).
+
+Standalone, for a bot in another process:
+
+    python -m benchmarks.fake_bot_api --port 8081 --latency 30 --rate 30 --blocked-fraction 0.05
+
+GET /_fake/calls returns the recorded calls, POST /_fake/updates queues
+or pushes an update, POST /_fake/reset clears the record.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+BOT_INFO = {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+# Calls that deliver something to a chat and count against flood limits.
+SEND_METHODS = frozenset({
+    "sendMessage", "editMessageText", "sendPhoto", "sendDocument", "forwardMessage", "copyMessage",
+})
+
+
+class FakeBotApi:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, global_rate: Optional[float] = None,
+                 retry_after_rate: float = 0.0, retry_after: int = 1, blocked: Iterable[int] = (),
+                 blocked_fraction: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.global_rate = global_rate
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.blocked = set(blocked)
+        self.blocked_fraction = blocked_fraction
+        self._random = random.Random(seed)
+
+        # Every call: {"method", "params", "status", "at"}.
+        self.calls: List[Dict] = []
+        self.counts: Dict[str, Dict[int, int]] = {}
+        self._message_id = 0
+        self._tokens = global_rate or 0.0
+        self._refilled = time.monotonic()
+        self._changed = asyncio.Condition()
+
+        self._updates: List[Dict] = []
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+
+        self.host = "127.0.0.1"
+        self.port = None
+        self._runner: Optional[web.AppRunner] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    # ───── LIFECYCLE ─────
+    @property
+    def api_url(self) -> str:
+        """Value for TELEGRAM_API_URL."""
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def base_url(self) -> str:
+        """Value for ApplicationBuilder.base_url()."""
+        return f"{self.api_url}/bot"
+
+    def web_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/_fake/calls", self._calls_endpoint)
+        app.router.add_post("/_fake/updates", self._updates_endpoint)
+        app.router.add_post("/_fake/reset", self._reset_endpoint)
+        return app
+
+    async def start(self, port: int = 0, host: str = "127.0.0.1") -> "FakeBotApi":
+        self.host = host
+        self._runner = web.AppRunner(self.web_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def reset(self):
+        self.calls.clear()
+        self.counts.clear()
+
+    # ───── RECORDED CALLS ─────
+    def sent(self, method: str = "sendMessage") -> List[Dict]:
+        """Params of every successful `method` call, in order."""
+        return [call["params"] for call in self.calls if call["method"] == method and call["status"] == 200]
+
+    def count(self, method: str, status: Optional[int] = None) -> int:
+        by_status = self.counts.get(method, {})
+        return sum(by_status.values()) if status is None else by_status.get(status, 0)
+
+    async def wait_for(self, method: str, count: int = 1, timeout: float = 30) -> None:
+        """Wait until `method` has succeeded `count` times."""
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(lambda: self.count(method, 200) >= count), timeout)
+
+    # ───── UPDATES ─────
+    def queue_update(self, update: Dict):
+        """Hand `update` to the bot's next getUpdates call."""
+        self._updates.append(update)
+        asyncio.ensure_future(self._notify())
+
+    async def push_update(self, update: Dict) -> int:
+        """POST `update` to the webhook the bot registered; returns the status."""
+        if self.webhook_url is None:
+            raise RuntimeError("The bot hasn't called setWebhook")
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+        async with self._session.post(self.webhook_url, data=json.dumps(update).encode(),
+                                      headers={"Content-Type": "application/json", **headers}) as resp:
+            return resp.status
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    # ───── BOT API ─────
+    def is_blocked(self, chat_id: int) -> bool:
+        if chat_id in self.blocked:
+            return True
+        # Stable per chat, so a blocked user stays blocked across retries.
+        return bool(self.blocked_fraction) and zlib.crc32(str(chat_id).encode()) % 10000 < self.blocked_fraction * 10000
+
+    def _flood_wait(self) -> int:
+        """Seconds to retry after if this send is over the limit, else 0."""
+        if self.retry_after_rate and self._random.random() < self.retry_after_rate:
+            return self.retry_after
+        if not self.global_rate:
+            return 0
+        now = time.monotonic()
+        self._tokens = min(self.global_rate, self._tokens + (now - self._refilled) * self.global_rate)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return max(1, math.ceil((1 - self._tokens) / self.global_rate))
+
+    async def _params(self, request: web.Request) -> Dict:
+        if request.content_type == "application/json":
+            params = await request.json() if request.can_read_body else {}
+        else:
+            params = dict(await request.post())
+        # python-telegram-bot sends nested objects (reply_markup, entities) as JSON strings.
+        for key, value in params.items():
+            if isinstance(value, str) and value.startswith(("{", "[")):
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    pass
+        return params
+
+    def _message(self, params: Dict) -> Dict:
+        self._message_id += 1
+        chat_id = params.get("chat_id", 0)
+        return {
+            "message_id": int(params.get("message_id") or self._message_id),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "private"},
+            "from": BOT_INFO,
+            "text": params.get("text", ""),
+        }
+
+    async def _result(self, method: str, params: Dict):
+        if method == "getMe":
+            return BOT_INFO
+        if method in SEND_METHODS:
+            return self._message(params)
+        if method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            if offset:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            if not self._updates:
+                # Long polling: hold the request until an update arrives.
+                try:
+                    async with self._changed:
+                        await asyncio.wait_for(self._changed.wait_for(lambda: bool(self._updates)),
+                                               float(params.get("timeout") or 0))
+                except asyncio.TimeoutError:
+                    pass
+            return self._updates[:int(params.get("limit") or 100)]
+        if method == "setWebhook":
+            self.webhook_url = params.get("url") or None
+            self.webhook_secret = params.get("secret_token") or None
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = self.webhook_secret = None
+            return True
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": 0}
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        status, body = 200, None
+        if method in SEND_METHODS:
+            chat_id = params.get("chat_id")
+            if chat_id is not None and str(chat_id).lstrip("-").isdigit() and self.is_blocked(int(chat_id)):
+                status = 403
+                body = {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            else:
+                retry_after = self._flood_wait()
+                if retry_after:
+                    status = 429
+                    body = {"ok": False, "error_code": 429,
+                            "description": f"Too Many Requests: retry after {retry_after}",
+                            "parameters": {"retry_after": retry_after}}
+        if body is None:
+            body = {"ok": True, "result": await self._result(method, params)}
+
+        self.calls.append({"method": method, "params": params, "status": status, "at": time.time()})
+        by_status = self.counts.setdefault(method, {})
+        by_status[status] = by_status.get(status, 0) + 1
+        await self._notify()
+        return web.json_response(body, status=status)
+
+    # ───── CONTROL ENDPOINTS ─────
+    async def _calls_endpoint(self, request: web.Request) -> web.Response:
+        return web.json_response({"counts": self.counts, "calls": self.calls})
+
+    async def _updates_endpoint(self, request: web.Request) -> web.Response:
+        update = await request.json()
+        if self.webhook_url:
+            return web.json_response({"webhook_status": await self.push_update(update)})
+        self.queue_update(update)
+        return web.json_response({"queued": True})
+
+    async def _reset_endpoint(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({"ok": True})
+
+
+async def serve(args):
+    api = await FakeBotApi(latency=args.latency / 1000, jitter=args.jitter / 1000, global_rate=args.rate,
+                           retry_after_rate=args.retry_after_rate, retry_after=args.retry_after,
+                           blocked=args.blocked, blocked_fraction=args.blocked_fraction,
+                           seed=args.seed).start(args.port, args.host)
+    print(f"Fake Bot API on {api.api_url} (TELEGRAM_API_URL={api.api_url})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0, help="ms per call")
+    parser.add_argument("--jitter", type=float, default=0, help="± ms per call")
+    parser.add_argument("--rate", type=float, default=None, help="global sends per second before 429s")
+    parser.add_argument("--retry-after-rate", type=float, default=0, help="fraction of sends answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="seconds in injected 429s")
+    parser.add_argument("--blocked", type=int, nargs="*", default=[], help="chat ids that blocked the bot")
+    parser.add_argument("--blocked-fraction", type=float, default=0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
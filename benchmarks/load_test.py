@@ -0,0 +1,302 @@
+"""Simulated-traffic load test of the real bot.
+
+Builds the Application the way bot.main() does (per-user processor,
+persistence, guard middleware, every handler) against the fake Bot API
+in benchmarks.fake_bot_api and the Postgres in DATABASE_URL, then runs N
+virtual users. Each user starts the bot and then loops through a weighted mix of
+flows, waiting for the bot to finish each update plus a think time:
+
+    balance     "💰 Balance", sometimes several taps in a row
+    bet         "🎯 Place a Bet" → game → amount → side
+    quick_bet   an inline ₹10-₹500 button of a random game
+    deposit     "📥 Deposit" → amount → payment id
+    withdraw    "📤 Withdraw" → amount → UPI id
+    history     "🕘 History"
+
+At --storm-at seconds every user also fires a burst of quick bets at once,
+like the last seconds before a round closes.
+
+Reports throughput, latency percentiles (update queued → handlers done)
+overall and per flow, updates dropped by flood control or load shedding,
+and DB pool saturation sampled every 100 ms.
+
+Writes to the database in DATABASE_URL: use a scratch database. Virtual
+users have ids from LOAD_USER_ID_BASE up and are topped up to ₹5000 at
+the start of each run.
+
+    python -m benchmarks.load_test [--users 200] [--duration 60] [--storm-at 45] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from benchmarks.fake_bot_api import FakeBotApi
+from bot import register_handlers
+from config import PERSISTENCE_FLUSH_INTERVAL, UPDATE_WORKERS
+from database.database import DB_POOL_MAX_SIZE, db
+from database.persistence import PostgresPersistence
+from games import DEFAULT_GAME, GAMES
+from messaging import CountingRequest
+from metrics import instrument
+from middleware import guard, load_monitor, stats
+from update_processor import PerUserUpdateProcessor
+
+TOKEN = "123456:LOADTEST"
+LOAD_USER_ID_BASE = 9_100_000_000
+SEED_BALANCE = 5000
+
+# Relative weights of the flows a user picks between.
+MIX = {"balance": 35, "bet": 20, "quick_bet": 20, "deposit": 8, "withdraw": 5, "history": 12}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def latency_summary(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50) * 1000,
+        "p95": percentile(values, 95) * 1000,
+        "p99": percentile(values, 99) * 1000,
+        "max": max(values) * 1000,
+    }
+
+
+# ───── HARNESS ─────
+class TimedProcessor(PerUserUpdateProcessor):
+    """Resolves each update's future once all its handlers have run."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting: Dict[int, asyncio.Future] = {}
+
+    async def do_process_update(self, update, coroutine):
+        try:
+            await super().do_process_update(update, coroutine)
+        finally:
+            future = self.waiting.pop(getattr(update, "update_id", None), None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+
+
+class LoadTest:
+    def __init__(self, app: Application, processor: TimedProcessor):
+        self.app = app
+        self.processor = processor
+        self.update_id = 0
+        self.message_id = 0
+        self.latencies: Dict[str, List[float]] = {}
+        self.pool_samples: List[tuple] = []
+
+    def _message(self, user_id: int, text: str) -> dict:
+        self.message_id += 1
+        message = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Load {user_id - LOAD_USER_ID_BASE}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return message
+
+    async def send(self, flow: str, user_id: int, text: str = None, callback_data: str = None):
+        """Queue one update and wait until the bot has handled it."""
+        self.update_id += 1
+        data = {"update_id": self.update_id}
+        if callback_data is None:
+            data["message"] = self._message(user_id, text)
+        else:
+            data["callback_query"] = {
+                "id": str(self.update_id), "chat_instance": str(user_id), "data": callback_data,
+                "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+                "message": self._message(user_id, "💰 Tap a quick bet below"),
+            }
+        done = asyncio.get_running_loop().create_future()
+        self.processor.waiting[self.update_id] = done
+        queued = time.perf_counter()
+        await self.app.update_queue.put(Update.de_json(data, self.app.bot))
+        finished = await done
+        self.latencies.setdefault(flow, []).append(finished - queued)
+
+    async def run_flow(self, flow: str, user_id: int):
+        if flow == "balance":
+            for _ in range(random.choice((1, 1, 1, 3, 6))):
+                await self.send(flow, user_id, "💰 Balance")
+        elif flow == "history":
+            await self.send(flow, user_id, "🕘 History")
+        elif flow == "bet":
+            game = random.choice(list(GAMES.values()))
+            await self.send(flow, user_id, "🎯 Place a Bet")
+            await self.send(flow, user_id, game.name)
+            await self.send(flow, user_id, str(random.choice((10, 20, 50, 100))))
+            await self.send(flow, user_id, random.choice(game.outcomes))
+        elif flow == "quick_bet":
+            game = random.choice(list(GAMES.values()))
+            await self.send(flow, user_id, callback_data=f"bet:{game.id}:{random.choice((10, 50, 100))}:"
+                                                          f"{random.choice(game.outcomes)}")
+        elif flow == "deposit":
+            await self.send(flow, user_id, "📥 Deposit")
+            await self.send(flow, user_id, str(random.choice((50, 100, 500))))
+            await self.send(flow, user_id, "pay_" + os.urandom(7).hex())
+        elif flow == "withdraw":
+            await self.send(flow, user_id, "📤 Withdraw")
+            await self.send(flow, user_id, "100")
+            if random.random() < 0.5:
+                await self.send(flow, user_id, f"load{user_id}@upi")
+            else:
+                await self.send(flow, user_id, "/cancel")
+
+    async def virtual_user(self, user_id: int, until: float, think: float):
+        await self.send("start", user_id, "/start")
+        flows, weights = zip(*MIX.items())
+        while time.perf_counter() < until:
+            await asyncio.sleep(random.expovariate(1 / think))
+            await self.run_flow(random.choices(flows, weights)[0], user_id)
+
+    async def bet_storm(self, users: List[int], delay: float, taps: int):
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self.send("storm", user_id, callback_data=f"bet:{DEFAULT_GAME}:10:{random.choice(('Heads', 'Tails'))}")
+            for user_id in users for _ in range(taps)
+        ))
+        return time.perf_counter() - started
+
+    async def sample_pool(self):
+        while True:
+            if db.pool is not None:
+                size, idle = db.pool.get_size(), db.pool.get_idle_size()
+                self.pool_samples.append((size - idle, idle, load_monitor.pool_wait_ms))
+            await asyncio.sleep(0.1)
+
+
+async def seed_users(users: List[int]):
+    async with db.pool.acquire() as conn:
+        await conn.executemany(
+            "INSERT INTO users (user_id, full_name, balance) VALUES ($1, $2, $3) "
+            "ON CONFLICT (user_id) DO UPDATE SET balance = GREATEST(users.balance, EXCLUDED.balance)",
+            [(user_id, f"Load {user_id - LOAD_USER_ID_BASE}", SEED_BALANCE) for user_id in users],
+        )
+
+
+async def run(args) -> dict:
+    api = await FakeBotApi(latency=args.api_latency / 1000, global_rate=args.api_rate or None).start()
+
+    processor = TimedProcessor(UPDATE_WORKERS)
+    app = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(api.base_url)
+        .concurrent_updates(processor)
+        .request(CountingRequest(connection_pool_size=256))
+        .persistence(PostgresPersistence(update_interval=PERSISTENCE_FLUSH_INTERVAL))
+        .build()
+    )
+    app.add_handler(TypeHandler(Update, guard), group=-2)
+    register_handlers(app)
+    instrument(app)
+    await asyncio.gather(db.connect(), app.initialize())
+    await db.create_tables()
+    load_monitor.start()
+    await app.start()
+
+    users = [LOAD_USER_ID_BASE + i for i in range(args.users)]
+    await seed_users(users)
+    test = LoadTest(app, processor)
+    sampler = asyncio.create_task(test.sample_pool())
+
+    started = time.perf_counter()
+    until = started + args.duration
+    storm = asyncio.create_task(test.bet_storm(users, args.storm_at, args.storm_taps)) if args.storm_at else None
+    await asyncio.gather(*(test.virtual_user(user_id, until, args.think) for user_id in users))
+    storm_seconds = await storm if storm else None
+    elapsed = time.perf_counter() - started
+
+    sampler.cancel()
+    await load_monitor.stop()
+    await app.stop()
+    await app.shutdown()
+    await db.close()
+    await api.stop()
+
+    all_latencies = [value for values in test.latencies.values() for value in values]
+    in_use = [sample[0] for sample in test.pool_samples] or [0]
+    waits = [sample[2] for sample in test.pool_samples]
+    return {
+        "users": args.users,
+        "duration_s": elapsed,
+        "updates": len(all_latencies),
+        "updates_per_s": len(all_latencies) / elapsed,
+        "latency_ms": {name: latency_summary(values)
+                       for name, values in sorted(test.latencies.items()) + [("all", all_latencies)] if values},
+        "storm_s": storm_seconds,
+        "throttled": stats["throttled"],
+        "shed": stats["shed"],
+        "pool": {
+            "max_size": DB_POOL_MAX_SIZE,
+            "max_in_use": max(in_use),
+            # Every connection checked out: the next acquire has to wait.
+            "saturated_pct": 100 * sum(1 for used, _, _ in test.pool_samples if used >= DB_POOL_MAX_SIZE)
+                             / max(len(test.pool_samples), 1),
+            "acquire_wait_p95_ms": percentile(waits, 95),
+        },
+        "bot_api_calls": {method: sum(by_status.values()) for method, by_status in api.counts.items()},
+        "bot_api_429s": sum(by_status.get(429, 0) for by_status in api.counts.values()),
+    }
+
+
+def report(results: dict):
+    print(f"{results['users']} users, {results['updates']} updates in {results['duration_s']:.1f}s "
+          f"({results['updates_per_s']:.0f} updates/s)")
+    print(f"{'flow':<10} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for name, latency in results["latency_ms"].items():
+        print(f"{name:<10} {latency['count']:>7} {latency['p50']:>8.1f} {latency['p95']:>8.1f} "
+              f"{latency['p99']:>8.1f} {latency['max']:>8.1f}")
+    if results["storm_s"] is not None:
+        print(f"Bet storm handled in {results['storm_s']:.2f}s")
+    print(f"Dropped: {results['throttled']} by flood control, {results['shed']} shed under load")
+    pool = results["pool"]
+    print(f"DB pool: up to {pool['max_in_use']}/{pool['max_size']} connections in use, "
+          f"saturated {pool['saturated_pct']:.0f}% of the time, acquire wait p95 {pool['acquire_wait_p95_ms']:.1f} ms")
+    print("Bot API calls: " + ", ".join(f"{method} {count}" for method, count in sorted(results["bot_api_calls"].items()))
+          + f" ({results['bot_api_429s']} answered 429)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--think", type=float, default=2.0, help="mean seconds between a user's flows")
+    parser.add_argument("--storm-at", type=float, default=45, help="seconds; 0 for no bet storm")
+    parser.add_argument("--storm-taps", type=int, default=3, help="quick bets per user in the storm")
+    parser.add_argument("--api-latency", type=float, default=30, help="ms per Bot API call")
+    parser.add_argument("--api-rate", type=float, default=0,
+                        help="Bot API sends per second before it answers 429 (0: no limit)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("DATABASE_URL is not set; point it at a scratch database.")
+    results = asyncio.run(run(args))
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Cost of logging on the event loop during an update burst.
+
+Runs a burst of concurrent fake updates, each logging three lines the
+way the handlers do (one sampled, one plain, one below LOG_LEVEL), and
+times it twice with stdout piped to a reader process:
+
+1. `print(..., flush=True)`, which is what the bot used to do, and
+2. logs.setup_logging(): QueueHandler + JSON + sampling.
+
+Reports loop time per burst (best of --rounds), the part of it spent
+logging in µs per update (against a burst that logs nothing), and how
+long the queue logger's writer thread needs afterwards to catch up. `--slow-reader`
+makes the reader sleep between reads, like a busy log shipper.
+
+The writer thread formats records off the loop but not off the GIL, so
+with a fast reader the queue logger's loop time is about print's (or a
+little more); only with a slow reader, where print blocks on the pipe,
+is it much lower.
+
+    python -m benchmarks.logging_overhead [--updates 10000] [--rounds 3] [--slow-reader]
+"""
+import argparse
+import asyncio
+import io
+import logging
+import subprocess
+import sys
+import time
+
+import logs
+
+FAST_READER = "import sys\nwhile sys.stdin.buffer.read(65536): pass"
+SLOW_READER = "import sys, time\nwhile sys.stdin.buffer.read(4096): time.sleep(0.002)"
+
+logger = logging.getLogger("benchmarks.logging_overhead")
+
+
+async def update_without_logging(user_id: int, out):
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+
+async def update_with_print(user_id: int, out):
+    print(f"User {user_id} started the bot.", file=out, flush=True)
+    await asyncio.sleep(0)
+    print(f"User registration status: User already exists ({user_id})", file=out, flush=True)
+    await asyncio.sleep(0)
+    print(f"Sending welcome message to {user_id}", file=out, flush=True)
+
+
+async def update_with_logger(user_id: int, out):
+    logger.info("User registration", extra={"user_id": user_id, "new_user": False, "sample": 100})
+    await asyncio.sleep(0)
+    logger.info("Balance shown", extra={"user_id": user_id, "balance": 30.0})
+    await asyncio.sleep(0)
+    logger.debug("Sending welcome message", extra={"user_id": user_id})
+
+
+async def burst(handler, updates: int, out) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(user_id, out) for user_id in range(updates)))
+    return time.perf_counter() - started
+
+
+def run(handler, updates: int, reader: str, use_logging: bool) -> dict:
+    proc = subprocess.Popen([sys.executable, "-c", reader], stdin=subprocess.PIPE)
+    out = io.TextIOWrapper(proc.stdin, encoding="utf-8", write_through=True)
+    try:
+        if use_logging:
+            logs.setup_logging("INFO", stream=out)
+        elapsed = asyncio.run(burst(handler, updates, out))
+        catch_up = 0.0
+        if use_logging:
+            started = time.perf_counter()
+            logs.stop_logging()
+            catch_up = time.perf_counter() - started
+    finally:
+        out.close()
+        proc.wait()
+
+    return {"loop_s": elapsed, "catch_up_s": catch_up}
+
+
+def report(label: str, result: dict, baseline: dict, updates: int):
+    overhead = max(result["loop_s"] - baseline["loop_s"], 0)
+    print(f"{label:<14} loop {result['loop_s'] * 1000:8.1f} ms/burst  "
+          f"logging {overhead / updates * 1e6:6.1f} µs/update"
+          + (f"  writer catch-up {result['catch_up_s'] * 1000:.1f} ms" if result["catch_up_s"] else ""))
+    return overhead
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--updates", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3, help="best of this many bursts each")
+    parser.add_argument("--slow-reader", action="store_true")
+    args = parser.parse_args()
+    reader = SLOW_READER if args.slow_reader else FAST_READER
+
+    print(f"{args.updates} updates, {'slow' if args.slow_reader else 'fast'} reader")
+    baseline = min((run(update_without_logging, args.updates, reader, use_logging=False)
+                    for _ in range(args.rounds)), key=lambda r: r["loop_s"])
+    printed = min((run(update_with_print, args.updates, reader, use_logging=False)
+                   for _ in range(args.rounds)), key=lambda r: r["loop_s"])
+    queued = min((run(update_with_logger, args.updates, reader, use_logging=True)
+                  for _ in range(args.rounds)), key=lambda r: r["loop_s"])
+    print(f"{'no logging':<14} loop {baseline['loop_s'] * 1000:8.1f} ms/burst")
+    printed_overhead = report("print(flush)", printed, baseline, args.updates)
+    queued_overhead = report("queue logger", queued, baseline, args.updates)
+    if printed_overhead:
+        print(f"Logging time on the event loop: {queued_overhead / printed_overhead * 100:.0f}% of print's")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Cost of the /metrics instrumentation on the update hot path.
+
+Times a no-op handler with and without the metrics.timed wrapper, then
+renders /metrics once with a realistic number of series.
+
+    python -m benchmarks.metrics_overhead [iterations]
+"""
+import asyncio
+import sys
+import time
+
+import metrics
+
+HANDLERS = ["start", "show_balance", "show_history", "bet_enter_amount", "bet_choose_side", "quick_bet"]
+
+
+async def noop(update, context):
+    pass
+
+
+async def measure(label: str, callbacks, iterations: int) -> float:
+    started = time.perf_counter()
+    for i in range(iterations):
+        await callbacks[i % len(callbacks)](None, None)
+    per_call = (time.perf_counter() - started) / iterations * 1e6
+    print(f"{label:<18} {per_call:6.2f} µs/call")
+    return per_call
+
+
+async def main(iterations: int):
+    plain = await measure("Plain handler", [noop] * len(HANDLERS), iterations)
+    timed = await measure("Timed handler", [metrics.timed(noop, name) for name in HANDLERS], iterations)
+    print(f"Overhead: {timed - plain:.2f} µs per update")
+
+    for method in ("sendMessage", "editMessageText", "answerCallbackQuery", "getUpdates"):
+        for status in (200, 400, 403, 429):
+            metrics.telegram_requests.inc(method, status)
+    started = time.perf_counter()
+    body = await metrics.render()
+    print(f"Render /metrics:   {(time.perf_counter() - started) * 1000:6.2f} ms for {len(body.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000))
@@ -0,0 +1,137 @@
+"""Settlement engine at a million bets: NumPy vs the per-bet loop.
+
+Generates a round of N bets over M users and times settling it:
+
+    loop        the per-bet Python loop approve_result used to run, plus
+                the defaultdict grouping for notifications
+    columns     settlement.settle() on the arrays approve_result now gets
+                back from Postgres (one array_agg row)
+    records     settlement.settle() on Record-like rows, the path of
+                callers that still fetch one row per bet
+    engine      settlement.settle() alone on an already loaded BetBook
+
+Checks that the loop and both loading paths agree on every user's payout and on the house P&L,
+and reports per-settlement times. --json output works with
+benchmarks.compare.
+
+    python -m benchmarks.settlement [--bets 1000000] [--users 100000] [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from settlement import PAYOUT_MULTIPLIER, BetBook, settle
+
+SIDES = ("Heads", "Tails")
+STAKES = (10, 20, 50, 100, 500)
+
+
+def generate(bets: int, users: int, seed: int = 1) -> Dict[str, List]:
+    rng = random.Random(seed)
+    return {
+        "user_ids": [rng.randint(1, users) for _ in range(bets)],
+        "amounts": [rng.choice(STAKES) for _ in range(bets)],
+        "choices": [rng.choice(SIDES) for _ in range(bets)],
+    }
+
+
+def loop_settle(records, winning_choice: str):
+    """approve_result's settlement before the engine, for comparison."""
+    winners = []
+    losers = []
+    total_losing = 0
+    for bet in records:
+        if bet["choice"] == winning_choice:
+            winners.append((bet["user_id"], bet["amount"]))
+        else:
+            total_losing += bet["amount"]
+            losers.append((bet["user_id"], bet["amount"]))
+    payouts = [(amount * PAYOUT_MULTIPLIER, user_id) for user_id, amount in winners]
+
+    staked = defaultdict(int)
+    returned = defaultdict(int)
+    for user_id, amount in winners:
+        staked[user_id] += amount
+        returned[user_id] += amount * PAYOUT_MULTIPLIER
+    for user_id, amount in losers:
+        staked[user_id] += amount
+    return payouts, total_losing, staked, returned
+
+
+def time_runs(call: Callable, repeat: int) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"runs": repeat, "min_ms": samples[0], "p50_ms": samples[len(samples) // 2], "max_ms": samples[-1]}
+
+
+def check(columns: Dict[str, List], records: List[Dict], winning_choice: str) -> List[str]:
+    problems = []
+    _, total_losing, staked, returned = loop_settle(records, winning_choice)
+    for name, book in (("columns", BetBook.from_columns(columns["user_ids"], columns["amounts"], columns["choices"])),
+                       ("records", BetBook.from_records(records))):
+        result = settle(book, winning_choice)
+        paid = dict(zip(*result.payouts()))
+        expected = {user_id: amount for user_id, amount in returned.items() if amount}
+        if paid != expected:
+            problems.append(f"{name}: payouts differ for {len(set(paid.items()) ^ set(expected.items()))} user(s)")
+        if result.losing_stake != total_losing:
+            problems.append(f"{name}: losing stake ₹{result.losing_stake}, loop says ₹{total_losing}")
+        if result.house_pnl != sum(staked.values()) - sum(returned.values()):
+            problems.append(f"{name}: house P&L ₹{result.house_pnl} doesn't match the loop")
+        if len(result) != len(staked):
+            problems.append(f"{name}: {len(result)} users settled, loop has {len(staked)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--bets", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    print(f"Generating {args.bets:,} bets over {args.users:,} users...")
+    columns = generate(args.bets, args.users)
+    records = [{"user_id": user_id, "amount": amount, "choice": choice}
+               for user_id, amount, choice in zip(columns["user_ids"], columns["amounts"], columns["choices"])]
+
+    problems = check(columns, records, "Heads")
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Engine and loop agree on every payout and on the house P&L")
+
+    book = BetBook.from_columns(columns["user_ids"], columns["amounts"], columns["choices"])
+    cases = {
+        "loop": lambda: loop_settle(records, "Heads"),
+        "columns": lambda: settle(BetBook.from_columns(columns["user_ids"], columns["amounts"],
+                                                       columns["choices"]), "Heads"),
+        "records": lambda: settle(BetBook.from_records(records), "Heads"),
+        "engine": lambda: settle(book, "Heads"),
+    }
+    results = {"bets": args.bets, "users": args.users, "settle": {}}
+    for name, call in cases.items():
+        stats = results["settle"][name] = time_runs(call, args.repeat)
+        print(f"   {name:<8} p50 {stats['p50_ms']:8.1f} ms  min {stats['min_ms']:8.1f} ms  ({args.repeat} runs)")
+    loop, vectorised = results["settle"]["loop"]["p50_ms"], results["settle"]["columns"]["p50_ms"]
+    if vectorised:
+        print(f"Columnar settlement is {loop / vectorised:.1f}x faster than the per-bet loop")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
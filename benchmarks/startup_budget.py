@@ -0,0 +1,143 @@
+"""Startup profile and the time-to-first-update budget.
+
+1. Import profile: runs `python -X importtime -c "import bot"` and lists
+   the slowest modules, and checks that modules meant to load lazily
+   (aiohttp, the admin handlers, the scheduler) stay out of startup.
+2. Time to first update: starts `bot.py` in webhook mode against the
+   fake Bot API (benchmarks.fake_bot_api), posts /start until the webhook
+   accepts it, and times process start to the bot's reply. Needs
+   DATABASE_URL; skipped otherwise.
+
+Exits with status 1 if either check fails. The budget is STARTUP_BUDGET
+in config.py (3s unless overridden).
+
+    python -m benchmarks.startup_budget [--json results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.fake_bot_api import FakeBotApi
+from config import STARTUP_BUDGET
+
+WEBHOOK_PORT = 8192
+SECRET = "startup-benchmark"
+USER_ID = 424242
+
+# Must not be imported by `import bot` (polling mode, no admin activity).
+LAZY_MODULES = ("aiohttp", "webserver", "scheduler", "handlers.admin", "handlers.admin_result", "numpy")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(top: int = 15) -> dict:
+    env = dict(os.environ, ADMIN_ID=os.getenv("ADMIN_ID", "0"))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bot"],
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import bot failed:\n{result.stderr}")
+
+    modules = {}
+    for match in IMPORTTIME_LINE.finditer(result.stderr):
+        self_us, cumulative_us, indent, name = match.groups()
+        modules[name] = {"self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000,
+                         "depth": len(indent) // 2}
+    slowest = sorted(modules.items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)
+    return {
+        "import_bot_ms": modules["bot"]["cumulative_ms"],
+        "modules_imported": len(modules),
+        "slowest": [dict(name=name, **stats) for name, stats in slowest[:top]],
+        "eagerly_imported": [name for name in LAZY_MODULES if name in modules],
+    }
+
+
+def start_update(update_id: int) -> bytes:
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Startup"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }).encode()
+
+
+async def time_to_first_update(timeout: float = 60) -> float:
+    api = await FakeBotApi().start()
+
+    env = dict(os.environ, BOT_MODE="webhook", PORT=str(WEBHOOK_PORT), WEBHOOK_SECRET=SECRET,
+               WEBHOOK_URL=f"http://127.0.0.1:{WEBHOOK_PORT}", TELEGRAM_API_URL=api.api_url,
+               BOT_TOKEN="123456:STARTUP", ADMIN_ID=os.getenv("ADMIN_ID", "0"))
+    started = time.perf_counter()
+    bot = subprocess.Popen([sys.executable, "bot.py"], env=env)
+    try:
+        async with aiohttp.ClientSession() as session:
+            url = f"http://127.0.0.1:{WEBHOOK_PORT}/telegram"
+            update_id = 0
+            while time.perf_counter() - started < timeout:
+                if bot.poll() is not None:
+                    raise RuntimeError(f"bot.py exited with {bot.returncode}")
+                update_id += 1
+                try:
+                    async with session.post(url, data=start_update(update_id),
+                                            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as resp:
+                        if resp.status == 200:
+                            break
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.05)
+            await api.wait_for("sendMessage", timeout=max(timeout - (time.perf_counter() - started), 0))
+        return time.perf_counter() - started
+    finally:
+        bot.send_signal(signal.SIGTERM)
+        try:
+            bot.wait(30)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    ok = True
+
+    profile = import_profile()
+    print(f"import bot: {profile['import_bot_ms']:.0f} ms ({profile['modules_imported']} modules)")
+    for module in profile["slowest"]:
+        print(f"  {module['cumulative_ms']:8.1f} ms  {'  ' * module['depth']}{module['name']}")
+    if profile["eagerly_imported"]:
+        print(f"❌ Imported at startup but meant to be lazy: {', '.join(profile['eagerly_imported'])}")
+        ok = False
+
+    results = {"budget_s": STARTUP_BUDGET, "imports": profile}
+    if os.getenv("DATABASE_URL"):
+        elapsed = asyncio.run(time_to_first_update())
+        results["time_to_first_update_s"] = elapsed
+        print(f"Time to first update: {elapsed:.2f}s (budget {STARTUP_BUDGET:.1f}s)")
+        if elapsed > STARTUP_BUDGET:
+            print("❌ Over the startup budget")
+            ok = False
+    else:
+        print("DATABASE_URL not set; skipping time to first update.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
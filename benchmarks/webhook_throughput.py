@@ -0,0 +1,161 @@
+"""Post recorded updates to the webhook server and measure end-to-end throughput.
+
+Runs on localhost against the fake Bot API and the Postgres in
+DATABASE_URL. The Application is built the way bot.main() builds it:
+per-user update processor, persistence, the guard middleware and every
+handler. Each update ("💰 Balance" from one of 500 seeded users) is posted
+to the bot's own aiohttp server and counts as handled once all its
+handlers have run, so the number covers the whole pipeline. Updates
+dropped by flood control or load shedding are reported separately.
+
+--transport-only swaps the bot's handlers for one that just counts, to
+measure the webhook server and update queue on their own; that number
+says nothing about handler throughput.
+
+Writes to the database in DATABASE_URL: use a scratch database.
+
+    python -m benchmarks.webhook_throughput [--updates 5000] [--concurrency 50] [--transport-only]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+from telegram import Update
+from telegram.ext import Application, MessageHandler, TypeHandler, filters
+
+from benchmarks.fake_bot_api import FakeBotApi
+from benchmarks.load_test import LOAD_USER_ID_BASE, seed_users
+from bot import register_handlers
+from config import PERSISTENCE_FLUSH_INTERVAL, UPDATE_WORKERS
+from database.database import db
+from database.persistence import PostgresPersistence
+from messaging import CountingRequest
+from metrics import instrument
+from middleware import guard, load_monitor, stats
+from update_processor import PerUserUpdateProcessor
+from webserver import SECRET_HEADER, create_web_app, start_web_server
+
+WEBHOOK_PORT = 8182
+WEBHOOK_PATH = "/telegram"
+SECRET = "benchmark-secret"
+TOKEN = "123456:BENCHMARK"
+NUM_USERS = 500
+
+
+class CountingProcessor(PerUserUpdateProcessor):
+    """Sets `all_done` once `expected` updates have been through every handler."""
+
+    def __init__(self, expected: int, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expected = expected
+        self.processed = 0
+        self.all_done = asyncio.Event()
+
+    async def do_process_update(self, update, coroutine):
+        try:
+            await super().do_process_update(update, coroutine)
+        finally:
+            self.processed += 1
+            if self.processed == self.expected:
+                self.all_done.set()
+
+
+def recorded_update(update_id: int) -> dict:
+    user_id = LOAD_USER_ID_BASE + update_id % NUM_USERS
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": "💰 Balance",
+        },
+    }
+
+
+async def handled(update, context):
+    """The --transport-only handler; CountingProcessor does the counting."""
+
+
+async def build_app(api: FakeBotApi, processor: CountingProcessor, transport_only: bool) -> Application:
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(api.base_url)
+        .concurrent_updates(processor)
+    )
+    if transport_only:
+        app = builder.build()
+        app.add_handler(MessageHandler(filters.TEXT, handled))
+        await app.initialize()
+        return app
+
+    app = (
+        builder
+        .request(CountingRequest(connection_pool_size=256))
+        .persistence(PostgresPersistence(update_interval=PERSISTENCE_FLUSH_INTERVAL))
+        .build()
+    )
+    app.add_handler(TypeHandler(Update, guard), group=-2)
+    register_handlers(app)
+    instrument(app)
+    await asyncio.gather(db.connect(), app.initialize())
+    await db.create_tables()
+    await seed_users([LOAD_USER_ID_BASE + i for i in range(NUM_USERS)])
+    load_monitor.start()
+    return app
+
+
+async def run(num_updates: int, concurrency: int, transport_only: bool):
+    api = await FakeBotApi().start()
+    processor = CountingProcessor(num_updates, UPDATE_WORKERS)
+    app = await build_app(api, processor, transport_only)
+    await app.start()
+    web_runner = await start_web_server(create_web_app(app, WEBHOOK_PATH, SECRET), WEBHOOK_PORT, "127.0.0.1")
+
+    payloads = [json.dumps(recorded_update(i)).encode() for i in range(num_updates)]
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def post(body: bytes):
+            async with semaphore:
+                async with session.post(url, data=body, headers={SECRET_HEADER: SECRET}) as resp:
+                    assert resp.status == 200, resp.status
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(body) for body in payloads))
+        posted = time.perf_counter() - started
+        await processor.all_done.wait()
+        elapsed = time.perf_counter() - started
+
+        async with session.post(url, data=payloads[0], headers={SECRET_HEADER: "wrong"}) as resp:
+            assert resp.status == 403
+
+    label = "transport only, counting handler" if transport_only else "full pipeline"
+    print(f"Posted {num_updates} updates in {posted:.2f}s")
+    print(f"Handled {processor.processed} updates in {elapsed:.2f}s "
+          f"({processor.processed / elapsed:.0f} updates/s, {label})")
+    if not transport_only:
+        print(f"Dropped by flood control: {stats['throttled']}, shed under load: {stats['shed']}")
+
+    await web_runner.cleanup()
+    await app.stop()
+    await app.shutdown()
+    if not transport_only:
+        await load_monitor.stop()
+        await db.close()
+    await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--transport-only", action="store_true",
+                        help="count updates instead of running the bot's handlers")
+    args = parser.parse_args()
+    asyncio.run(run(args.updates, args.concurrency, args.transport_only))
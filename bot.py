@@ -1,21 +1,44 @@
+import time
+
+# Taken before any other import so the startup time includes them.
+PROCESS_STARTED_AT = time.perf_counter()
+
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import (Application, CommandHandler, MessageHandler, filters, ConversationHandler, ContextTypes, CallbackQueryHandler)
+from telegram.ext import (Application, CommandHandler, MessageHandler, filters, ConversationHandler, ContextTypes, CallbackQueryHandler, TypeHandler)
 import os
 from database.database import db
-from handlers import admin_result
+from database.persistence import PostgresPersistence
 from handlers.balance import show_balance
 from handlers.history import show_history
 from handlers.service import show_service
-from config import ADMIN_ID
+from config import ADMIN_ID, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_PORT, UPDATE_WORKERS, PERSISTENCE_FLUSH_INTERVAL, DRAIN_TIMEOUT, STARTUP_BUDGET, TELEGRAM_API_URL, METRICS_PORT, MIN_WAGER_TO_WITHDRAW, check_webhook_settings
+from update_processor import PerUserUpdateProcessor
+from router import ButtonRouter, ButtonFilter, lazy
+from middleware import guard, load_monitor
+from outbox import outbox_workers
+from messaging import CountingRequest
+from metrics import instrument
+from utils import idempotency_key
+from games import DEFAULT_GAME, GAMES, game_by_name, get_game
+from risk import StakeLimitError, exposure
+from broadcast import resume_broadcasts, stop_broadcasts
+from leader import LeaderElection
+from drain import drain
 import asyncio
+import logging
+import signal
+from logs import setup_logging, stop_logging
+from tracing import setup_tracing
 
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
 
 # Define conversation states
-(DEPOSIT_AMOUNT, DEPOSIT_TXN_ID, WITHDRAW_AMOUNT, WITHDRAW_UPI_ID, BET_ENTER_AMOUNT, BET_CHOOSE_SIDE) = range(6)
+(DEPOSIT_AMOUNT, DEPOSIT_TXN_ID, WITHDRAW_AMOUNT, WITHDRAW_UPI_ID, BET_ENTER_AMOUNT, BET_CHOOSE_SIDE,
+ BET_CHOOSE_GAME) = range(7)
 AWAITING_BROADCAST_MESSAGE = range(1)
 
 # 🧭 Main Menu Keyboard
@@ -46,7 +69,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Register user and check if they are new
         is_new = await db.add_user(user_id, full_name, referrer_id)
-        print(f"User registration status: {'New user added' if is_new else 'User already exists'}")
+        logger.info("User registration", extra={"user_id": user_id, "new_user": is_new, "sample": 1 if is_new else 100})
 
         # Award referral bonus if the user is new and has a referrer
         if is_new and referrer_id:
@@ -74,8 +97,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if referrer_name:
                 welcome_message += f"\n\nYou were referred by {referrer_name}."
 
-            # Print the message to the console for debugging
-            print("Sending welcome message:", welcome_message)
+            logger.debug("Sending welcome message", extra={"user_id": user_id})
 
             # Send the welcome message
             await update.message.reply_text(welcome_message, parse_mode="Markdown")
@@ -94,8 +116,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "👋 Welcome! Choose an option:",
             reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True),
         )
-    except Exception as e:
-        print(f"Error in /start command: {e}")
+    except Exception:
+        logger.error("Error in /start command", extra={"user_id": update.effective_user.id}, exc_info=True)
 import urllib.parse
 
 async def show_referral_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -116,8 +138,8 @@ async def show_referral_code(update: Update, context: ContextTypes.DEFAULT_TYPE)
             "you'll earn a bonus."
         )
         await update.message.reply_text(message, parse_mode="Markdown")
-    except Exception as e:
-        print(f"Error in show_referral_code: {e}")
+    except Exception:
+        logger.error("Error in show_referral_code", extra={"user_id": update.effective_user.id}, exc_info=True)
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
@@ -126,296 +148,89 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             "❌ Process cancelled.",
             reply_markup=main_menu()
         )
-    except Exception as e:
-        print(f"Error in cancel command: {e}")
+    except Exception:
+        logger.error("Error in cancel command", extra={"user_id": update.effective_user.id}, exc_info=True)
     return ConversationHandler.END
 
-# Show Admin Panel
-async def show_admin_controls(update, context):
-    try:
-        context.user_data.clear()  # Clear previous data
-        user_id = update.effective_user.id
-
-        # Debugging output
-        print(f"Admin panel accessed by user ID {user_id}")
-
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized.")
-            return
-
-        keyboard = ReplyKeyboardMarkup([
-            ["✅ Approve Deposits", "💸 Approve Withdrawals"],
-            ["👥 View Users & Balances", "📊 View Admin Profit"],
-            ["🕒 View Recent Bets", "🧮 View Bet Summary"],
-            ["✅ Accept Result", "📢 Broadcast Message"],
-            ["🔙 Back to Menu"]
-        ], resize_keyboard=True)
-
-        await update.message.reply_text("🔐 Admin Control Panel", reply_markup=keyboard)
-    except Exception as e:
-        print(f"Error in show_admin_controls: {e}")
-
-async def prompt_broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized.")
-            return
-
-        await update.message.reply_text("📢 Please enter the message you want to broadcast to all users:")
-        return "AWAITING_BROADCAST_MESSAGE"
-    except Exception as e:
-        print(f"Error in prompt_broadcast_message: {e}")
-
-async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        message_text = update.message.text
-        user_ids = await db.get_all_user_ids()  # Assume this function returns a list of all user IDs
-
-        for user_id in user_ids:
-            try:
-                await context.bot.send_message(chat_id=user_id, text=message_text)
-            except Exception as e:
-                print(f"Failed to send message to user {user_id}: {e}")
-
-        await update.message.reply_text("📢 Message broadcasted to all users.")
-    except Exception as e:
-        print(f"Error in broadcast_message: {e}")
-    return ConversationHandler.END
-
-async def settle_bets(winning_choice: str):
-    try:
-        bets = await db.get_current_bets()
-        total_losing = 0
-        total_winning = 0
-
-        for bet in bets:
-            if bet["choice"] == winning_choice:
-                # User wins, admin loses
-                total_winning += bet["amount"] * 2  # Assuming a 2x payout
-            else:
-                # User loses, admin gains
-                total_losing += bet["amount"]
-
-        # Calculate net change in admin profit
-        net_change = total_losing - total_winning
-
-        # Update admin profit with the net change
-        await db.update_admin_profit(net_change)
-
-        # Clear bets after settlement
-        await db.clear_all_bets()
-
-        print(f"Result settled. Admin profit changed by ₹{net_change}.")
-    except Exception as e:
-        print(f"Error settling bets: {e}")
-
-async def accept_result_and_update_profit(winning_choice: str):
-    try:
-        # Fetch all bets
-        bets = await db.get_current_bets()
-        total_losing = 0
-
-        # Calculate total losing amount
-        for bet in bets:
-            if bet["choice"] != winning_choice:
-                total_losing += bet["amount"]
-
-        # Update admin profit with the total losing amount
-        await update_admin_profit(total_losing)
+# -------------------- 🎯 BETTING --------------------
 
-        # Clear bets after settlement
-        await db.clear_all_bets()
+# Preset stakes for one-tap betting from the inline keyboard.
+QUICK_BET_STAKES = (10, 50, 100, 500)
 
-        print(f"Result accepted. Admin profit updated by ₹{total_losing}.")
-    except Exception as e:
-        print(f"Error accepting result and updating admin profit: {e}")
+def quick_bet_keyboard(game):
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(f"₹{stake} {outcome}", callback_data=f"bet:{game.id}:{stake}:{outcome}")
+            for outcome in game.outcomes
+        ]
+        for stake in QUICK_BET_STAKES
+    ])
 
-async def update_admin_profit(losing_amount: float):
-    try:
-        async with db.pool.acquire() as conn:
-            # Ensure the admin_profit table has an entry to update
-            result = await conn.fetchrow("SELECT * FROM admin_profit WHERE id = 1")
-            if result is None:
-                await conn.execute("INSERT INTO admin_profit (id, profit) VALUES (1, 0)")
-
-            # Update the admin profit by adding the losing amount
-            await conn.execute(
-                "UPDATE admin_profit SET profit = profit + $1 WHERE id = 1",
-                losing_amount
-            )
-            print(f"Admin profit updated by ₹{losing_amount}.")
-    except Exception as e:
-        print(f"Error updating admin profit: {e}")
+def game_keyboard():
+    return ReplyKeyboardMarkup([[game.name for game in GAMES.values()]], resize_keyboard=True)
 
-async def approve_deposit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def bet_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized to approve deposits.")
-            return
-
-        if len(context.args) != 1:
-            await update.message.reply_text("❌ Please provide a valid transaction ID. Usage: /ad <transaction_id>")
-            return
-
-        transaction_id = context.args[0]
-
-        # Verify and approve the deposit
-        success, deposit_record = await db.approve_deposit_by_transaction_id(transaction_id)
-        if success:
-            deposit = dict(deposit_record)  # Convert Record to a dictionary
-            await update.message.reply_text(f"✅ Deposit with transaction ID {transaction_id} approved successfully.")
-            # Notify the user
-            await context.bot.send_message(chat_id=deposit["user_id"], text="✅ Your deposit has been approved and your balance has been updated.")
-        else:
-            await update.message.reply_text(f"❌ Failed to approve deposit with transaction ID {transaction_id}.")
-    except Exception as e:
-        await update.message.reply_text("❌ An error occurred while processing your request.")
-        print(f"Error in approve_deposit_command: {e}")
+        context.user_data.clear()  # Clear previous data
+        await update.message.reply_text("🎮 Which game do you want to play?", reply_markup=game_keyboard())
+    except Exception:
+        logger.error("Error in bet_start", extra={"user_id": update.effective_user.id}, exc_info=True)
+    return BET_CHOOSE_GAME
 
-# Show pending deposits (admin only)
-async def show_pending_deposits(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def bet_choose_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized.")
-            return
-
-        deposits = await db.get_pending_deposits()
-        if not deposits:
-            await update.message.reply_text("No pending deposits.")
-            return
+        game = game_by_name(update.message.text.strip())
+        if game is None:
+            await update.message.reply_text("❗ Please choose a game from the keyboard.", reply_markup=game_keyboard())
+            return BET_CHOOSE_GAME
 
-        for deposit in deposits:
-            message = (
-                f"User ID: {deposit['user_id']}\n"
-                f"Amount: ₹{deposit['amount']}\n"
-                f"Txn ID: {deposit['transaction_id']}\n"
-                f"To approve, use: /approve {deposit['transaction_id']}"
-            )
-            await update.message.reply_text(message)
-    except Exception as e:
-        await update.message.reply_text("❌ An error occurred while fetching pending deposits.")
+        context.user_data["bet_game"] = game.id
+        await update.message.reply_text(
+            f"{game.name}\n💰 Tap a quick bet below, or type the amount you want to bet:",
+            reply_markup=quick_bet_keyboard(game)
+        )
+    except Exception:
+        logger.error("Error in bet_choose_game", extra={"user_id": update.effective_user.id}, exc_info=True)
+    return BET_ENTER_AMOUNT
 
-async def approve_withdrawal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def quick_bet(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
     try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized to approve withdrawals.")
+        parts = query.data.split(":")
+        # Keyboards sent before games existed have no game id: coin flip.
+        if len(parts) == 3:
+            parts.insert(1, DEFAULT_GAME)
+        _, game_id, stake, side = parts
+        game = get_game(game_id)
+        amount = int(stake)
+        if game is None or amount not in QUICK_BET_STAKES or side not in game.outcomes:
+            await query.answer("❌ Invalid bet.")
             return
 
-        if len(context.args) != 1:
-            await update.message.reply_text("❌ Please provide a valid withdrawal ID. Usage: /aw <withdrawal_id>")
+        # One callback, one DB statement, one edit of the same message.
+        placed, balance = await db.place_bet(
+            update.effective_user.id, amount, side, idempotency_key(update, "quick_bet"), game.id
+        )
+        if balance is None:
+            await query.answer("❌ An error occurred while placing your bet. Please try again.")
             return
 
-        withdrawal_id = int(context.args[0])
-
-        # Verify and approve the withdrawal
-        success, withdrawal_record = await db.approve_withdrawal(withdrawal_id)
-        if success:
-            withdrawal = dict(withdrawal_record)  # Convert Record to a dictionary
-            await update.message.reply_text(f"✅ Withdrawal with ID {withdrawal_id} approved successfully.")
-            # Notify the user
-            await context.bot.send_message(chat_id=withdrawal["user_id"], text="✅ Your withdrawal has been approved and processed.")
+        if placed:
+            await query.answer(f"✅ ₹{amount} on {side} placed")
+            text = f"✅ Your bet of ₹{amount} on {side} has been placed.\n💰 Balance: ₹{balance}\n\nTap again to bet more:"
         else:
-            await update.message.reply_text(f"❌ Failed to approve withdrawal with ID {withdrawal_id}.")
-    except Exception as e:
-        await update.message.reply_text("❌ An error occurred while processing your request.")
-        print(f"Error in approve_withdrawal_command: {e}")
-
-async def show_pending_withdrawals(update, context):
-    try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized.")
-            return
-
-        withdrawals = await db.get_pending_withdrawals()
-        if not withdrawals:
-            await update.message.reply_text("No pending withdrawals.")
-            return
-
-        for wd in withdrawals:
-            message = (
-                f"User ID: {wd['user_id']}\n"
-                f"Amount: ₹{wd['amount']}\n"
-                f"UPI: {wd['upi_id']}\n"
-                f"To approve, use: /approve {wd['id']}"
-            )
-            await update.message.reply_text(message)
-    except Exception as e:
-        print(f"Error in show_pending_withdrawals: {e}")
-
-async def show_all_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized.")
-            return
-
-        users = await db.get_all_users_and_balances()
-        if not users:
-            await update.message.reply_text("No users found.")
-            return
-
-        msg = "👥 All Users & Balances:\n\n"
-        for row in users:
-            msg += f"🧑 User ID: {row['user_id']} | 💰 Balance: ₹{row['balance']}\n"
-
-        await update.message.reply_text(msg)
-    except Exception as e:
-        print(f"Error in show_all_users: {e}")
-
-async def show_admin_profit(update, context):
-    try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized.")
-            return
-
-        profit = await db.get_admin_profit()
-        await update.message.reply_text(f"📊 Total Admin Profit: ₹{profit}")
-    except Exception as e:
-        print(f"Error in show_admin_profit: {e}")
-
-async def show_recent_bets(update, context):
-    try:
-        user_id = update.effective_user.id
-        if user_id != ADMIN_ID:
-            await update.message.reply_text("❌ You are not authorized.")
-            return
-
-        bets = await db.get_recent_bets()
-        if not bets:
-            await update.message.reply_text("No recent bets in the last hour.")
-            return
-
-        msg = "🕒 Recent Bets:\n"
-        for bet in bets:
-            msg += f"🆔 {bet['user_id']} — ₹{bet['amount']} on {bet['choice']} ({bet['timestamp']})\n"
-        await update.message.reply_text(msg)
-    except Exception as e:
-        print(f"Error in show_recent_bets: {e}")
-
-# -------------------- 🎯 BETTING --------------------
-
-async def bet_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        context.user_data.clear()  # Clear previous data
-        await update.message.reply_text(
-            "💰 Please enter the amount you want to bet:",
-            reply_markup=ReplyKeyboardRemove()
-        )
-    except Exception as e:
-        print(f"Error in bet_start: {e}")
-    return BET_ENTER_AMOUNT
+            await query.answer("❌ Insufficient balance")
+            text = f"❌ Insufficient balance for ₹{amount}.\n💰 Balance: ₹{balance}\n\nPick a smaller stake:"
+        await query.edit_message_text(text, reply_markup=quick_bet_keyboard(game))
+    except StakeLimitError as e:
+        await query.answer(f"❌ {e}", show_alert=True)
+    except Exception:
+        logger.error("Error in quick_bet", extra={"user_id": update.effective_user.id}, exc_info=True)
 
 async def bet_enter_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         text = update.message.text.strip()
 
-        # Check menu options...
         if not text.isdigit():
             await update.message.reply_text("❗ Please enter a valid number.")
             return BET_ENTER_AMOUNT
@@ -437,17 +252,17 @@ async def bet_enter_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         context.user_data["bet_amount"] = amount
 
-        # Ask for Heads or Tails
-        keyboard = [["Heads", "Tails"]]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        # Ask for one of the game's outcomes
+        game = get_game(context.user_data.get("bet_game", DEFAULT_GAME))
+        reply_markup = ReplyKeyboardMarkup(game.outcome_rows(), resize_keyboard=True)
         await update.message.reply_text(
-            "🔮 Choose your side: Heads or Tails?",
+            f"🔮 Choose your side: {', '.join(game.outcomes)}?",
             reply_markup=reply_markup
         )
         return BET_CHOOSE_SIDE
 
-    except Exception as e:
-        print(f"Error in bet_enter_amount: {e}")
+    except Exception:
+        logger.error("Error in bet_enter_amount", extra={"user_id": update.effective_user.id}, exc_info=True)
         await update.message.reply_text(
             "An error occurred while processing your bet. Please try again.",
             reply_markup=main_menu()
@@ -456,34 +271,21 @@ async def bet_enter_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def bet_choose_side(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         text = update.message.text.strip()
+        game = get_game(context.user_data.get("bet_game", DEFAULT_GAME))
 
-        # Check if the user selected a new option from the main menu
-        if text == "🎯 Place a Bet":
-            await bet_start(update, context)
-            return ConversationHandler.END
-        elif text == "📥 Deposit":
-            await deposit_start(update, context)
-            return ConversationHandler.END
-        elif text == "📤 Withdraw":
-            await withdraw_start(update, context)
-            return ConversationHandler.END
-        elif text in ["💰 Balance", "🕘 History", "🛠 Service"]:
-            await start(update, context)
-            return ConversationHandler.END
-
-        if text not in ["Heads", "Tails"]:
-            await update.message.reply_text("❗ Please choose either Heads or Tails.")
+        if text not in game.outcomes:
+            await update.message.reply_text(f"❗ Please choose one of: {', '.join(game.outcomes)}.")
             return BET_CHOOSE_SIDE
 
         amount = context.user_data.get("bet_amount")
         user = update.effective_user
 
         # Place the bet using the modified record_bet function
-        success, message = await db.record_bet(user.id, amount, text)
+        success, message = await db.record_bet(user.id, amount, text, idempotency_key(update, "bet"), game.id)
 
         if success:
             await update.message.reply_text(
-                f"✅ Your bet of ₹{amount} on {text} has been placed successfully.",
+                f"✅ Your bet of ₹{amount} on {text} ({game.name}) has been placed successfully.",
                 reply_markup=main_menu()
             )
         else:
@@ -494,8 +296,8 @@ async def bet_choose_side(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         return ConversationHandler.END
 
-    except Exception as e:
-        print(f"Error in bet_choose_side: {e}")
+    except Exception:
+        logger.error("Error in bet_choose_side", extra={"user_id": update.effective_user.id}, exc_info=True)
         await update.message.reply_text(
             "❌ An error occurred while placing your bet. Please try again.",
             reply_markup=main_menu()
@@ -509,8 +311,8 @@ async def deposit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         context.user_data.clear()  # Clear previous data
         await update.message.reply_text("💵 How much would you like to deposit?    Min ₹50", reply_markup=ReplyKeyboardRemove())
-    except Exception as e:
-        print(f"Error in deposit_start: {e}")
+    except Exception:
+        logger.error("Error in deposit_start", extra={"user_id": update.effective_user.id}, exc_info=True)
     return DEPOSIT_AMOUNT
 
 # Step 2: Validate deposit amount and show payment link
@@ -518,19 +320,6 @@ async def receive_deposit_amount(update: Update, context: ContextTypes.DEFAULT_T
     try:
         text = update.message.text.strip()
 
-        # Check if the user selected a new option from the main menu
-        if text == "🎯 Place a Bet":
-            await bet_start(update, context)
-            return ConversationHandler.END
-        elif text == "📥 Deposit":
-            return DEPOSIT_AMOUNT
-        elif text == "📤 Withdraw":
-            await withdraw_start(update, context)
-            return ConversationHandler.END
-        elif text in ["💰 Balance", "🕘 History", "🛠 Service"]:
-            await start(update, context)
-            return ConversationHandler.END
-
         if not text.isdigit():
             await update.message.reply_text("❗ Please enter a valid number.")
             return DEPOSIT_AMOUNT
@@ -554,8 +343,8 @@ async def receive_deposit_amount(update: Update, context: ContextTypes.DEFAULT_T
             message,
             parse_mode="Markdown"
         )
-    except Exception as e:
-        print(f"Error in receive_deposit_amount: {e}")
+    except Exception:
+        logger.error("Error in receive_deposit_amount", extra={"user_id": update.effective_user.id}, exc_info=True)
     return DEPOSIT_TXN_ID
 
 # Step 3: Validate transaction ID and store in DB
@@ -563,19 +352,6 @@ async def receive_transaction_id(update: Update, context: ContextTypes.DEFAULT_T
     try:
         text = update.message.text.strip()
 
-        # Check if the user selected a new option from the main menu
-        if text == "🎯 Place a Bet":
-            await bet_start(update, context)
-            return ConversationHandler.END
-        elif text == "📥 Deposit":
-            return DEPOSIT_TXN_ID
-        elif text == "📤 Withdraw":
-            await withdraw_start(update, context)
-            return ConversationHandler.END
-        elif text in ["💰 Balance", "🕘 History", "🛠 Service"]:
-            await start(update, context)
-            return ConversationHandler.END
-
         if not (text.startswith("pay_") and len(text) == 18):
             await update.message.reply_text("❌ Invalid Razorpay Payment ID. It must start with `pay_` and be 18 characters long.")
             return DEPOSIT_TXN_ID
@@ -584,7 +360,7 @@ async def receive_transaction_id(update: Update, context: ContextTypes.DEFAULT_T
         user = update.effective_user
 
         # Store in DB
-        await db.record_deposit(user.id, text, amount)
+        await db.record_deposit(user.id, text, amount, idempotency_key(update, "deposit"))
 
         # Ensure proper Markdown formatting
         message = (
@@ -596,34 +372,28 @@ async def receive_transaction_id(update: Update, context: ContextTypes.DEFAULT_T
             parse_mode="Markdown",
             reply_markup=main_menu()  # Reintroduce the main menu keyboard
         )
-    except Exception as e:
-        print(f"Error in receive_transaction_id: {e}")
+    except Exception:
+        logger.error("Error in receive_transaction_id", extra={"user_id": update.effective_user.id}, exc_info=True)
     return ConversationHandler.END
 
 # -------------------- 📤 WITHDRAW --------------------
-# Function to check if the user can withdraw
-async def can_withdraw(user_id: int) -> bool:
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow("""
-            SELECT bonus_balance, referral_balance, wagered_bonus, wagered_referral
-            FROM users WHERE user_id = $1
-        """, user_id)
-
-        # Check if the user has wagered their bonus and referral amounts
-        if user['bonus_balance'] > 0 and user['wagered_bonus'] < user['bonus_balance']:
-            return False
-        if user['referral_balance'] > 0 and user['wagered_referral'] < user['referral_balance']:
-            return False
-
-        return True
+# Function to check if the user can withdraw, given db.get_withdrawal_eligibility()
+def can_withdraw(user: dict) -> bool:
+    # Check if the user has wagered their bonus and referral amounts
+    if (user['bonus_balance'] or 0) > 0 and (user['wagered_bonus'] or 0) < user['bonus_balance']:
+        return False
+    if (user['referral_balance'] or 0) > 0 and (user['wagered_referral'] or 0) < user['referral_balance']:
+        return False
+
+    return True
 
 # Step 1: Start Withdrawal
 async def withdraw_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         context.user_data.clear()  # Clear previous data
         await update.message.reply_text("💸 How much do you want to withdraw?    Min ₹100", reply_markup=ReplyKeyboardRemove())
-    except Exception as e:
-        print(f"Error in withdraw_start: {e}")
+    except Exception:
+        logger.error("Error in withdraw_start", extra={"user_id": update.effective_user.id}, exc_info=True)
     return WITHDRAW_AMOUNT
 
 # Step 2: Validate amount before asking for UPI
@@ -631,19 +401,6 @@ async def receive_withdraw_amount(update: Update, context: ContextTypes.DEFAULT_
     try:
         text = update.message.text.strip()
 
-        # Check if the user selected a new option from the main menu
-        if text == "🎯 Place a Bet":
-            await bet_start(update, context)
-            return ConversationHandler.END
-        elif text == "📥 Deposit":
-            await deposit_start(update, context)
-            return ConversationHandler.END
-        elif text == "📤 Withdraw":
-            return WITHDRAW_AMOUNT
-        elif text in ["💰 Balance", "🕘 History", "🛠 Service"]:
-            await start(update, context)
-            return ConversationHandler.END
-
         if not text.isdigit():
             await update.message.reply_text("❗ Please enter a valid number.")
             return WITHDRAW_AMOUNT
@@ -654,20 +411,31 @@ async def receive_withdraw_amount(update: Update, context: ContextTypes.DEFAULT_
             return WITHDRAW_AMOUNT
 
         user_id = update.effective_user.id
-        # Fetch main balance and total wagered amount
-        main_balance = await db.get_main_balance(user_id)
-        total_wagered = await db.get_total_wagered(user_id)
+        # Balance and wagering counters in one lookup
+        user = await db.get_withdrawal_eligibility(user_id)
+        if user is None:
+            await update.message.reply_text("❌ Could not check your account. Please try again.", reply_markup=main_menu())
+            return ConversationHandler.END
+        main_balance = float(user["balance"] or 0)
+        total_wagered = user["total_wagered"]
 
-        # Check if the user has wagered at least ₹200
-        if total_wagered < 200:
-            remaining_wager = 200 - total_wagered
+        # Check if the user has wagered at least the minimum
+        if total_wagered < MIN_WAGER_TO_WITHDRAW:
+            remaining_wager = MIN_WAGER_TO_WITHDRAW - total_wagered
             await update.message.reply_text(
-                f"❌ You need to place bets worth at least ₹200 before you can withdraw. "
+                f"❌ You need to place bets worth at least ₹{MIN_WAGER_TO_WITHDRAW} before you can withdraw. "
                 f"You need to wager ₹{remaining_wager} more.",
                 reply_markup=main_menu()  # Add the main menu keyboard
             )
             return ConversationHandler.END  # End the conversation here
 
+        if not can_withdraw(user):
+            await update.message.reply_text(
+                "❌ Your bonus and referral amounts must be wagered before you can withdraw.",
+                reply_markup=main_menu()
+            )
+            return ConversationHandler.END
+
         if amount > main_balance:
             await update.message.reply_text("❌ Insufficient balance. Your current main balance is ₹{}.".format(main_balance))
             return WITHDRAW_AMOUNT
@@ -676,8 +444,8 @@ async def receive_withdraw_amount(update: Update, context: ContextTypes.DEFAULT_
         await update.message.reply_text("💳 Enter your UPI ID for withdrawal:")
         return WITHDRAW_UPI_ID
 
-    except Exception as e:
-        print(f"Error in receive_withdraw_amount: {e}")
+    except Exception:
+        logger.error("Error in receive_withdraw_amount", extra={"user_id": update.effective_user.id}, exc_info=True)
         await update.message.reply_text(
             "❌ An error occurred. Please try again.",
             reply_markup=main_menu()
@@ -688,19 +456,6 @@ async def receive_withdraw_upi(update: Update, context: ContextTypes.DEFAULT_TYP
     try:
         text = update.message.text.strip()
 
-        # Check if the user selected a new option from the main menu
-        if text == "🎯 Place a Bet":
-            await bet_start(update, context)
-            return ConversationHandler.END
-        elif text == "📥 Deposit":
-            await deposit_start(update, context)
-            return ConversationHandler.END
-        elif text == "📤 Withdraw":
-            return WITHDRAW_UPI_ID
-        elif text in ["💰 Balance", "🕘 History", "🛠 Service"]:
-            await start(update, context)
-            return ConversationHandler.END
-
         user = update.effective_user
         amount = context.user_data.get("withdraw_amount")
 
@@ -712,109 +467,280 @@ async def receive_withdraw_upi(update: Update, context: ContextTypes.DEFAULT_TYP
             parse_mode="Markdown",
             reply_markup=main_menu()
         )
-    except Exception as e:
-        print(f"Error in receive_withdraw_upi: {e}")
+    except Exception:
+        logger.error("Error in receive_withdraw_upi", extra={"user_id": update.effective_user.id}, exc_info=True)
     return ConversationHandler.END
 
 # -------------------- 🤖 BOT INIT --------------------
+# Menu buttons that start a conversation; every other button is routed by
+# the dispatch table in register_handlers.
+CONVERSATION_BUTTONS = ["🎯 Place a Bet", "📥 Deposit", "📤 Withdraw", "✅ Accept Result", "📢 Broadcast Message"]
+
+async def end_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    # The menu router (or another conversation's entry point) in its own
+    # group answers the message; this only leaves the current conversation.
+    return ConversationHandler.END
+
+def register_handlers(app: Application):
+    # Commands
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("admin", lazy("handlers.admin:show_admin_controls")))
+    app.add_handler(CommandHandler("cancel", cancel))
+    app.add_handler(CommandHandler("ad", lazy("handlers.admin:approve_deposit_command")))
+    app.add_handler(CommandHandler("aw", lazy("handlers.admin:approve_withdrawal_command")))
+    app.add_handler(CallbackQueryHandler(quick_bet, pattern=r"^bet:"))
+
+    # Regular Messages: one dispatch table keyed by exact button text
+    menu_router = ButtonRouter({
+        "Start": start,
+        "🔐 Admin": lazy("handlers.admin:show_admin_controls"),
+        "👥 Users & Balances": lazy("handlers.admin:show_all_users"),
+        "💰 Balance": show_balance,
+        "🕘 History": show_history,
+        "🔗 Referral Program": show_referral_code,
+        "🛠 Service": show_service,
+        "✅ Approve Deposits": lazy("handlers.admin:show_pending_deposits"),
+        "💸 Approve Withdrawals": lazy("handlers.admin:show_pending_withdrawals"),
+        "👥 View Users & Balances": lazy("handlers.admin:show_all_users"),
+        "📊 View Admin Profit": lazy("handlers.admin:show_admin_profit"),
+        "🕒 View Recent Bets": lazy("handlers.admin:show_recent_bets"),
+        "🧮 View Bet Summary": lazy("handlers.admin_result:view_bet_summary"),
+        "🔙 Back to Menu": start,
+    })
+    app.add_handler(menu_router.handler())
+
+    # Any menu button, /start or /cancel leaves whatever conversation the
+    # user is in. Each conversation lives in its own group so that the same
+    # message still reaches the router or the next conversation's entry point.
+    menu_buttons = ButtonFilter(list(menu_router.routes) + CONVERSATION_BUTTONS)
+    conversation_input = filters.TEXT & ~filters.COMMAND & ~menu_buttons
+    escape_fallbacks = [
+        MessageHandler(menu_buttons, end_conversation),
+        CommandHandler(["start", "cancel"], end_conversation),
+    ]
+
+    admin_result_handler = ConversationHandler(
+        entry_points=[MessageHandler(filters.Text(["✅ Accept Result"]), lazy("handlers.admin_result:accept_result"))],
+        states={
+            "AWAITING_RESULT_GAME": [
+                MessageHandler(conversation_input, lazy("handlers.admin_result:handle_result_game"))
+            ],
+            "AWAITING_RESULT_CHOICE": [
+                MessageHandler(conversation_input, lazy("handlers.admin_result:handle_result_choice"))
+            ]
+        },
+        fallbacks=escape_fallbacks,
+        allow_reentry=True,
+        name="admin_result",
+        persistent=True,
+    )
+    app.add_handler(admin_result_handler, group=1)
+
+    # Deposit Handler
+    deposit_handler = ConversationHandler(
+        entry_points=[MessageHandler(filters.Text(["📥 Deposit"]), deposit_start)],
+        states={
+            DEPOSIT_AMOUNT: [MessageHandler(conversation_input, receive_deposit_amount)],
+            DEPOSIT_TXN_ID: [MessageHandler(conversation_input, receive_transaction_id)],
+        },
+        fallbacks=escape_fallbacks,
+        allow_reentry=True,
+        per_user=True,
+        name="deposit",
+        persistent=True,
+    )
+    app.add_handler(deposit_handler, group=2)
+
+    # Withdraw Handler
+    withdraw_handler = ConversationHandler(
+        entry_points=[MessageHandler(filters.Text(["📤 Withdraw"]), withdraw_start)],
+        states={
+            WITHDRAW_AMOUNT: [MessageHandler(conversation_input, receive_withdraw_amount)],
+            WITHDRAW_UPI_ID: [MessageHandler(conversation_input, receive_withdraw_upi)],
+        },
+        fallbacks=escape_fallbacks,
+        allow_reentry=True,
+        per_user=True,
+        name="withdraw",
+        persistent=True,
+    )
+    app.add_handler(withdraw_handler, group=3)
+
+    # Betting Handler
+    betting_handler = ConversationHandler(
+        entry_points=[MessageHandler(filters.Text(["🎯 Place a Bet"]), bet_start)],
+        states={
+            BET_CHOOSE_GAME: [MessageHandler(conversation_input, bet_choose_game)],
+            BET_ENTER_AMOUNT: [MessageHandler(conversation_input, bet_enter_amount)],
+            BET_CHOOSE_SIDE: [MessageHandler(conversation_input, bet_choose_side)],
+        },
+        fallbacks=escape_fallbacks,
+        allow_reentry=True,
+        per_user=True,
+        name="betting",
+        persistent=True,
+    )
+    app.add_handler(betting_handler, group=4)
+
+    broadcast_handler = ConversationHandler(
+        entry_points=[MessageHandler(filters.Text(["📢 Broadcast Message"]), lazy("handlers.admin:prompt_broadcast_message"))],
+        states={
+            "AWAITING_BROADCAST_MESSAGE": [MessageHandler(conversation_input, lazy("handlers.admin:broadcast_message"))],
+        },
+        fallbacks=escape_fallbacks,
+        allow_reentry=True,
+        per_user=True,
+        name="broadcast",
+        persistent=True,
+    )
+    app.add_handler(broadcast_handler, group=5)
+
+async def log_first_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Runs in group -1 ahead of the real handlers and never blocks them.
+    started_at = context.bot_data.pop("started_at", None)
+    if started_at is not None:
+        elapsed = time.perf_counter() - started_at
+        logger.info("⏱ Time to first update", extra={"seconds": round(elapsed, 2)})
+        if elapsed > STARTUP_BUDGET:
+            logger.warning("⚠️ Over the startup budget (see benchmarks/startup_budget.py)", extra={"budget_seconds": STARTUP_BUDGET})
+
+# ⚠️ Sent by the exposure tracker (risk.py) the first time a round gets
+# this lopsided.
+async def alert_exposure(game_id: str, outcome: str, liability: int):
+    game = get_game(game_id)
+    liabilities = ", ".join(f"{side} ₹{value}" for side, value in exposure.liabilities(game_id).items())
+    await db.notify(
+        ADMIN_ID,
+        f"⚠️ Exposure alert — {game.name}: if {outcome} wins the house loses ₹{liability}.\n"
+        f"Net liability by outcome: {liabilities}"
+    )
+    outbox_workers.wake()
+
+# 👑 Duties that must run in exactly one process (see cluster.py). The
+# scheduler (and APScheduler with it) is only imported once elected.
+async def start_leader_duties(app: Application):
+    from scheduler import round_scheduler
+    outbox_workers.start(app.bot)
+    round_scheduler.start()
+    await resume_broadcasts(app)
+
+async def stop_leader_duties(timeout: float = 0):
+    from scheduler import round_scheduler
+    (jobs_finished, jobs_cancelled), (paused, cancelled), (notified, abandoned) = await asyncio.gather(
+        round_scheduler.stop(timeout), stop_broadcasts(timeout), outbox_workers.stop(timeout)
+    )
+    return {
+        "jobs_finished": jobs_finished, "jobs_cancelled": jobs_cancelled,
+        "broadcasts_paused": paused, "broadcasts_cancelled": cancelled,
+        "notifications_finished": notified, "notifications_abandoned": abandoned,
+    }
+
 async def main():
+    setup_logging()
+    setup_tracing()
+    started_at = PROCESS_STARTED_AT
+    app = None
+    web_runner = None
+    leader = None
     try:
-        await db.connect()
-        print("✅ Connected to the database.")
-        print("🤖 Bot is running...")
-        
-        app = Application.builder().token(TOKEN).build()
-
-        # Commands
-        app.add_handler(CommandHandler("start", start))
-        app.add_handler(CommandHandler("admin", show_admin_controls))
-        app.add_handler(CommandHandler("cancel", cancel))
-        app.add_handler(CommandHandler("ad", approve_deposit_command))
-        app.add_handler(CommandHandler("aw", approve_withdrawal_command))
-        # Regular Messages
-        app.add_handler(MessageHandler(filters.Regex("^Start$"), start))
-        app.add_handler(MessageHandler(filters.Text("🔐 Admin"), show_admin_controls))
-        app.add_handler(MessageHandler(filters.Text("👥 Users & Balances"), show_all_users))
-        app.add_handler(MessageHandler(filters.Text("💰 Balance"), show_balance))
-        app.add_handler(MessageHandler(filters.Text("🕘 History"), show_history))
-        app.add_handler(MessageHandler(filters.Text("🔗 Referral Program"), show_referral_code))
-        app.add_handler(MessageHandler(filters.Text("🛠 Service"), show_service))
-
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^✅ Approve Deposits$"), show_pending_deposits))
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^💸 Approve Withdrawals$"), show_pending_withdrawals))
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^👥 View Users & Balances$"), show_all_users))
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^📊 View Admin Profit$"), show_admin_profit))
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^🕒 View Recent Bets$"), show_recent_bets))
-        app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^🔙 Back to Menu$"), start))
-
-
-        admin_result_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Regex("✅ Accept Result"), admin_result.accept_result)],
-            states={
-                "AWAITING_RESULT_CHOICE": [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, admin_result.handle_result_choice)
-                ]
-            },
-            fallbacks=[],
-        )
-        
-        app.add_handler(admin_result_handler)
-
-        app.add_handler(MessageHandler(filters.Regex("🧮 View Bet Summary"), admin_result.view_bet_summary))
-
-        # Deposit Handler
-        deposit_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Text("📥 Deposit"), deposit_start)],
-            states={
-                DEPOSIT_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_deposit_amount)],
-                DEPOSIT_TXN_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_transaction_id)],
-            },
-            fallbacks=[CommandHandler("cancel", cancel)],
-            per_user=True,
+        if BOT_MODE in ("worker", "webhook"):
+            # Workers get the front's WEBHOOK_URL but never register it.
+            check_webhook_settings(need_url=BOT_MODE == "webhook")
+        processor = PerUserUpdateProcessor(UPDATE_WORKERS)
+        builder = (
+            Application.builder()
+            .token(TOKEN)
+            .concurrent_updates(processor)
+            .request(CountingRequest(connection_pool_size=256))
+            .persistence(PostgresPersistence(update_interval=PERSISTENCE_FLUSH_INTERVAL))
         )
-        app.add_handler(deposit_handler)
-
-        # Withdraw Handler
-        withdraw_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Text("📤 Withdraw"), withdraw_start)],
-            states={
-                WITHDRAW_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_withdraw_amount)],
-                WITHDRAW_UPI_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_withdraw_upi)],
-            },
-            fallbacks=[CommandHandler("cancel", cancel)],
-            per_user=True,
+        if TELEGRAM_API_URL:
+            builder = builder.base_url(f"{TELEGRAM_API_URL.rstrip('/')}/bot")
+        app = builder.build()
+        app.bot_data["started_at"] = started_at
+        leader = LeaderElection(
+            on_elected=lambda: start_leader_duties(app),
+            on_demoted=stop_leader_duties,
+            while_leader=lambda: resume_broadcasts(app),
         )
-        app.add_handler(withdraw_handler)
-
-        # Betting Handler
-        betting_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Text("🎯 Place a Bet"), bet_start)],
-            states={
-                BET_ENTER_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, bet_enter_amount)],
-                BET_CHOOSE_SIDE: [MessageHandler(filters.TEXT & ~filters.COMMAND, bet_choose_side)],
-            },
-            fallbacks=[CommandHandler("cancel", cancel)],
-            per_user=True,
-        )
-        app.add_handler(betting_handler)
-
-        broadcast_handler = ConversationHandler(
-            entry_points=[MessageHandler(filters.Regex("^📢 Broadcast Message$"), prompt_broadcast_message)],
-            states={
-                "AWAITING_BROADCAST_MESSAGE": [MessageHandler(filters.TEXT & ~filters.COMMAND, broadcast_message)],
-            },
-            fallbacks=[CommandHandler("cancel", cancel)],
-            per_user=True,
-        )
-
-        app.add_handler(broadcast_handler)
+        app.bot_data["leader"] = leader
+        app.add_handler(TypeHandler(Update, guard), group=-2)
+        app.add_handler(TypeHandler(Update, log_first_update), group=-1)
+        register_handlers(app)
+        instrument(app)
+
+        # The database pool and the Telegram getMe call don't depend on each
+        # other, so open both at once.
+        await asyncio.gather(db.connect(), app.initialize())
+        await asyncio.gather(db.create_tables(), db.preload_caches())
+        await db.watch_settlements()
+        await db.load_exposure()
+        exposure.on_alert = alert_exposure
+        load_monitor.start()
+        logger.info("✅ Connected to the database.")
+
+        # aiohttp is only imported when a web server is needed.
+        if BOT_MODE in ("worker", "webhook") or METRICS_PORT:
+            from webserver import create_web_app, start_web_server
+
+        if BOT_MODE == "worker":
+            # Behind cluster.py: the front process owns the webhook and
+            # forwards this worker's share of updates to its port.
+            web_runner = await start_web_server(
+                create_web_app(app, WEBHOOK_PATH, WEBHOOK_SECRET), WEBHOOK_PORT, host="127.0.0.1"
+            )
+        elif BOT_MODE == "webhook":
+            # Telegram posts updates to our aiohttp server, which checks the
+            # secret token and drops them straight into the update queue.
+            web_runner = await start_web_server(
+                create_web_app(app, WEBHOOK_PATH, WEBHOOK_SECRET), WEBHOOK_PORT
+            )
+            await app.bot.set_webhook(
+                url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        else:
+            if METRICS_PORT:
+                web_runner = await start_web_server(create_web_app(app), METRICS_PORT)
+            await app.updater.start_polling()
+        await app.start()
+
+        # Scheduler, broadcasts and the outbox run only in the process holding
+        # the leader lock; the leader also picks up broadcasts that other
+        # workers saved.
+        leader.start()
+        logger.info("🤖 Bot is running...", extra={"startup_seconds": round(time.perf_counter() - started_at, 2)})
+
+        # Serve until SIGTERM/SIGINT, then drain before shutting down.
+        stop_signal = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                asyncio.get_running_loop().add_signal_handler(sig, stop_signal.set)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C cancels the loop instead
+        await stop_signal.wait()
 
-        await app.run_polling()
+        logger.info("🛑 Shutting down, finishing in-flight work...")
+        await drain(app, processor, leader, web_runner, DRAIN_TIMEOUT)
+        leader = web_runner = None
 
-    except Exception as e:
-        print(f"Error in bot initialization: {e}")
+    except Exception:
+        logger.error("Error in bot initialization", exc_info=True)
     finally:
-        await app.shutdown()  # Gracefully shut down the app
+        if leader is not None:
+            await leader.stop()
+        await load_monitor.stop()
+        if web_runner is not None:
+            await web_runner.cleanup()
+        if app is not None:
+            if app.updater.running:
+                await app.updater.stop()
+            if app.running:
+                await app.stop()
+            await app.shutdown()  # Gracefully shut down the app (flushes persistence)
+        await db.close()
+        stop_logging()
 
 if __name__ == "__main__":
     try:
@@ -825,9 +751,9 @@ if __name__ == "__main__":
 
         loop = asyncio.get_event_loop()
         if loop.is_running():
-            print("Event loop already running. Creating task.")
+            logger.info("Event loop already running. Creating task.")
             loop.create_task(main())  # Fire-and-forget
         else:
             loop.run_until_complete(main())  # Proper for environments without active loop
-    except Exception as e:
-        print(f"Error in bot initialization: {e}")
+    except Exception:
+        logger.error("Error in bot initialization", exc_info=True)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Tuple
+
+from telegram.error import BadRequest
+
+from database.database import db
+from messaging import deliver_all
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_BATCH_SIZE = 100
+BROADCAST_CONCURRENCY = 20
+PROGRESS_INTERVAL = 5  # seconds between status message edits
+
+# Broadcasts currently being delivered by this process, keyed by broadcast id.
+running_broadcasts: Dict[int, asyncio.Task] = {}
+# Set while stopping: running broadcasts pause after their current batch.
+_pausing = asyncio.Event()
+
+
+def _progress_text(broadcast: Dict, done: bool = False) -> str:
+    processed = broadcast["sent"] + broadcast["failed"]
+    header = "📢 Broadcast finished" if done else "📢 Broadcasting…"
+    return (
+        f"{header}\n\n"
+        f"✅ Sent: {broadcast['sent']}\n"
+        f"❌ Failed: {broadcast['failed']}\n"
+        f"📊 Progress: {processed}/{broadcast['total']}"
+    )
+
+
+async def _report(bot, broadcast: Dict, done: bool = False):
+    if not broadcast.get("status_message_id"):
+        return
+    try:
+        await bot.edit_message_text(
+            _progress_text(broadcast, done),
+            chat_id=broadcast["admin_chat_id"],
+            message_id=broadcast["status_message_id"],
+        )
+    except BadRequest:
+        pass  # Message not modified or deleted by the admin
+    except Exception:
+        logger.error("Error updating broadcast status", extra={"broadcast_id": broadcast["id"]}, exc_info=True)
+
+
+async def run_broadcast(bot, broadcast: Dict):
+    """Deliver `broadcast` to every user after its saved `last_user_id`.
+
+    Progress is saved after each batch, so a restart resends at most one
+    batch.
+    """
+    last_report = time.monotonic()
+    try:
+        while True:
+            if _pausing.is_set():
+                logger.info("Broadcast paused", extra={"broadcast_id": broadcast["id"], "last_user_id": broadcast["last_user_id"]})
+                return
+            user_ids = await db.get_user_ids_after(broadcast["last_user_id"], BROADCAST_BATCH_SIZE)
+            if not user_ids:
+                break
+
+            sent, failed = await deliver_all(
+                bot, {user_id: broadcast["message"] for user_id in user_ids}, BROADCAST_CONCURRENCY
+            )
+            broadcast["sent"] += sent
+            broadcast["failed"] += failed
+            broadcast["last_user_id"] = user_ids[-1]
+            await db.update_broadcast_progress(
+                broadcast["id"], broadcast["last_user_id"], broadcast["sent"], broadcast["failed"]
+            )
+
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                await _report(bot, broadcast)
+                last_report = time.monotonic()
+
+        await db.update_broadcast_progress(
+            broadcast["id"], broadcast["last_user_id"], broadcast["sent"], broadcast["failed"], finished=True
+        )
+        await _report(bot, broadcast, done=True)
+        logger.info("Broadcast finished", extra={"broadcast_id": broadcast["id"], "sent": broadcast["sent"],
+                                                "failed": broadcast["failed"]})
+    except Exception:
+        logger.error("Error in broadcast", extra={"broadcast_id": broadcast["id"]}, exc_info=True)
+
+
+def _spawn(application, broadcast: Dict) -> asyncio.Task:
+    task = application.create_task(run_broadcast(application.bot, broadcast))
+    running_broadcasts[broadcast["id"]] = task
+    task.add_done_callback(lambda _: running_broadcasts.pop(broadcast["id"], None))
+    return task
+
+
+async def start_broadcast(application, message: str, admin_chat_id: int, deliver: bool = True) -> Dict:
+    """Persist a new broadcast and deliver it in the background.
+
+    With `deliver=False` (a worker that isn't the cluster leader) the
+    broadcast is only saved; the leader picks it up on its next resume.
+    """
+    broadcast = await db.create_broadcast(message, admin_chat_id)
+    status = await application.bot.send_message(admin_chat_id, _progress_text(broadcast))
+    broadcast["status_message_id"] = status.message_id
+    await db.set_broadcast_status_message(broadcast["id"], status.message_id)
+    if deliver:
+        _spawn(application, broadcast)
+    return broadcast
+
+
+async def resume_broadcasts(application):
+    """Pick up broadcasts that were interrupted by a restart."""
+    for broadcast in await db.get_unfinished_broadcasts():
+        if broadcast["id"] not in running_broadcasts:
+            logger.info("Resuming broadcast", extra={"broadcast_id": broadcast["id"], "last_user_id": broadcast["last_user_id"]})
+            _spawn(application, broadcast)
+
+
+async def stop_broadcasts(timeout: float = 0) -> Tuple[int, int]:
+    """Pause running broadcasts, waiting up to `timeout` seconds for their
+    current batch; after that they are cancelled. Either way their saved
+    progress lets this or another process resume them.
+
+    Returns (broadcasts paused cleanly, broadcasts cancelled mid-batch).
+    """
+    tasks = list(running_broadcasts.values())
+    _pausing.set()
+    if tasks and timeout > 0:
+        await asyncio.wait(tasks, timeout=timeout)
+    cancelled = [task for task in tasks if not task.done()]
+    for task in cancelled:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _pausing.clear()
+    return len(tasks) - len(cancelled), len(cancelled)
@@ -0,0 +1,130 @@
+"""Multi-process deployment.
+
+    python cluster.py --workers 3
+
+starts a small front process that owns the public webhook and N bot worker
+processes (BOT_MODE=worker) on internal ports. Every update is forwarded to
+the worker picked by its user id, so one user's updates always land on the
+same worker and stay in order. Duties that must run exactly once
+(scheduler, broadcasts, outbox draining) go to whichever worker holds a
+Postgres advisory lock (see leader.py); if that worker dies its session
+ends, the lock is released, and another worker takes over.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+from typing import List
+
+import aiohttp
+from aiohttp import web
+from telegram import Bot, Update
+
+from config import BOT_TOKEN, BOT_WORKERS, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL, check_webhook_settings
+from logs import setup_logging, stop_logging
+
+logger = logging.getLogger(__name__)
+
+USER_KEYS = ("message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+             "shipping_query", "pre_checkout_query", "my_chat_member", "chat_member", "chat_join_request")
+
+
+def update_user_id(data: dict) -> int:
+    """User id of a raw update without building a telegram.Update."""
+    for key in USER_KEYS:
+        payload = data.get(key)
+        if payload:
+            sender = payload.get("from") or payload.get("chat") or {}
+            return sender.get("id", 0)
+    return 0
+
+
+def worker_port(index: int) -> int:
+    return WEBHOOK_PORT + 1 + index
+
+
+class Front:
+    def __init__(self, num_workers: int):
+        self.num_workers = num_workers
+        self.session = None
+
+    async def forward(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        try:
+            user_id = update_user_id(json.loads(body))
+        except ValueError:
+            return web.Response(status=400)
+
+        port = worker_port(user_id % self.num_workers)
+        try:
+            async with self.session.post(f"http://127.0.0.1:{port}{WEBHOOK_PATH}", data=body,
+                                         headers=dict(request.headers)) as resp:
+                return web.Response(status=resp.status)
+        except aiohttp.ClientError:
+            # Telegram redelivers on non-2xx; the worker is probably restarting.
+            return web.Response(status=503)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "workers": self.num_workers})
+
+
+def spawn_worker(index: int) -> subprocess.Popen:
+    env = dict(os.environ, BOT_MODE="worker", PORT=str(worker_port(index)), WORKER_ID=str(index))
+    return subprocess.Popen([sys.executable, "bot.py"], env=env)
+
+
+async def run_front(num_workers: int):
+    check_webhook_settings()
+    workers: List[subprocess.Popen] = [spawn_worker(i) for i in range(num_workers)]
+    front = Front(num_workers)
+    front.session = aiohttp.ClientSession()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, front.forward)
+    app.router.add_get("/health", front.health)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", WEBHOOK_PORT).start()
+
+    bot = Bot(BOT_TOKEN)
+    async with bot:
+        await bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    logger.info("🌐 Front listening", extra={"port": WEBHOOK_PORT, "workers": num_workers})
+
+    try:
+        while True:
+            await asyncio.sleep(1)
+            for i, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    logger.warning("Worker exited; restarting", extra={"worker": i, "returncode": worker.returncode})
+                    workers[i] = spawn_worker(i)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+        await front.session.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot as several worker processes")
+    parser.add_argument("--workers", type=int, default=BOT_WORKERS)
+    args = parser.parse_args()
+    setup_logging()
+    try:
+        asyncio.run(run_front(args.workers))
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError:
+        logger.error("Error starting cluster", exc_info=True)
+        sys.exit(1)
+    finally:
+        stop_logging()
@@ -4,4 +4,81 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Bot API server, e.g. a local one or the fake server used by benchmarks.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")  # default: https://api.telegram.org
 ADMIN_ID = int(os.getenv("ADMIN_ID"))
+
+# "polling" (default), "webhook", or "worker" (behind cluster.py, which
+# owns the public webhook and forwards updates to PORT)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public base URL, e.g. https://example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_PORT = int(os.getenv("PORT", "8080"))
+
+
+def check_webhook_settings(need_url: bool = True):
+    """Refuse to serve a webhook that Telegram can't reach or anyone could post to."""
+    if need_url and not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL must be set to the public base URL Telegram posts updates to")
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_SECRET must be set in webhook mode; without it anyone can post fake updates")
+
+# Polling mode has no web server; set this to serve /health and /metrics.
+# Webhook and worker modes serve them next to the webhook.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Updates processed at once across users; each user's updates stay in order.
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "32"))
+
+# Seconds between writes of conversation state and user_data to Postgres.
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "5"))
+
+# Per-user flood control: sustained updates per second and burst size.
+FLOOD_RATE = float(os.getenv("FLOOD_RATE", "1"))
+FLOOD_BURST = int(os.getenv("FLOOD_BURST", "5"))
+# Load shedding: reply "busy" instead of queueing more DB work when either
+# the pool acquire wait or the number of pending updates goes over these.
+SHED_POOL_WAIT_MS = float(os.getenv("SHED_POOL_WAIT_MS", "250"))
+SHED_MAX_PENDING_UPDATES = int(os.getenv("SHED_MAX_PENDING_UPDATES", "500"))
+
+# Background workers draining the notification outbox.
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+
+# Betting rounds opened and closed by scheduler.py.
+ROUND_MINUTES = int(os.getenv("ROUND_MINUTES", "30"))
+# Settle closed rounds automatically (lowest-staked side wins) instead of
+# waiting for the admin's "✅ Accept Result".
+AUTO_SETTLE = os.getenv("AUTO_SETTLE", "false").lower() == "true"
+
+# Stake caps on a game's open round, checked in memory before a bet is
+# written (risk.py); 0 turns a cap off. The admin is alerted when the house
+# would lose more than EXPOSURE_ALERT_THRESHOLD if one outcome won.
+MAX_USER_ROUND_STAKE = int(os.getenv("MAX_USER_ROUND_STAKE", "10000"))
+MAX_ROUND_STAKE = int(os.getenv("MAX_ROUND_STAKE", "0"))
+EXPOSURE_ALERT_THRESHOLD = int(os.getenv("EXPOSURE_ALERT_THRESHOLD", "50000"))
+
+# Total a user must have bet before their first withdrawal.
+MIN_WAGER_TO_WITHDRAW = int(os.getenv("MIN_WAGER_TO_WITHDRAW", "200"))
+
+# Worker processes started by `python cluster.py`.
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "3"))
+
+# Seconds to finish in-flight updates and background jobs after SIGTERM
+# (Heroku-style platforms kill the process 30s after sending it).
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "25"))
+
+# Seconds from process start to the first handled update that startup must
+# stay under; checked by benchmarks/startup_budget.py and warned about in
+# the log. Most of it is importing python-telegram-bot (~0.3s) and the first
+# round trips to Telegram and Postgres.
+STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", "3"))
+
+# Log level and output format ("json" or "text"); see logs.py.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Fraction of updates traced from handler to SQL, and where the traces go;
+# see tracing.py. 0 turns tracing off.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
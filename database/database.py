@@ -1,10 +1,105 @@
 import asyncpg
+import asyncio
 import os
+import json
+import logging
 import datetime
-from typing import Optional, List, Dict
+from collections import Counter
+from typing import Optional, List, Dict, Callable
+
+from games import DEFAULT_GAME, get_game
+from metrics import bets_placed, bet_stakes
+from risk import StakeLimitError, exposure
+from tracing import span
+from utils import LRUCache
+
+logger = logging.getLogger(__name__)
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Connections opened at startup, before the first user arrives.
+DB_POOL_WARM_SIZE = int(os.getenv("DB_POOL_WARM_SIZE", "5"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Advisory lock serialising create_tables across cluster workers.
+SCHEMA_LOCK_ID = 7_305_117
+# NOTIFY channel announcing settled or cleared bets, so every process can
+# reload its exposure tracker; the payload is the game id ("" for all games).
+SETTLEMENTS_CHANNEL = "bets_settled"
+
+# Read-only statements on the per-message hot path. Every new pool connection
+# runs them once so asyncpg's statement cache is populated before real traffic.
+SELECT_USER = "SELECT * FROM users WHERE user_id = $1"
+SELECT_BALANCE = "SELECT balance FROM users WHERE user_id = $1"
+SELECT_BALANCE_SUMMARY = "SELECT balance, referral_balance, referral_count FROM users WHERE user_id = $1"
+SELECT_WELCOME_SHOWN = "SELECT welcome_shown FROM users WHERE user_id = $1"
+# Everything a withdrawal is checked against, in one primary-key lookup.
+SELECT_WITHDRAWAL_ELIGIBILITY = """
+    SELECT balance, total_wagered, bonus_balance, wagered_bonus, referral_balance, wagered_referral
+    FROM users WHERE user_id = $1
+"""
+HOT_STATEMENTS = (SELECT_USER, SELECT_BALANCE, SELECT_BALANCE_SUMMARY, SELECT_WELCOME_SHOWN,
+                  SELECT_WITHDRAWAL_ELIGIBILITY)
+
+# Credits a whole settlement's payouts in one statement.
+CREDIT_PAYOUTS = """
+    UPDATE users SET balance = users.balance + payout.amount
+    FROM unnest($1::bigint[], $2::bigint[]) AS payout(user_id, amount)
+    WHERE users.user_id = payout.user_id
+"""
+
+def _statement_name(query: str) -> str:
+    """First line of a statement, whitespace collapsed, for span names."""
+    return " ".join(query.split())[:80]
+
+
+class TracedConnection(asyncpg.Connection):
+    """Records a "query" span around each statement run for a traced update."""
+
+    async def execute(self, query: str, *args, **kwargs):
+        with span("query", sql=_statement_name(query)):
+            return await super().execute(query, *args, **kwargs)
+
+    async def executemany(self, command: str, args, **kwargs):
+        with span("query", sql=_statement_name(command), rows=len(args)):
+            return await super().executemany(command, args, **kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        with span("query", sql=_statement_name(query)):
+            return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        with span("query", sql=_statement_name(query)):
+            return await super().fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        with span("query", sql=_statement_name(query)):
+            return await super().fetchval(query, *args, **kwargs)
+
+
+class _TracedAcquire:
+    def __init__(self, acquire):
+        self._acquire = acquire
+
+    async def __aenter__(self):
+        with span("pool_acquire"):
+            return await self._acquire.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        return await self._acquire.__aexit__(*exc_info)
+
+
+class TracedPool:
+    """asyncpg pool whose acquire() records a "pool_acquire" span."""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+
+    def acquire(self, *, timeout: Optional[float] = None):
+        return _TracedAcquire(self._pool.acquire(timeout=timeout))
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
 
 async def get_db_connection():
     return await asyncpg.connect(DATABASE_URL)
@@ -12,22 +107,137 @@ async def get_db_connection():
 class Database:
     def __init__(self):
         self.pool = None
+        self._connect_lock = asyncio.Lock()
+        # Results of recent money-moving operations keyed by idempotency key,
+        # so a re-delivered update never reaches the database again.
+        self.idempotency_cache = LRUCache(maxsize=10000)
+        # Users known to exist, so /start doesn't look them up every time.
+        self.known_users = LRUCache(maxsize=50000)
+        # Dedicated connection listening on SETTLEMENTS_CHANNEL.
+        self._settlement_listener = None
+        self._exposure_tasks = set()
 
     async def connect(self):
+        if self.pool:
+            return
         try:
-            if not self.pool:
-                self.pool = await asyncpg.create_pool(
+            # Startup connects from several tasks at once; only one creates the pool.
+            async with self._connect_lock:
+                if self.pool:
+                    return
+                self.pool = TracedPool(await asyncpg.create_pool(
                     DATABASE_URL,
-                    min_size=1,
-                    max_size=10,
-                    command_timeout=60
+                    min_size=min(DB_POOL_WARM_SIZE, DB_POOL_MAX_SIZE),
+                    max_size=DB_POOL_MAX_SIZE,
+                    command_timeout=60,
+                    init=self._init_connection,
+                    connection_class=TracedConnection
+                ))
+                logger.info("✅ Connected to database successfully!")
+        except Exception:
+            logger.error("❌ Database connection error", exc_info=True)
+
+    async def close(self, timeout: float = 10):
+        """Close the pool, waiting up to `timeout` seconds for connections in use."""
+        listener, self._settlement_listener = self._settlement_listener, None
+        if listener is not None:
+            await listener.close()
+        for task in list(self._exposure_tasks):
+            task.cancel()
+        if not self.pool:
+            return
+        pool, self.pool = self.pool, None
+        try:
+            await asyncio.wait_for(pool.close(), timeout)
+            logger.info("✅ Database pool closed.")
+        except asyncio.TimeoutError:
+            pool.terminate()
+            logger.warning("⚠️ Database pool terminated with connections still in use.")
+
+    async def _init_connection(self, conn):
+        # A lookup for user 0 matches nothing but leaves the parsed statement
+        # in the connection's cache.
+        for query in HOT_STATEMENTS:
+            try:
+                await conn.fetchrow(query, 0)
+            except Exception:
+                logger.error("Error preparing statement", extra={"query": query}, exc_info=True)
+
+    async def preload_caches(self):
+        """Fill in-memory caches from the database before serving updates."""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT DISTINCT user_id FROM bets LIMIT $1",
+                    self.known_users.maxsize
                 )
-                print("✅ Connected to database successfully!")
-        except Exception as e:
-            print(f"❌ Database connection error: {e}")
+            for row in rows:
+                self.known_users.set(row["user_id"], True)
+            logger.info("Preloaded active users", extra={"users": len(rows)})
+        except Exception:
+            logger.error("Error preloading caches", exc_info=True)
+
+    async def load_exposure(self, game_id: Optional[str] = None):
+        """(Re)load the exposure tracker from the open bets of one game, or
+        of all games (at startup, after create_tables)."""
+        try:
+            rows = await self.pool.fetch("""
+                SELECT game_id, user_id, choice, SUM(amount) AS amount
+                FROM bets WHERE $1::text IS NULL OR game_id = $1
+                GROUP BY game_id, user_id, choice
+            """, game_id)
+            exposure.load(rows, game_id)
+            logger.info("Loaded exposure", extra={"game_id": game_id, "open_stakes": len(rows)})
+        except Exception:
+            logger.error("Error loading exposure", extra={"game_id": game_id}, exc_info=True)
+
+    async def watch_settlements(self):
+        """Reload exposure whenever any process settles or clears bets.
+
+        Settlements only update the tracker of the process that ran them;
+        every other worker would keep counting the settled stakes towards
+        its users' caps. If the listening connection drops it is reopened,
+        and everything is reloaded in case a notification was missed.
+        """
+        try:
+            conn = await asyncpg.connect(DATABASE_URL)
+            await conn.add_listener(SETTLEMENTS_CHANNEL, self._on_settlement)
+            conn.add_termination_listener(self._on_settlement_listener_lost)
+            self._settlement_listener = conn
+        except Exception:
+            logger.error("Error listening for settlements", exc_info=True)
+            self._in_background(self._rewatch_settlements())
+
+    def _on_settlement(self, conn, pid, channel, payload: str):
+        self._in_background(self.load_exposure(payload or None))
+
+    def _on_settlement_listener_lost(self, conn):
+        # close() clears the attribute first, so a shutdown doesn't reconnect.
+        if self._settlement_listener is conn:
+            logger.warning("Lost the settlements listener; reconnecting")
+            self._settlement_listener = None
+            self._in_background(self._rewatch_settlements())
+
+    async def _rewatch_settlements(self, delay: float = 5):
+        await asyncio.sleep(delay)
+        await self.watch_settlements()
+        if self._settlement_listener is not None:
+            await self.load_exposure()
+
+    def _in_background(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._exposure_tasks.add(task)
+        task.add_done_callback(self._exposure_tasks.discard)
+
+    async def _announce_settlement(self, conn, game_id: Optional[str] = None):
+        # Delivered when the caller's transaction commits.
+        await conn.execute("SELECT pg_notify($1, $2)", SETTLEMENTS_CHANNEL, game_id or "")
 
     async def create_tables(self):
         async with self.pool.acquire() as conn:
+            # Cluster workers start together and CREATE ... IF NOT EXISTS can
+            # still collide; take turns. The pool unlocks on release.
+            await conn.execute("SELECT pg_advisory_lock($1)", SCHEMA_LOCK_ID)
             await conn.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     user_id BIGINT PRIMARY KEY,
@@ -35,14 +245,196 @@ class Database:
                     balance INT DEFAULT 0
                 );
             ''')
+            # Wagering counters, raised with every bet by record_bet/place_bet.
+            # total_wagered is new: on the run that adds it, start it from the
+            # bets still open (settled ones are gone). One transaction, so the
+            # column never exists without its backfill.
+            async with conn.transaction():
+                backfill_wagered = not await conn.fetchval("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = current_schema() AND table_name = 'users'
+                          AND column_name = 'total_wagered'
+                    )
+                """)
+                await conn.execute('''
+                    ALTER TABLE users ADD COLUMN IF NOT EXISTS total_wagered BIGINT NOT NULL DEFAULT 0;
+                    ALTER TABLE users ADD COLUMN IF NOT EXISTS bonus_balance INT DEFAULT 0;
+                    ALTER TABLE users ADD COLUMN IF NOT EXISTS wagered_bonus INT DEFAULT 0;
+                    ALTER TABLE users ADD COLUMN IF NOT EXISTS referral_balance INT DEFAULT 0;
+                    ALTER TABLE users ADD COLUMN IF NOT EXISTS wagered_referral INT DEFAULT 0;
+                ''')
+                if backfill_wagered:
+                    await conn.execute('''
+                        UPDATE users SET total_wagered = staked.amount
+                        FROM (SELECT user_id, SUM(amount) AS amount FROM bets GROUP BY user_id) AS staked
+                        WHERE users.user_id = staked.user_id
+                    ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    result JSONB,
+                    created_at TIMESTAMP DEFAULT NOW()
+                );
+            ''')
+            # Deposits approved before approvals set `applied` were credited
+            # at approval but still read applied = FALSE; mark them once,
+            # before apply_approved_deposits can credit them a second time.
+            async with conn.transaction():
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        name TEXT PRIMARY KEY,
+                        applied_at TIMESTAMP DEFAULT NOW()
+                    );
+                ''')
+                if await conn.fetchval(
+                    "INSERT INTO schema_migrations (name) VALUES ($1) ON CONFLICT (name) DO NOTHING RETURNING name",
+                    "deposits_applied_backfill"
+                ):
+                    marked = await conn.execute("UPDATE deposits SET applied = TRUE WHERE approved AND NOT applied")
+                    logger.info("Marked approved deposits as applied", extra={"deposits": int(marked.split()[-1])})
+            # Older databases can hold the same payment ID more than once,
+            # which would stop the unique index from building.
+            if not await conn.fetchval("SELECT to_regclass('deposits_transaction_id_key') IS NOT NULL"):
+                await self._rename_duplicate_transaction_ids(conn)
+            await conn.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS deposits_transaction_id_key
+                ON deposits (transaction_id);
+            ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    id SERIAL PRIMARY KEY,
+                    message TEXT NOT NULL,
+                    admin_chat_id BIGINT NOT NULL,
+                    status_message_id BIGINT,
+                    last_user_id BIGINT DEFAULT 0,
+                    total INT DEFAULT 0,
+                    sent INT DEFAULT 0,
+                    failed INT DEFAULT 0,
+                    finished BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT NOW()
+                );
+            ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id BIGSERIAL PRIMARY KEY,
+                    chat_id BIGINT NOT NULL,
+                    text TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INT NOT NULL DEFAULT 0,
+                    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    last_error TEXT,
+                    created_at TIMESTAMP DEFAULT NOW()
+                );
+            ''')
+            # Messages queued together (e.g. one settlement's) whose sender
+            # wants a sent/failed report once they have all been delivered or
+            # dead-lettered. Sent messages are deleted, so the counts live here.
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox_batches (
+                    id BIGSERIAL PRIMARY KEY,
+                    report_chat_id BIGINT NOT NULL,
+                    title TEXT NOT NULL,
+                    total INT NOT NULL,
+                    sent INT NOT NULL DEFAULT 0,
+                    failed INT NOT NULL DEFAULT 0,
+                    reported BOOLEAN NOT NULL DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT NOW()
+                );
+                ALTER TABLE outbox ADD COLUMN IF NOT EXISTS batch_id BIGINT;
+            ''')
+            await conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS rounds (
+                    id SERIAL PRIMARY KEY,
+                    game_id TEXT NOT NULL DEFAULT '{DEFAULT_GAME}',
+                    starts_at TIMESTAMP NOT NULL,
+                    ends_at TIMESTAMP NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'open',
+                    winning_side TEXT,
+                    settled_at TIMESTAMP
+                );
+            ''')
+            # Each game has its own rounds and bets. Tables from before games
+            # existed get a game_id column, and their rows belong to the
+            # default game.
+            await conn.execute(f'''
+                ALTER TABLE rounds ADD COLUMN IF NOT EXISTS game_id TEXT NOT NULL DEFAULT '{DEFAULT_GAME}';
+                ALTER TABLE rounds DROP CONSTRAINT IF EXISTS rounds_starts_at_key;
+                CREATE UNIQUE INDEX IF NOT EXISTS rounds_game_id_starts_at_key ON rounds (game_id, starts_at);
+                ALTER TABLE bets ADD COLUMN IF NOT EXISTS game_id TEXT NOT NULL DEFAULT '{DEFAULT_GAME}';
+                CREATE INDEX IF NOT EXISTS bets_game_id_idx ON bets (game_id);
+            ''')
+            await conn.execute('''
+                CREATE INDEX IF NOT EXISTS outbox_pending_idx
+                ON outbox (next_attempt_at) WHERE status = 'pending';
+            ''')
+
+    async def _rename_duplicate_transaction_ids(self, conn):
+        """Keep the earliest deposit of each payment ID; later copies get an
+        id suffix so the rows (and any balance they credited) stay on record."""
+        renamed = await conn.fetch("""
+            WITH ranked AS (
+                SELECT id, transaction_id,
+                       row_number() OVER (PARTITION BY transaction_id ORDER BY id) AS n
+                FROM deposits
+            )
+            UPDATE deposits SET transaction_id = ranked.transaction_id || '#dup' || deposits.id
+            FROM ranked
+            WHERE deposits.id = ranked.id AND ranked.n > 1
+            RETURNING deposits.id, deposits.user_id, ranked.transaction_id, deposits.amount, deposits.approved
+        """)
+        for row in renamed:
+            logger.warning(
+                "Duplicate transaction ID: later deposit renamed, earliest kept",
+                extra={"deposit_id": row["id"], "user_id": row["user_id"], "transaction_id": row["transaction_id"],
+                       "amount": row["amount"], "approved": row["approved"]}
+            )
+
+    # ───── IDEMPOTENCY ─────
+    async def _claim_idempotency_key(self, conn, key: str):
+        """Claim `key` inside the caller's transaction.
+
+        Returns None when the key is new and the operation should run, or the
+        stored result of the original operation when it is a replay. A
+        concurrent claim of the same key blocks on the primary key until the
+        first transaction finishes.
+        """
+        claimed = await conn.fetchval(
+            "INSERT INTO idempotency_keys (key) VALUES ($1) ON CONFLICT (key) DO NOTHING RETURNING key",
+            key
+        )
+        if claimed:
+            return None
+        stored = await conn.fetchval("SELECT result FROM idempotency_keys WHERE key = $1", key)
+        return json.loads(stored) if stored is not None else None
+
+    async def _store_idempotent_result(self, conn, key: str, result):
+        await conn.execute(
+            "UPDATE idempotency_keys SET result = $2 WHERE key = $1",
+            key, json.dumps(result)
+        )
+        self.idempotency_cache.set(key, result)
+
+    async def purge_idempotency_keys(self, older_than_hours: int = 48):
+        await self.connect()
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM idempotency_keys WHERE created_at < NOW() - make_interval(hours => $1)",
+                older_than_hours
+            )
 
     async def add_user(self, user_id: int, full_name: str, referrer_id: Optional[int] = None):
         try:
-            print(f"Attempting to add user: {user_id}, {full_name}, referred by: {referrer_id}")
+            logger.debug("Adding user", extra={"user_id": user_id, "referrer_id": referrer_id})
+
+            if user_id in self.known_users:
+                logger.info("User already exists", extra={"user_id": user_id, "sample": 100})
+                return False
 
-            existing = await self.pool.fetchrow("SELECT * FROM users WHERE user_id = $1", user_id)
+            existing = await self.pool.fetchrow(SELECT_USER, user_id)
             if existing:
-                print(f"User {user_id} already exists in the database.")
+                self.known_users.set(user_id, True)
+                logger.info("User already exists", extra={"user_id": user_id, "sample": 100})
                 return False  # User already exists
 
             # Set initial balance to 30 for new users
@@ -50,10 +442,11 @@ class Database:
                 "INSERT INTO users (user_id, full_name, balance, referrer_id) VALUES ($1, $2, 30, $3)",
                 user_id, full_name, referrer_id
             )
-            print(f"User {user_id} added successfully with a ₹30 joining bonus.")
+            self.known_users.set(user_id, True)
+            logger.info("User added with a ₹30 joining bonus", extra={"user_id": user_id, "referrer_id": referrer_id})
             return True
-        except Exception as e:
-            print(f"Error adding user {user_id}: {e}")
+        except Exception:
+            logger.error("Error adding user", extra={"user_id": user_id}, exc_info=True)
             return False
 
     async def get_user_full_name(self, user_id: int) -> Optional[str]:
@@ -61,8 +454,8 @@ class Database:
             async with self.pool.acquire() as conn:
                 row = await conn.fetchrow("SELECT full_name FROM users WHERE user_id = $1", user_id)
                 return row["full_name"] if row else None
-        except Exception as e:
-            print(f"Error fetching full name for user {user_id}: {e}")
+        except Exception:
+            logger.error("Error fetching full name", extra={"user_id": user_id}, exc_info=True)
             return None
     # ───── USER MANAGEMENT ─────
 
@@ -82,36 +475,86 @@ class Database:
     async def get_main_balance(self, user_id: int) -> float:
         try:
             async with self.pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    "SELECT balance FROM users WHERE user_id = $1",
-                    user_id
-                )
+                row = await conn.fetchrow(SELECT_BALANCE, user_id)
                 return float(row['balance']) if row else 0.0
-        except Exception as e:
-            print(f"Error getting main balance for user {user_id}: {e}")
+        except Exception:
+            logger.error("Error getting main balance", extra={"user_id": user_id}, exc_info=True)
             return 0.0
         
     async def get_total_wagered(self, user_id: int) -> float:
+        # Kept up to date by record_bet/place_bet; settled bets still count.
         try:
             async with self.pool.acquire() as conn:
-                row = await conn.fetchrow("""
-                    SELECT COALESCE(SUM(amount), 0) as total_wagered 
-                    FROM bets 
-                    WHERE user_id = $1
-                """, user_id)
-                return float(row['total_wagered'])
-        except Exception as e:
-            print(f"Error getting total wagered amount for user {user_id}: {e}")
+                row = await conn.fetchrow(SELECT_WITHDRAWAL_ELIGIBILITY, user_id)
+                return float(row['total_wagered']) if row else 0.0
+        except Exception:
+            logger.error("Error getting total wagered amount", extra={"user_id": user_id}, exc_info=True)
             return 0.0
+
+    async def get_withdrawal_eligibility(self, user_id: int) -> Optional[Dict]:
+        """Balance and wagering counters for a withdrawal check, or None for an unknown user."""
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(SELECT_WITHDRAWAL_ELIGIBILITY, user_id)
+                return dict(row) if row else None
+        except Exception:
+            logger.error("Error getting withdrawal eligibility", extra={"user_id": user_id}, exc_info=True)
+            return None
+
     async def get_all_user_ids(self) -> List[int]:
         await self.connect()
         async with self.pool.acquire() as conn:
             rows = await conn.fetch("SELECT user_id FROM users")
             return [row['user_id'] for row in rows]
 
+    async def get_user_ids_after(self, last_user_id: int, limit: int) -> List[int]:
+        # Keyset pagination so a resumed broadcast continues from a stable point.
+        rows = await self.pool.fetch(
+            "SELECT user_id FROM users WHERE user_id > $1 ORDER BY user_id LIMIT $2",
+            last_user_id, limit
+        )
+        return [row['user_id'] for row in rows]
+
+    # ───── BROADCASTS ─────
+    async def create_broadcast(self, message: str, admin_chat_id: int) -> Dict:
+        await self.connect()
+        row = await self.pool.fetchrow("""
+            INSERT INTO broadcasts (message, admin_chat_id, total)
+            VALUES ($1, $2, (SELECT COUNT(*) FROM users))
+            RETURNING *
+        """, message, admin_chat_id)
+        return dict(row)
+
+    async def set_broadcast_status_message(self, broadcast_id: int, message_id: int):
+        await self.pool.execute(
+            "UPDATE broadcasts SET status_message_id = $2 WHERE id = $1",
+            broadcast_id, message_id
+        )
+
+    async def update_broadcast_progress(self, broadcast_id: int, last_user_id: int, sent: int, failed: int,
+                                        finished: bool = False):
+        await self.pool.execute("""
+            UPDATE broadcasts
+            SET last_user_id = $2, sent = $3, failed = $4, finished = $5
+            WHERE id = $1
+        """, broadcast_id, last_user_id, sent, failed, finished)
+
+    async def get_unfinished_broadcasts(self) -> List[Dict]:
+        try:
+            await self.connect()
+            rows = await self.pool.fetch("SELECT * FROM broadcasts WHERE finished = FALSE ORDER BY id")
+            return [dict(row) for row in rows]
+        except Exception:
+            logger.error("Error fetching unfinished broadcasts", exc_info=True)
+            return []
+
     async def clear_current_bets(self):
         query = "DELETE FROM bets"
-        await self.pool.execute(query)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(query)
+                await self._announce_settlement(conn)
+        exposure.clear()
 
     async def ensure_user(self, user_id: int):
         await self.connect()
@@ -122,39 +565,119 @@ class Database:
                 ON CONFLICT (user_id) DO NOTHING
             """, user_id)
 
-    async def approve_result(self, winning_choice: str):
+    async def approve_result(self, winning_choice: str, build_notifications: Optional[Callable] = None,
+                             game_id: str = DEFAULT_GAME, report_to: Optional[int] = None,
+                             round_id: Optional[int] = None):
+        """Settle the open bets of one game in one transaction; returns the
+        settlement.Settlement, or None if it failed and was rolled back.
+
+        `build_notifications(settlement)` may return {user_id: text}; those
+        messages are written to the outbox in the same transaction, so they
+        are sent if and only if the settlement commits. With `report_to`, that
+        chat gets a sent/failed report once they have all been delivered or
+        dead-lettered. The round `round_id` (by default every closed round of
+        the game) is marked settled in the same transaction too, so a crash
+        can't leave it to be settled again. Bets placed after the last closed
+        round ended belong to the open round and are left alone. Only the
+        game's own bets are locked, so different games settle at the same time.
+        """
         try:
-            # Fetch all current bets
-            bets = await self.get_current_bets()
-            winners = []
-            losers = []
-            total_losing = 0
-
-            # Calculate winners and losers
-            for bet in bets:
-                if bet["choice"] == winning_choice:
-                    winners.append((bet["user_id"], bet["amount"]))
-                    # Update user balance for winners
-                    await self.update_balance(bet["user_id"], bet["amount"] * 2)
-                else:
-                    total_losing += bet["amount"]
-                    losers.append((bet["user_id"], bet["amount"]))
-
-            # Update admin profit with the total losing amount
-            await self.update_admin_profit(total_losing)
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    placed_before = await conn.fetchval("""
+                        SELECT max(ends_at) FROM rounds WHERE game_id = $1 AND status = 'closed'
+                    """, game_id)
+                    settled = await self._settle_bets(
+                        conn, game_id, placed_before, lambda totals: winning_choice,
+                        build_notifications, report_to, round_id
+                    )
+            return self._remove_settled_exposure(game_id, *settled)
+        except Exception:
+            logger.error("Error approving result", extra={"game_id": game_id, "winning_side": winning_choice, "round_id": round_id}, exc_info=True)
+            return None
 
-            # Clear bets after settlement
-            await self.clear_all_bets()
+    async def settle_round(self, due: Dict, pick_winner: Callable[[Dict[str, int]], Optional[str]],
+                           build_notifications: Optional[Callable] = None):
+        """Settle one due round; returns the settlement.Settlement, or None
+        when `pick_winner(side_totals)` finds no result.
 
-            return winners, losers
-        except Exception as e:
-            print(f"Error approving result: {e}")
-            return [], []
+        The winner is picked from the round's own bets, those placed before
+        it ended, inside the transaction that settles them, so the totals it
+        sees are the bets that get paid. With no result the round is marked
+        settled without a winner and its bets carry over to the next one.
+        """
+        game_id = due.get("game_id", DEFAULT_GAME)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                settled = await self._settle_bets(
+                    conn, game_id, due["ends_at"], pick_winner, build_notifications, None, due["id"]
+                )
+                if settled is None:
+                    await self._mark_rounds_settled(conn, None, game_id, due["id"])
+                    return None
+        return self._remove_settled_exposure(game_id, *settled)
+
+    async def _settle_bets(self, conn, game_id: str, placed_before: Optional[datetime.datetime],
+                           pick_winner: Callable, build_notifications: Optional[Callable],
+                           report_to: Optional[int], round_id: Optional[int]):
+        """Pay out the game's bets placed before `placed_before` (all of them
+        if None) on the side `pick_winner` chooses from their totals. Returns
+        (book, settlement), or None, leaving the bets in place, without a winner."""
+        # Imported here so NumPy stays out of startup.
+        from settlement import BetBook, settle
+
+        # Locking the rows settles exactly the bets that are cleared, even
+        # if new ones arrive or another settlement starts meanwhile.
+        # They come back as one row of arrays, not a Record per bet.
+        row = await conn.fetchrow("""
+            WITH due AS (
+                SELECT id, user_id, amount, choice FROM bets
+                WHERE game_id = $1 AND ($2::timestamp IS NULL OR timestamp < $2)
+                FOR UPDATE
+            )
+            SELECT array_agg(id) AS ids, array_agg(user_id) AS user_ids,
+                   array_agg(amount) AS amounts, array_agg(choice) AS choices
+            FROM due
+        """, game_id, placed_before)
+        book = BetBook.from_columns(row["user_ids"] or [], row["amounts"] or [], row["choices"] or [])
+        winning_choice = pick_winner(book.side_totals())
+        if winning_choice is None:
+            return None
+        if row["ids"]:
+            await conn.execute("DELETE FROM bets WHERE id = ANY($1::bigint[])", row["ids"])
+        result = settle(book, winning_choice, get_game(game_id).payout(winning_choice))
+
+        await self._credit_payouts(conn, result)
+
+        # Admin profit is the house P&L: every stake in, payouts out
+        await self._add_admin_profit(conn, result.house_pnl)
+
+        await self._mark_rounds_settled(conn, winning_choice, game_id, round_id)
+        await self._announce_settlement(conn, game_id)
+
+        if build_notifications:
+            await self._enqueue_notifications(
+                conn, build_notifications(result), report_to,
+                f"{get_game(game_id).name}: {winning_choice}"
+            )
+        return book, result
+
+    def _remove_settled_exposure(self, game_id: str, book, result):
+        # After commit: the settled stakes no longer count towards the caps.
+        exposure.remove_settled(game_id, book.side_totals(),
+                                zip(result.user_ids.tolist(), result.staked.tolist()))
+        return result
+
+    async def _credit_payouts(self, conn, result):
+        # One statement per settlement; rows are updated in user id order.
+        user_ids, amounts = result.payouts()
+        if user_ids:
+            await conn.execute(CREDIT_PAYOUTS, user_ids, amounts)
 
     async def get_balance(self, user_id: int) -> float:
         await self.connect()
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT balance FROM users WHERE user_id = $1", user_id)
+            row = await conn.fetchrow(SELECT_BALANCE, user_id)
         return float(row["balance"]) if row else 0.0
 
     async def update_balance(self, user_id: int, amount: float):
@@ -169,52 +692,49 @@ class Database:
 
     async def accept_result_and_update_profit(self, winning_choice: str):
         try:
+            from settlement import BetBook, settle
+
             # Fetch all current bets
             bets = await self.get_current_bets()
-            total_losing = 0
+            house_pnl = settle(BetBook.from_records(bets), winning_choice).house_pnl
 
-            # Calculate total losing amount
-            for bet in bets:
-                if bet["choice"] != winning_choice:
-                    total_losing += bet["amount"]
-
-            # Update admin profit with the total losing amount
-            await self.update_admin_profit(total_losing)
+            # Update admin profit with the house's take: stakes in, payouts out
+            await self.update_admin_profit(house_pnl)
 
             # Clear bets after settlement
             await self.clear_all_bets()
 
-            print(f"Result accepted. Admin profit updated by ₹{total_losing}.")
-        except Exception as e:
-            print(f"Error accepting result and updating admin profit: {e}")
+            logger.info("Result accepted, admin profit updated", extra={"winning_side": winning_choice, "amount": house_pnl})
+        except Exception:
+            logger.error("Error accepting result and updating admin profit", extra={"winning_side": winning_choice}, exc_info=True)
+
+    async def _add_admin_profit(self, conn, losing_amount: float):
+        # A row per settlement rather than updating one running total, so
+        # concurrent settlements don't queue on that row's lock until commit.
+        # get_admin_profit sums every row either way.
+        await conn.execute(
+            "INSERT INTO admin_profit (hour, profit) VALUES (date_trunc('hour', NOW()), $1)",
+            losing_amount
+        )
 
     async def update_admin_profit(self, losing_amount: float):
         try:
             async with self.pool.acquire() as conn:
-                # Ensure the admin_profit table has an entry to update
-                result = await conn.fetchrow("SELECT * FROM admin_profit WHERE id = 1")
-                if result is None:
-                    await conn.execute("INSERT INTO admin_profit (id, profit) VALUES (1, 0)")
-
-                # Update the admin profit by adding the losing amount
-                await conn.execute(
-                    "UPDATE admin_profit SET profit = profit + $1 WHERE id = 1",
-                    losing_amount
-                )
-                print(f"Admin profit updated by ₹{losing_amount}.")
-        except Exception as e:
-            print(f"Error updating admin profit: {e}")
+                await self._add_admin_profit(conn, losing_amount)
+                logger.info("Admin profit updated", extra={"amount": losing_amount})
+        except Exception:
+            logger.error("Error updating admin profit", extra={"amount": losing_amount}, exc_info=True)
 
-    async def get_bet_summary(self):
+    async def get_bet_summary(self, game_id: str = DEFAULT_GAME):
         query = """
             SELECT choice, COUNT(*) AS num_bets, SUM(amount) AS total_amount
             FROM bets
-            WHERE timestamp >= NOW() - INTERVAL '30 minutes'
+            WHERE game_id = $1 AND timestamp >= NOW() - INTERVAL '30 minutes'
             GROUP BY choice
         """
-        rows = await self.pool.fetch(query)
+        rows = await self.pool.fetch(query, game_id)
 
-        summary = {"Heads": {"num_bets": 0, "total_amount": 0}, "Tails": {"num_bets": 0, "total_amount": 0}}
+        summary = {outcome: {"num_bets": 0, "total_amount": 0} for outcome in get_game(game_id).outcomes}
         for row in rows:
             summary[row["choice"]] = {
                 "num_bets": row["num_bets"],
@@ -224,7 +744,10 @@ class Database:
     async def clear_all_bets(self):
         await self.connect()
         async with self.pool.acquire() as conn:
-            await conn.execute("DELETE FROM bets")
+            async with conn.transaction():
+                await conn.execute("DELETE FROM bets")
+                await self._announce_settlement(conn)
+        exposure.clear()
 
     async def award_referral_bonus(self, referrer_id: int):
         try:
@@ -234,78 +757,94 @@ class Database:
                     "UPDATE users SET balance = balance + $1, referral_bonus = referral_bonus + $1, referral_count = referral_count + 1 WHERE user_id = $2", 
                     bonus, referrer_id
                 )
-                print(f"Referral bonus of ₹{bonus} awarded to user {referrer_id}")
-        except Exception as e:
-            print(f"Error awarding referral bonus to user {referrer_id}: {e}")
+                logger.info("Referral bonus awarded", extra={"user_id": referrer_id, "amount": bonus})
+        except Exception:
+            logger.error("Error awarding referral bonus", extra={"user_id": referrer_id}, exc_info=True)
 
     # ───── DEPOSITS & WITHDRAWALS ────
-    async def record_deposit(self, user_id: int, txn_id: str, amount: float) -> bool:
-        try:
-            async with self.pool.acquire() as conn:
-                # Extensive validation
-                if not user_id or not txn_id:
-                    print("❌ Invalid user ID or transaction ID")
-                    return False
+    async def record_deposit(self, user_id: int, txn_id: str, amount: float, idempotency_key: Optional[str] = None) -> bool:
+        if idempotency_key:
+            cached = self.idempotency_cache.get(idempotency_key)
+            if cached is not None:
+                return cached
 
-                # Validate amount
-                if amount <= 0:
-                    print(f"❌ Invalid deposit amount: {amount}")
-                    return False
+        try:
+            # Extensive validation
+            if not user_id or not txn_id:
+                logger.warning("❌ Invalid user ID or transaction ID")
+                return False
 
-                # Check for duplicate transaction
-                existing = await conn.fetchrow(
-                    "SELECT * FROM deposits WHERE transaction_id = $1", 
-                    txn_id
-                )
-                if existing:
-                    print(f"❌ Deposit with transaction ID {txn_id} already exists")
-                    return False
+            # Validate amount
+            if amount <= 0:
+                logger.warning("❌ Invalid deposit amount", extra={"user_id": user_id, "amount": amount})
+                return False
 
-                # Record deposit
-                await conn.execute("""
-                    INSERT INTO deposits (
-                        user_id, 
-                        transaction_id, 
-                        amount, 
-                        timestamp, 
-                        approved,
-                        applied
-                    ) VALUES ($1, $2, $3, NOW(), FALSE, FALSE)
-                """, user_id, txn_id, amount)
-                
-                print(f"✅ Deposit recorded for user {user_id}: ₹{amount}")
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    if idempotency_key:
+                        replayed = await self._claim_idempotency_key(conn, idempotency_key)
+                        if replayed is not None:
+                            self.idempotency_cache.set(idempotency_key, replayed)
+                            return replayed
+
+                    # Record deposit; the unique index on transaction_id settles
+                    # concurrent submissions of the same payment ID.
+                    inserted = await conn.fetchval("""
+                        INSERT INTO deposits (
+                            user_id, 
+                            transaction_id, 
+                            amount, 
+                            timestamp, 
+                            approved,
+                            applied
+                        ) VALUES ($1, $2, $3, NOW(), FALSE, FALSE)
+                        ON CONFLICT (transaction_id) DO NOTHING
+                        RETURNING id
+                    """, user_id, txn_id, amount)
+
+                    if not inserted:
+                        logger.warning("❌ Deposit with this transaction ID already exists", extra={"user_id": user_id, "transaction_id": txn_id})
+                        if idempotency_key:
+                            await self._store_idempotent_result(conn, idempotency_key, False)
+                        return False
 
-                # Check if this is the first approved deposit
-                first_deposit = await conn.fetchval(
-                    "SELECT COUNT(*) = 0 FROM deposits WHERE user_id = $1 AND approved = TRUE", 
-                    user_id
-                )
+                    logger.info("✅ Deposit recorded", extra={"user_id": user_id, "amount": amount, "transaction_id": txn_id})
 
-                # Handle referral bonus
-                if first_deposit and amount >= 100:
-                    referrer_id = await conn.fetchval(
-                        "SELECT referrer_id FROM users WHERE user_id = $1", 
+                    # Check if this is the first approved deposit
+                    first_deposit = await conn.fetchval(
+                        "SELECT COUNT(*) = 0 FROM deposits WHERE user_id = $1 AND approved = TRUE", 
                         user_id
                     )
-                    if referrer_id:
-                        bonus = 10  # Fixed bonus of ₹10
-                        await conn.execute(
-                            "UPDATE users SET balance = balance + $1 WHERE user_id = $2", 
-                            bonus, referrer_id
-                        )
-                        print(f"Referral bonus of ₹{bonus} awarded to user {referrer_id}")
 
-                return True
-        except Exception as e:
-            print(f"❌ Error recording deposit: {e}")
+                    # Handle referral bonus
+                    if first_deposit and amount >= 100:
+                        referrer_id = await conn.fetchval(
+                            "SELECT referrer_id FROM users WHERE user_id = $1", 
+                            user_id
+                        )
+                        if referrer_id:
+                            bonus = 10  # Fixed bonus of ₹10
+                            await conn.execute(
+                                "UPDATE users SET balance = balance + $1 WHERE user_id = $2", 
+                                bonus, referrer_id
+                            )
+                            logger.info("Referral bonus awarded", extra={"user_id": referrer_id, "amount": bonus})
+
+                    if idempotency_key:
+                        await self._store_idempotent_result(conn, idempotency_key, True)
+                    return True
+        except Exception:
+            logger.error("❌ Error recording deposit", extra={"user_id": user_id, "transaction_id": txn_id, "amount": amount}, exc_info=True)
+            if idempotency_key:
+                self.idempotency_cache.pop(idempotency_key)
             return False
     async def mark_welcome_as_shown(self, user_id: int):
         try:
             async with self.pool.acquire() as conn:
                 await conn.execute("UPDATE users SET welcome_shown = TRUE WHERE user_id = $1", user_id)
-                print(f"Welcome message marked as shown for user {user_id}.")
-        except Exception as e:
-            print(f"Error marking welcome as shown for user {user_id}: {e}")
+                logger.debug("Welcome message marked as shown", extra={"user_id": user_id})
+        except Exception:
+            logger.error("Error marking welcome as shown", extra={"user_id": user_id}, exc_info=True)
 
     async def get_pending_deposits(self) -> List[Dict]:
         try:
@@ -325,17 +864,17 @@ class Database:
                     """
                 )
                 return [dict(row) for row in rows]
-        except Exception as e:
-            print(f"❌ Error fetching pending deposits: {e}")
+        except Exception:
+            logger.error("❌ Error fetching pending deposits", exc_info=True)
             return []
 
     async def has_welcome_been_shown(self, user_id: int) -> bool:
         try:
             async with self.pool.acquire() as conn:
-                row = await conn.fetchrow("SELECT welcome_shown FROM users WHERE user_id = $1", user_id)
+                row = await conn.fetchrow(SELECT_WELCOME_SHOWN, user_id)
                 return row["welcome_shown"] if row else False
-        except Exception as e:
-            print(f"Error checking welcome status for user {user_id}: {e}")
+        except Exception:
+            logger.error("Error checking welcome status", extra={"user_id": user_id}, exc_info=True)
             return False
 
     async def approve_deposit(self, deposit_id: int) -> bool:
@@ -347,11 +886,12 @@ class Database:
                         deposit_id
                     )
                     if not deposit:
-                        print(f"Deposit {deposit_id} not found or already approved")
+                        logger.warning("Deposit not found or already approved", extra={"deposit_id": deposit_id})
                         return False
 
+                    # Credited here, so apply_approved_deposits must skip it
                     await conn.execute(
-                        "UPDATE deposits SET approved = TRUE WHERE id = $1", 
+                        "UPDATE deposits SET approved = TRUE, applied = TRUE WHERE id = $1", 
                         deposit_id
                     )
                     await conn.execute(
@@ -359,10 +899,10 @@ class Database:
                         deposit["amount"], 
                         deposit["user_id"]
                     )
-                    print(f"Deposit {deposit_id} approved successfully")
+                    logger.info("Deposit approved", extra={"deposit_id": deposit_id})
                     return True
-        except Exception as e:
-            print(f"Detailed error approving deposit {deposit_id}: {e}")
+        except Exception:
+            logger.error("Error approving deposit", extra={"deposit_id": deposit_id}, exc_info=True)
             return False
     async def approve_withdrawal(self, withdrawal_id: int) -> (bool, Optional[dict]):
         try:
@@ -380,9 +920,12 @@ class Database:
                         "UPDATE withdrawals SET status = 'approved' WHERE id = $1", 
                         withdrawal_id
                     )
+                    await self._enqueue_notifications(conn, {
+                        withdrawal["user_id"]: "✅ Your withdrawal has been approved and processed."
+                    })
                     return True, withdrawal
-        except Exception as e:
-            print(f"Detailed error approving withdrawal {withdrawal_id}: {e}")
+        except Exception:
+            logger.error("Error approving withdrawal", extra={"withdrawal_id": withdrawal_id}, exc_info=True)
             return False, None
 
     async def apply_approved_deposits(self):
@@ -395,18 +938,21 @@ class Database:
             """)
 
             for deposit in deposits:
-                await conn.execute("""
-                    UPDATE users SET balance = balance + $1 WHERE user_id = $2
-                """, deposit["amount"], deposit["user_id"])
-
-                await conn.execute("""
-                    UPDATE deposits SET applied = TRUE WHERE id = $1
-                """, deposit["id"])
+                # Flag and credit together; the flag is claimed first, so a
+                # concurrent run (or a crash in between) can't credit twice.
+                async with conn.transaction():
+                    claimed = await conn.fetchval("""
+                        UPDATE deposits SET applied = TRUE WHERE id = $1 AND applied = FALSE RETURNING id
+                    """, deposit["id"])
+                    if claimed:
+                        await conn.execute("""
+                            UPDATE users SET balance = balance + $1 WHERE user_id = $2
+                        """, deposit["amount"], deposit["user_id"])
 
-            print(f"[✓] Applied {len(deposits)} approved deposit(s) to balances.")
+            logger.info("[✓] Applied approved deposits to balances", extra={"deposits": len(deposits)})
 
     # Database function to approve deposit by transaction ID
-    async def approve_deposit_by_transaction_id(self, transaction_id: str) -> bool:
+    async def approve_deposit_by_transaction_id(self, transaction_id: str) -> (bool, Optional[dict]):
         try:
             await self.connect()
             async with self.pool.acquire() as conn:
@@ -416,10 +962,11 @@ class Database:
                         transaction_id
                     )
                     if not deposit:
-                        return False
+                        return False, None
 
+                    # Credited here, so apply_approved_deposits must skip it
                     await conn.execute(
-                        "UPDATE deposits SET approved = TRUE WHERE transaction_id = $1", 
+                        "UPDATE deposits SET approved = TRUE, applied = TRUE WHERE transaction_id = $1", 
                         transaction_id
                     )
                     await conn.execute(
@@ -427,9 +974,13 @@ class Database:
                         deposit["amount"], 
                         deposit["user_id"]
                     )
+                    await self._enqueue_notifications(conn, {
+                        deposit["user_id"]: "✅ Your deposit has been approved and your balance has been updated."
+                    })
                     return True, deposit
-        except Exception as e:
-            return False
+        except Exception:
+            logger.error("Error approving deposit", extra={"transaction_id": transaction_id}, exc_info=True)
+            return False, None
     async def record_withdrawal(self, user_id: int, upi_id: str, amount: float):
         try:
             await self.connect()
@@ -441,7 +992,7 @@ class Database:
                 )
                 
                 if user_balance < amount:
-                    print(f"Insufficient balance for user {user_id}")
+                    logger.warning("Insufficient balance for withdrawal", extra={"user_id": user_id, "amount": amount})
                     return False
 
                 await conn.execute("""
@@ -449,8 +1000,8 @@ class Database:
                     VALUES ($1, $2, $3, 'pending', NOW())
                 """, user_id, upi_id, amount)
             return True
-        except Exception as e:
-            print(f"Error recording withdrawal: {e}")
+        except Exception:
+            logger.error("Error recording withdrawal", extra={"user_id": user_id, "amount": amount}, exc_info=True)
             return False
 
     async def get_pending_withdrawals(self) -> List[Dict]:
@@ -470,42 +1021,159 @@ class Database:
                     """
                 )
                 return [dict(row) for row in rows]
-        except Exception as e:
-            print(f"Error fetching pending withdrawals: {e}")
+        except Exception:
+            logger.error("Error fetching pending withdrawals", exc_info=True)
             return []
 
     # ───── BETTING ─────
 
-    async def record_bet(self, user_id: int, amount: float, choice: str):
+    async def record_bet(self, user_id: int, amount: float, choice: str, idempotency_key: Optional[str] = None,
+                         game_id: str = DEFAULT_GAME):
+        if idempotency_key:
+            cached = self.idempotency_cache.get(idempotency_key)
+            if cached is not None:
+                return cached
+
+        reserved = placed = False
         try:
             async with self.pool.acquire() as conn:
                 async with conn.transaction():
-                    # First check if user has sufficient balance
-                    current_balance = await conn.fetchval(
-                        "SELECT balance FROM users WHERE user_id = $1",
-                        user_id
-                    )
-                    
-                    if current_balance < amount:
-                        return False, "Insufficient balance"
-
-                    # Record the bet and deduct balance in a single transaction
-                    await conn.execute("""
-                        INSERT INTO bets (user_id, amount, choice, timestamp)
-                        VALUES ($1, $2, $3, NOW())
-                    """, user_id, amount, choice)
-
-                    # Deduct the bet amount from the user's balance
-                    await conn.execute("""
-                        UPDATE users
-                        SET balance = balance - $1
-                        WHERE user_id = $2
-                    """, amount, user_id)
-
-                    return True, "Bet placed successfully"
+                    if idempotency_key:
+                        replayed = await self._claim_idempotency_key(conn, idempotency_key)
+                        if replayed is not None:
+                            replayed = tuple(replayed)
+                            self.idempotency_cache.set(idempotency_key, replayed)
+                            return replayed
+
+                    # Stake caps are checked in memory, only for a bet that
+                    # isn't a replay; the stake is released again below unless
+                    # this call writes the bet.
+                    try:
+                        exposure.reserve(user_id, game_id, choice, amount)
+                        reserved = True
+                    except StakeLimitError as e:
+                        result = (False, str(e))
+                    else:
+                        result = await self._write_bet(conn, user_id, amount, choice, game_id)
+                        placed = result[0]
+
+                    if idempotency_key:
+                        await self._store_idempotent_result(conn, idempotency_key, result)
+                    return result
         except Exception as e:
-            print(f"Error recording bet for user {user_id}: {e}")
+            placed = False
+            logger.error("Error recording bet", extra={"user_id": user_id, "game_id": game_id, "amount": amount}, exc_info=True)
+            if idempotency_key:
+                self.idempotency_cache.pop(idempotency_key)
             return False, f"Error: {str(e)}"
+        finally:
+            if placed:
+                exposure.confirm(user_id, game_id, choice, amount)
+            elif reserved:
+                exposure.release(user_id, game_id, choice, amount)
+
+    async def _write_bet(self, conn, user_id: int, amount: float, choice: str, game_id: str):
+        # First check if user has sufficient balance
+        current_balance = await conn.fetchval(
+            "SELECT balance FROM users WHERE user_id = $1",
+            user_id
+        )
+
+        if current_balance < amount:
+            return False, "Insufficient balance"
+
+        # Record the bet and deduct balance in a single transaction
+        await conn.execute("""
+            INSERT INTO bets (user_id, amount, choice, game_id, timestamp)
+            VALUES ($1, $2, $3, $4, NOW())
+        """, user_id, amount, choice, game_id)
+
+        # Deduct the bet amount from the user's balance and
+        # count it towards the wagering requirements
+        await conn.execute("""
+            UPDATE users
+            SET balance = balance - $1,
+                total_wagered = total_wagered + $1,
+                wagered_bonus = COALESCE(wagered_bonus, 0) + $1,
+                wagered_referral = COALESCE(wagered_referral, 0) + $1
+            WHERE user_id = $2
+        """, amount, user_id)
+
+        bets_placed.inc()
+        bet_stakes.inc(amount=amount)
+        return True, "Bet placed successfully"
+
+    async def place_bet(self, user_id: int, amount: float, choice: str, idempotency_key: Optional[str] = None,
+                        game_id: str = DEFAULT_GAME):
+        """Debit the stake and record the bet in a single statement.
+
+        Returns (placed, balance): the balance after the bet, or the current
+        balance when it was too low. A key already in idempotency_keys (a
+        retry after a restart, or on another worker) returns the stored
+        result before the stake cap is checked. The key is inserted by the
+        same statement, so a concurrent replay aborts on the primary key and
+        returns the stored result too. Raises StakeLimitError, without
+        writing anything, when the bet would go over a stake cap.
+        """
+        if idempotency_key:
+            cached = self.idempotency_cache.get(idempotency_key)
+            if cached is not None:
+                return cached
+            stored = await self.pool.fetchval("SELECT result FROM idempotency_keys WHERE key = $1", idempotency_key)
+            if stored is not None:
+                result = tuple(json.loads(stored))
+                self.idempotency_cache.set(idempotency_key, result)
+                return result
+
+        exposure.reserve(user_id, game_id, choice, amount)
+        placed = False
+        try:
+            row = await self.pool.fetchrow("""
+                WITH debit AS (
+                    UPDATE users
+                    SET balance = balance - $2,
+                        total_wagered = total_wagered + $2,
+                        wagered_bonus = COALESCE(wagered_bonus, 0) + $2,
+                        wagered_referral = COALESCE(wagered_referral, 0) + $2
+                    WHERE user_id = $1 AND balance >= $2
+                    RETURNING balance
+                ), bet AS (
+                    INSERT INTO bets (user_id, amount, choice, game_id, timestamp)
+                    SELECT $1, $2, $3, $5, NOW() FROM debit
+                ), outcome AS (
+                    SELECT
+                        EXISTS (SELECT 1 FROM debit) AS placed,
+                        COALESCE(
+                            (SELECT balance FROM debit),
+                            (SELECT balance FROM users WHERE user_id = $1)
+                        ) AS balance
+                ), claim AS (
+                    INSERT INTO idempotency_keys (key, result)
+                    SELECT $4, jsonb_build_array(placed, balance) FROM outcome
+                    WHERE $4::text IS NOT NULL
+                )
+                SELECT placed, balance FROM outcome
+            """, user_id, amount, choice, idempotency_key, game_id)
+            result = (row["placed"], float(row["balance"] or 0))
+            placed = row["placed"]
+            if placed:
+                bets_placed.inc()
+                bet_stakes.inc(amount=amount)
+        except asyncpg.UniqueViolationError:
+            stored = await self.pool.fetchval("SELECT result FROM idempotency_keys WHERE key = $1", idempotency_key)
+            result = tuple(json.loads(stored))
+        except Exception:
+            logger.error("Error placing bet", extra={"user_id": user_id, "game_id": game_id, "amount": amount}, exc_info=True)
+            return False, None
+        finally:
+            if placed:
+                exposure.confirm(user_id, game_id, choice, amount)
+            else:
+                exposure.release(user_id, game_id, choice, amount)
+
+        if idempotency_key:
+            self.idempotency_cache.set(idempotency_key, result)
+        return result
 
     async def add_bet(self, user_id: int, amount: float, choice: str):
         await self.connect()
@@ -588,47 +1256,53 @@ class Database:
         async with self.pool.acquire() as conn:
             await conn.execute("UPDATE bets SET is_draw = TRUE WHERE id = $1", bet_id)
 
-    async def calculate_hourly_results(self):
-        await self.connect()
-        now = datetime.datetime.now()
-        start_of_hour = now.replace(minute=0, second=0, microsecond=0)
-        end_of_hour = start_of_hour + datetime.timedelta(hours=1)
-
-        async with self.pool.acquire() as conn:
-            totals = await conn.fetch("""
-                SELECT choice, SUM(amount) AS total
-                FROM bets
-                WHERE timestamp >= $1 AND timestamp < $2
-                GROUP BY choice
-            """, start_of_hour, end_of_hour)
-
-            if len(totals) < 2:
-                print("[!] Not enough data to calculate result.")
-                return
-
-            sorted_totals = sorted(totals, key=lambda x: x["total"])
-            winner_choice = sorted_totals[0]["choice"]
-            loser_total = sorted_totals[1]["total"]
-
-            winners = await conn.fetch("""
-                SELECT user_id, amount FROM bets
-                WHERE choice = $1 AND timestamp >= $2 AND timestamp < $3
-            """, winner_choice, start_of_hour, end_of_hour)
-
-            for winner in winners:
-                payout = winner["amount"] * 2
-                await conn.execute("UPDATE users SET balance = balance + $1 WHERE user_id = $2", payout, winner["user_id"])
-
+    # ───── ROUNDS ─────
+    async def open_round(self, starts_at: datetime.datetime, ends_at: datetime.datetime, game_id: str = DEFAULT_GAME):
+        await self.pool.execute("""
+            INSERT INTO rounds (game_id, starts_at, ends_at) VALUES ($3, $1, $2)
+            ON CONFLICT (game_id, starts_at) DO NOTHING
+        """, starts_at, ends_at, game_id)
+
+    async def get_due_rounds(self, now: datetime.datetime) -> List[Dict]:
+        rows = await self.pool.fetch("""
+            SELECT * FROM rounds
+            WHERE ends_at <= $1 AND status <> 'settled'
+            ORDER BY ends_at
+        """, now)
+        return [dict(row) for row in rows]
+
+    async def close_round(self, round_id: int):
+        await self.pool.execute("UPDATE rounds SET status = 'closed' WHERE id = $1", round_id)
+
+    async def mark_round_settled(self, round_id: int, winning_side: Optional[str]):
+        await self.pool.execute("""
+            UPDATE rounds SET status = 'settled', winning_side = $2, settled_at = NOW()
+            WHERE id = $1
+        """, round_id, winning_side)
+
+    async def _mark_rounds_settled(self, conn, winning_side: Optional[str], game_id: str, round_id: Optional[int]):
+        if round_id is not None:
             await conn.execute("""
-                INSERT INTO admin_profit (hour, profit)
-                VALUES ($1, $2)
-            """, start_of_hour, loser_total)
-
+                UPDATE rounds SET status = 'settled', winning_side = $2, settled_at = NOW()
+                WHERE id = $1
+            """, round_id, winning_side)
+        else:
+            # The admin settling by hand covers every closed round of the game.
             await conn.execute("""
-                DELETE FROM bets WHERE timestamp >= $1 AND timestamp < $2
-            """, start_of_hour, end_of_hour)
-
-            print(f"[✓] Hourly result: {winner_choice.upper()} wins. Admin earned ₹{loser_total}")
+                UPDATE rounds SET status = 'settled', winning_side = $1, settled_at = NOW()
+                WHERE status = 'closed' AND game_id = $2
+            """, winning_side, game_id)
+
+    async def get_side_totals(self, game_id: str = DEFAULT_GAME) -> Dict[str, float]:
+        rows = await self.pool.fetch(
+            "SELECT choice, SUM(amount) AS total FROM bets WHERE game_id = $1 GROUP BY choice", game_id
+        )
+        return {row["choice"]: row["total"] for row in rows}
+
+    async def notify(self, chat_id: int, text: str):
+        """Queue a single message in the outbox."""
+        async with self.pool.acquire() as conn:
+            await self._enqueue_notifications(conn, {chat_id: text})
 
     # ───── TRANSACTIONS & PROFIT ─────
     async def record_transaction(self, user_id: int, tx_type: str, amount: float, description: str = ""):
@@ -650,5 +1324,92 @@ class Database:
             row = await conn.fetchrow("SELECT COALESCE(SUM(profit), 0) AS total_profit FROM admin_profit")
             return row["total_profit"]
 
+    # ───── NOTIFICATION OUTBOX ─────
+    async def _enqueue_notifications(self, conn, messages: Dict[int, str], report_to: Optional[int] = None,
+                                     title: str = ""):
+        if not messages:
+            return
+        batch_id = None
+        if report_to is not None:
+            batch_id = await conn.fetchval(
+                "INSERT INTO outbox_batches (report_chat_id, title, total) VALUES ($1, $2, $3) RETURNING id",
+                report_to, title, len(messages)
+            )
+        await conn.executemany(
+            "INSERT INTO outbox (chat_id, text, batch_id) VALUES ($1, $2, $3)",
+            [(chat_id, text, batch_id) for chat_id, text in messages.items()]
+        )
+
+    async def _count_batch_outcomes(self, conn, batch_ids: List[Optional[int]], column: str):
+        """Add finished messages to their batches' `column` ("sent" or "failed")
+        and queue the report of every batch that is now complete."""
+        counts = Counter(batch_id for batch_id in batch_ids if batch_id is not None)
+        if not counts:
+            return
+        # Lock in id order so workers finishing messages of the same batches
+        # can't deadlock each other.
+        await conn.execute(
+            "SELECT id FROM outbox_batches WHERE id = ANY($1::bigint[]) ORDER BY id FOR UPDATE", list(counts)
+        )
+        await conn.execute(f"""
+            UPDATE outbox_batches SET {column} = {column} + counts.n
+            FROM unnest($1::bigint[], $2::int[]) AS counts(id, n)
+            WHERE outbox_batches.id = counts.id
+        """, list(counts), list(counts.values()))
+        finished = await conn.fetch("""
+            UPDATE outbox_batches SET reported = TRUE
+            WHERE id = ANY($1::bigint[]) AND NOT reported AND sent + failed >= total
+            RETURNING report_chat_id, title, sent, failed
+        """, list(counts))
+        for batch in finished:
+            await self._enqueue_notifications(conn, {
+                batch["report_chat_id"]: f"📬 Result notifications for {batch['title']} delivered.\n\n"
+                                         f"✅ Sent: {batch['sent']}\n❌ Failed: {batch['failed']}"
+            })
+
+    async def claim_outbox(self, limit: int, lease_seconds: int) -> List[Dict]:
+        """Lease up to `limit` due messages to the calling worker.
+
+        The lease pushes next_attempt_at forward, so a worker that dies
+        mid-send releases its messages when the lease runs out.
+        """
+        rows = await self.pool.fetch("""
+            UPDATE outbox
+            SET next_attempt_at = NOW() + make_interval(secs => $2), attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+                ORDER BY next_attempt_at
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, chat_id, text, attempts
+        """, limit, lease_seconds)
+        return [dict(row) for row in rows]
+
+    async def complete_outbox(self, outbox_ids: List[int]):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(
+                    "DELETE FROM outbox WHERE id = ANY($1::bigint[]) RETURNING batch_id", outbox_ids
+                )
+                await self._count_batch_outcomes(conn, [row["batch_id"] for row in rows], "sent")
+
+    async def retry_outbox(self, outbox_id: int, error: str, delay_seconds: float):
+        await self.pool.execute("""
+            UPDATE outbox SET last_error = $2, next_attempt_at = NOW() + make_interval(secs => $3)
+            WHERE id = $1
+        """, outbox_id, error, delay_seconds)
+
+    async def dead_letter_outbox(self, outbox_id: int, error: str):
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(
+                    "UPDATE outbox SET status = 'dead', last_error = $2 WHERE id = $1 AND status = 'pending' "
+                    "RETURNING batch_id",
+                    outbox_id, error
+                )
+                await self._count_batch_outcomes(conn, [row["batch_id"] for row in rows], "failed")
+
 # Create a shared instance
 db = Database()
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from database.database import db
+
+logger = logging.getLogger(__name__)
+
+
+def _dump(value) -> str:
+    return json.dumps(value, default=str)
+
+
+class PostgresPersistence(BasePersistence):
+    """Stores ConversationHandler states and user_data in Postgres.
+
+    - user_data is loaded lazily, the first time a user is seen after a
+      restart, instead of all at once on startup.
+    - Only keys whose value changed since the last write are upserted.
+    - Writes from one persistence run (every `update_interval` seconds) are
+      coalesced into a single transaction.
+    """
+
+    def __init__(self, update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._tables_ready = False
+        self._loaded_users: Set[int] = set()
+        # Last written JSON per user and key, used to skip unchanged keys.
+        self._snapshots: Dict[int, Dict[str, str]] = {}
+        self._user_upserts: Dict[Tuple[int, str], str] = {}
+        self._user_deletes: Set[Tuple[int, str]] = set()
+        self._dropped_users: Set[int] = set()
+        self._conversation_writes: Dict[Tuple[str, str], Optional[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _ensure_tables(self):
+        if self._tables_ready:
+            return
+        await db.connect()
+        async with db.pool.acquire() as conn:
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS user_data (
+                    user_id BIGINT NOT NULL,
+                    key TEXT NOT NULL,
+                    value JSONB,
+                    PRIMARY KEY (user_id, key)
+                );
+            ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversations (
+                    name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    state JSONB NOT NULL,
+                    PRIMARY KEY (name, key)
+                );
+            ''')
+        self._tables_ready = True
+
+    # ───── USER DATA ─────
+    async def get_user_data(self) -> Dict[int, dict]:
+        # Nothing up front; see refresh_user_data.
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._loaded_users:
+            return
+        await self._ensure_tables()
+        rows = await db.pool.fetch("SELECT key, value FROM user_data WHERE user_id = $1", user_id)
+        snapshot = {}
+        for row in rows:
+            snapshot[row["key"]] = row["value"]
+            user_data.setdefault(row["key"], json.loads(row["value"]))
+        self._snapshots[user_id] = snapshot
+        self._loaded_users.add(user_id)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        snapshot = self._snapshots.setdefault(user_id, {})
+        current = {key: _dump(value) for key, value in data.items()}
+        for key, value in current.items():
+            if snapshot.get(key) != value:
+                self._user_upserts[(user_id, key)] = value
+                self._user_deletes.discard((user_id, key))
+        for key in snapshot.keys() - current.keys():
+            self._user_deletes.add((user_id, key))
+            self._user_upserts.pop((user_id, key), None)
+        self._snapshots[user_id] = current
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._snapshots.pop(user_id, None)
+        self._dropped_users.add(user_id)
+        for pending in [k for k in self._user_upserts if k[0] == user_id]:
+            del self._user_upserts[pending]
+        self._schedule_flush()
+
+    # ───── CONVERSATIONS ─────
+    async def get_conversations(self, name: str) -> dict:
+        await self._ensure_tables()
+        rows = await db.pool.fetch("SELECT key, state FROM conversations WHERE name = $1", name)
+        return {tuple(json.loads(row["key"])): json.loads(row["state"]) for row in rows}
+
+    async def update_conversation(self, name: str, key, new_state: Optional[object]) -> None:
+        self._conversation_writes[(name, _dump(list(key)))] = None if new_state is None else _dump(new_state)
+        self._schedule_flush()
+
+    # ───── FLUSHING ─────
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        # Let the rest of this persistence run queue its writes first.
+        await asyncio.sleep(0)
+        await self._write()
+
+    async def _write(self):
+        upserts, self._user_upserts = self._user_upserts, {}
+        deletes, self._user_deletes = self._user_deletes, set()
+        dropped, self._dropped_users = self._dropped_users, set()
+        conversations, self._conversation_writes = self._conversation_writes, {}
+        if not (upserts or deletes or dropped or conversations):
+            return
+
+        try:
+            await self._ensure_tables()
+            async with db.pool.acquire() as conn:
+                async with conn.transaction():
+                    if dropped:
+                        await conn.execute("DELETE FROM user_data WHERE user_id = ANY($1::bigint[])", list(dropped))
+                    if deletes:
+                        await conn.executemany("DELETE FROM user_data WHERE user_id = $1 AND key = $2", list(deletes))
+                    if upserts:
+                        await conn.executemany("""
+                            INSERT INTO user_data (user_id, key, value) VALUES ($1, $2, $3)
+                            ON CONFLICT (user_id, key) DO UPDATE SET value = EXCLUDED.value
+                        """, [(user_id, key, value) for (user_id, key), value in upserts.items()])
+
+                    ended = [(name, key) for (name, key), state in conversations.items() if state is None]
+                    active = [(name, key, state) for (name, key), state in conversations.items() if state is not None]
+                    if ended:
+                        await conn.executemany("DELETE FROM conversations WHERE name = $1 AND key = $2", ended)
+                    if active:
+                        await conn.executemany("""
+                            INSERT INTO conversations (name, key, state) VALUES ($1, $2, $3)
+                            ON CONFLICT (name, key) DO UPDATE SET state = EXCLUDED.state
+                        """, active)
+        except Exception:
+            logger.error("Error writing persistence data", exc_info=True)
+            # Retry on the next run; newer values queued meanwhile win.
+            for pending, value in upserts.items():
+                self._user_upserts.setdefault(pending, value)
+            self._user_deletes |= deletes - self._user_upserts.keys()
+            self._dropped_users |= dropped
+            for pending, state in conversations.items():
+                self._conversation_writes.setdefault(pending, state)
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._write()
+
+    # ───── NOT STORED ─────
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+DRAIN_POLL_INTERVAL = 0.1  # seconds
+
+
+async def drain(app, processor, leader, web_runner, timeout: float) -> Dict[str, int]:
+    """Finish in-flight work before shutdown, giving up after `timeout` seconds.
+
+    1. Stop taking updates: stop polling, or close the webhook server so
+       Telegram keeps retrying until the next process is up.
+    2. Let updates already accepted finish; at the deadline, drop what is
+       still queued and cancel what is still running.
+    3. Hand the rest of the deadline to the leader duties (scheduled jobs,
+       broadcasts, outbox batches) via LeaderElection.stop.
+
+    Money-moving handlers and settlement each run in one transaction, so
+    cancelled work is rolled back, never half-applied. Returns the counts
+    logged in the drain report.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+
+    if app.updater.running:
+        await app.updater.stop()
+    if web_runner is not None:
+        await web_runner.cleanup()
+
+    accepted = app.update_queue.qsize() + processor.in_flight
+    while (app.update_queue.qsize() or processor.in_flight) and time.monotonic() < deadline:
+        await asyncio.sleep(DRAIN_POLL_INTERVAL)
+
+    dropped = 0
+    while not app.update_queue.empty():
+        app.update_queue.get_nowait()
+        app.update_queue.task_done()
+        dropped += 1
+    cancelled = processor.cancel_all()
+
+    report = {
+        "updates_drained": max(accepted - dropped - cancelled, 0),
+        "updates_dropped": dropped,
+        "updates_cancelled": cancelled,
+    }
+    duties = await leader.stop(max(deadline - time.monotonic(), 0)) if leader is not None else None
+    report.update(duties or {})
+
+    report["drain_seconds"] = round(time.monotonic() - started, 3)
+    # One record; the leader's duties (paused and cancelled broadcasts
+    # resume on restart) are in it too when this worker was leading.
+    logger.info("🛑 Drained", extra={**report, "drain_deadline_seconds": timeout})
+    return report
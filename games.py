@@ -0,0 +1,61 @@
+"""Registry of the games users can bet on.
+
+Each game has its own outcomes, payout table and rounds. Bets carry the
+game's id, so summaries, side totals and settlement only ever touch one
+game's bets, and rounds of different games settle independently.
+
+To add a game, register a Game with a new id:
+
+    register(Game("wheel", "🎡 Wheel", ("1x", "3x", "10x"), {"1x": 2, "3x": 3, "10x": 10}))
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Game:
+    id: str
+    name: str                   # reply-keyboard button, e.g. "🪙 Coin Flip"
+    outcomes: Tuple[str, ...]
+    payouts: Dict[str, int]     # outcome -> multiple of the stake returned on a win
+
+    def payout(self, outcome: str) -> int:
+        return self.payouts[outcome]
+
+    def cheapest_outcome(self, totals: Dict[str, float]) -> Optional[str]:
+        """Of the outcomes staked on in `totals`, the one whose win pays out
+        least (stake times payout); None if none of them is an outcome."""
+        staked = [outcome for outcome in totals if outcome in self.payouts]
+        if not staked:
+            return None
+        return min(staked, key=lambda outcome: totals[outcome] * self.payout(outcome))
+
+    def outcome_rows(self, per_row: int = 3) -> List[List[str]]:
+        """Outcomes laid out for a reply keyboard."""
+        return [list(self.outcomes[i:i + per_row]) for i in range(0, len(self.outcomes), per_row)]
+
+
+GAMES: Dict[str, Game] = {}
+# Bets and rounds from before games existed belong to this one.
+DEFAULT_GAME = "coin"
+
+
+def register(game: Game) -> Game:
+    missing = set(game.outcomes) - set(game.payouts)
+    if missing:
+        raise ValueError(f"Game {game.id!r} has no payout for {', '.join(sorted(missing))}")
+    GAMES[game.id] = game
+    return game
+
+
+def get_game(game_id: str) -> Optional[Game]:
+    return GAMES.get(game_id)
+
+
+def game_by_name(name: str) -> Optional[Game]:
+    return next((game for game in GAMES.values() if game.name == name), None)
+
+
+register(Game("coin", "🪙 Coin Flip", ("Heads", "Tails"), {"Heads": 2, "Tails": 2}))
+register(Game("dice", "🎲 Dice", ("1", "2", "3", "4", "5", "6"), {str(face): 5 for face in range(1, 7)}))
+register(Game("color", "🎨 Color", ("Red", "Black", "Green"), {"Red": 2, "Black": 2, "Green": 5}))
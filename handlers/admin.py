@@ -0,0 +1,263 @@
+import logging
+
+from telegram import Update, ReplyKeyboardMarkup
+from telegram.ext import ContextTypes, ConversationHandler
+
+from broadcast import start_broadcast
+from config import ADMIN_ID
+from database.database import db
+from outbox import outbox_workers
+from settlement import BetBook, settle
+
+logger = logging.getLogger(__name__)
+
+# Admin-only handlers. bot.py registers them through router.lazy, so this
+# module is imported the first time the admin uses one, not at startup.
+
+# Show Admin Panel
+async def show_admin_controls(update, context):
+    try:
+        context.user_data.clear()  # Clear previous data
+        user_id = update.effective_user.id
+
+        logger.info("Admin panel accessed", extra={"user_id": user_id})
+
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized.")
+            return
+
+        keyboard = ReplyKeyboardMarkup([
+            ["✅ Approve Deposits", "💸 Approve Withdrawals"],
+            ["👥 View Users & Balances", "📊 View Admin Profit"],
+            ["🕒 View Recent Bets", "🧮 View Bet Summary"],
+            ["✅ Accept Result", "📢 Broadcast Message"],
+            ["🔙 Back to Menu"]
+        ], resize_keyboard=True)
+
+        await update.message.reply_text("🔐 Admin Control Panel", reply_markup=keyboard)
+    except Exception:
+        logger.error("Error in show_admin_controls", exc_info=True)
+
+async def prompt_broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized.")
+            return
+
+        await update.message.reply_text("📢 Please enter the message you want to broadcast to all users:")
+        return "AWAITING_BROADCAST_MESSAGE"
+    except Exception:
+        logger.error("Error in prompt_broadcast_message", exc_info=True)
+
+async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        message_text = update.message.text
+
+        # Delivery runs as a background job; its status message is edited
+        # with live progress, so the admin conversation ends right away.
+        # Only the leader delivers; other workers just save it.
+        leader = context.bot_data["leader"]
+        await start_broadcast(context.application, message_text, update.effective_chat.id, deliver=leader.is_leader)
+    except Exception:
+        logger.error("Error in broadcast_message", exc_info=True)
+    return ConversationHandler.END
+
+async def settle_bets(winning_choice: str):
+    try:
+        bets = await db.get_current_bets()
+        result = settle(BetBook.from_records(bets), winning_choice)
+
+        # Net change in admin profit: all stakes in, payouts out
+        net_change = result.house_pnl
+
+        # Update admin profit with the net change
+        await db.update_admin_profit(net_change)
+
+        # Clear bets after settlement
+        await db.clear_all_bets()
+
+        logger.info("Result settled, admin profit updated", extra={"winning_side": winning_choice, "amount": net_change})
+    except Exception:
+        logger.error("Error settling bets", extra={"winning_side": winning_choice}, exc_info=True)
+
+async def accept_result_and_update_profit(winning_choice: str):
+    try:
+        # Fetch all bets
+        bets = await db.get_current_bets()
+        house_pnl = settle(BetBook.from_records(bets), winning_choice).house_pnl
+
+        # Update admin profit with the house's take: stakes in, payouts out
+        await update_admin_profit(house_pnl)
+
+        # Clear bets after settlement
+        await db.clear_all_bets()
+
+        logger.info("Result accepted, admin profit updated", extra={"winning_side": winning_choice, "amount": house_pnl})
+    except Exception:
+        logger.error("Error accepting result and updating admin profit", extra={"winning_side": winning_choice}, exc_info=True)
+
+async def update_admin_profit(losing_amount: float):
+    try:
+        async with db.pool.acquire() as conn:
+            # Ensure the admin_profit table has an entry to update
+            result = await conn.fetchrow("SELECT * FROM admin_profit WHERE id = 1")
+            if result is None:
+                await conn.execute("INSERT INTO admin_profit (id, profit) VALUES (1, 0)")
+
+            # Update the admin profit by adding the losing amount
+            await conn.execute(
+                "UPDATE admin_profit SET profit = profit + $1 WHERE id = 1",
+                losing_amount
+            )
+            logger.info("Admin profit updated", extra={"amount": losing_amount})
+    except Exception:
+        logger.error("Error updating admin profit", extra={"amount": losing_amount}, exc_info=True)
+
+async def approve_deposit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized to approve deposits.")
+            return
+
+        if len(context.args) != 1:
+            await update.message.reply_text("❌ Please provide a valid transaction ID. Usage: /ad <transaction_id>")
+            return
+
+        transaction_id = context.args[0]
+
+        # Verify and approve the deposit
+        success, deposit_record = await db.approve_deposit_by_transaction_id(transaction_id)
+        if success:
+            # The user's notification was queued in the approval transaction
+            outbox_workers.wake()
+            await update.message.reply_text(f"✅ Deposit with transaction ID {transaction_id} approved successfully.")
+        else:
+            await update.message.reply_text(f"❌ Failed to approve deposit with transaction ID {transaction_id}.")
+    except Exception:
+        await update.message.reply_text("❌ An error occurred while processing your request.")
+        logger.error("Error in approve_deposit_command", exc_info=True)
+
+# Show pending deposits (admin only)
+async def show_pending_deposits(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized.")
+            return
+
+        deposits = await db.get_pending_deposits()
+        if not deposits:
+            await update.message.reply_text("No pending deposits.")
+            return
+
+        for deposit in deposits:
+            message = (
+                f"User ID: {deposit['user_id']}\n"
+                f"Amount: ₹{deposit['amount']}\n"
+                f"Txn ID: {deposit['transaction_id']}\n"
+                f"To approve, use: /approve {deposit['transaction_id']}"
+            )
+            await update.message.reply_text(message)
+    except Exception:
+        await update.message.reply_text("❌ An error occurred while fetching pending deposits.")
+
+async def approve_withdrawal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized to approve withdrawals.")
+            return
+
+        if len(context.args) != 1:
+            await update.message.reply_text("❌ Please provide a valid withdrawal ID. Usage: /aw <withdrawal_id>")
+            return
+
+        withdrawal_id = int(context.args[0])
+
+        # Verify and approve the withdrawal
+        success, withdrawal_record = await db.approve_withdrawal(withdrawal_id)
+        if success:
+            # The user's notification was queued in the approval transaction
+            outbox_workers.wake()
+            await update.message.reply_text(f"✅ Withdrawal with ID {withdrawal_id} approved successfully.")
+        else:
+            await update.message.reply_text(f"❌ Failed to approve withdrawal with ID {withdrawal_id}.")
+    except Exception:
+        await update.message.reply_text("❌ An error occurred while processing your request.")
+        logger.error("Error in approve_withdrawal_command", exc_info=True)
+
+async def show_pending_withdrawals(update, context):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized.")
+            return
+
+        withdrawals = await db.get_pending_withdrawals()
+        if not withdrawals:
+            await update.message.reply_text("No pending withdrawals.")
+            return
+
+        for wd in withdrawals:
+            message = (
+                f"User ID: {wd['user_id']}\n"
+                f"Amount: ₹{wd['amount']}\n"
+                f"UPI: {wd['upi_id']}\n"
+                f"To approve, use: /approve {wd['id']}"
+            )
+            await update.message.reply_text(message)
+    except Exception:
+        logger.error("Error in show_pending_withdrawals", exc_info=True)
+
+async def show_all_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized.")
+            return
+
+        users = await db.get_all_users_and_balances()
+        if not users:
+            await update.message.reply_text("No users found.")
+            return
+
+        msg = "👥 All Users & Balances:\n\n"
+        for row in users:
+            msg += f"🧑 User ID: {row['user_id']} | 💰 Balance: ₹{row['balance']}\n"
+
+        await update.message.reply_text(msg)
+    except Exception:
+        logger.error("Error in show_all_users", exc_info=True)
+
+async def show_admin_profit(update, context):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized.")
+            return
+
+        profit = await db.get_admin_profit()
+        await update.message.reply_text(f"📊 Total Admin Profit: ₹{profit}")
+    except Exception:
+        logger.error("Error in show_admin_profit", exc_info=True)
+
+async def show_recent_bets(update, context):
+    try:
+        user_id = update.effective_user.id
+        if user_id != ADMIN_ID:
+            await update.message.reply_text("❌ You are not authorized.")
+            return
+
+        bets = await db.get_recent_bets()
+        if not bets:
+            await update.message.reply_text("No recent bets in the last hour.")
+            return
+
+        msg = "🕒 Recent Bets:\n"
+        for bet in bets:
+            msg += f"🆔 {bet['user_id']} — ₹{bet['amount']} on {bet['choice']} ({bet['timestamp']})\n"
+        await update.message.reply_text(msg)
+    except Exception:
+        logger.error("Error in show_recent_bets", exc_info=True)
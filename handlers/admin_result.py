@@ -1,7 +1,10 @@
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filters
+from telegram.ext import ContextTypes, ConversationHandler
 
 from database.database import db
+from games import DEFAULT_GAME, GAMES, game_by_name, get_game
+from outbox import outbox_workers
+from risk import exposure
 
 # Set your actual admin Telegram ID here
 ADMIN_ID = 1090201656
@@ -17,72 +20,91 @@ def admin_only(func):
 # --- View Bet Summary ---
 @admin_only
 async def view_bet_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    summary = await db.get_bet_summary()
-    msg = "📊 *Bet Summary (Last 30 minutes)*:\n\n"
-    for side, data in summary.items():
-        msg += f"*{side}* - ₹{data['total_amount'] or 0} from {data['num_bets']} users\n"
+    msg = "📊 *Bet Summary (Last 30 minutes)*:\n"
+    for game in GAMES.values():
+        summary = await db.get_bet_summary(game.id)
+        msg += f"\n{game.name}\n"
+        liabilities = exposure.liabilities(game.id)
+        for side, data in summary.items():
+            msg += (f"*{side}* - ₹{data['total_amount'] or 0} from {data['num_bets']} users"
+                    f" (house pays ₹{liabilities.get(side, 0)} net if it wins)\n")
     await update.message.reply_text(msg, parse_mode="Markdown")
 
-# --- Accept Result: Ask Winning Side ---
+# --- Accept Result: Ask Game, Then Winning Side ---
 @admin_only
 async def accept_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = ReplyKeyboardMarkup(
-        [["Heads", "Tails"], ["🔙 Back to Menu"]],
+        [[game.name for game in GAMES.values()], ["🔙 Back to Menu"]],
         resize_keyboard=True
     )
-    await update.message.reply_text("✅ Select the *winning side*:", reply_markup=keyboard, parse_mode="Markdown")
+    await update.message.reply_text("✅ Select the *game* to settle:", reply_markup=keyboard, parse_mode="Markdown")
+    return "AWAITING_RESULT_GAME"
+
+@admin_only
+async def handle_result_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    game = game_by_name(update.message.text.strip())
+    if game is None:
+        await update.message.reply_text("❌ Invalid game. Please choose one from the keyboard.")
+        return "AWAITING_RESULT_GAME"
+
+    context.user_data["result_game"] = game.id
+    keyboard = ReplyKeyboardMarkup(game.outcome_rows() + [["🔙 Back to Menu"]], resize_keyboard=True)
+    await update.message.reply_text(
+        f"✅ {game.name}: select the *winning side*:", reply_markup=keyboard, parse_mode="Markdown"
+    )
     return "AWAITING_RESULT_CHOICE"
 
+# --- Settlement Notifications ---
+def build_settlement_messages(choice: str, settlement, game_id: str = DEFAULT_GAME) -> dict:
+    """One message per user with their net result over all bets in the round."""
+    result = f"{get_game(game_id).name}: {choice}"
+    messages = {}
+    for user_id, stake, returned, num_bets in zip(
+        settlement.user_ids.tolist(), settlement.staked.tolist(),
+        settlement.returned.tolist(), settlement.num_bets.tolist()
+    ):
+        net = returned - stake
+        bets = f"{num_bets} bet{'s' if num_bets > 1 else ''}"
+        if net > 0:
+            messages[user_id] = f"🎉 You WON ₹{net} net on {bets}! ({result})"
+        elif net < 0:
+            messages[user_id] = f"❌ You LOST ₹{-net} net on {bets}. Better luck next time! ({result})"
+        else:
+            messages[user_id] = f"⚖️ You broke even on {bets}. ({result})"
+    return messages
+
 # --- Handle Final Choice & Notify Users ---
 @admin_only
 async def handle_result_choice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     choice = update.message.text.strip()
+    game = get_game(context.user_data.get("result_game", DEFAULT_GAME))
 
-    # Check if the user selected a new option from the main menu
-    if choice == "🔙 Back to Menu":
-        await update.message.reply_text("🔙 Returning to the main menu.", reply_markup=ReplyKeyboardRemove())
-        return ConversationHandler.END
-
-    if choice not in ["Heads", "Tails"]:
-        await update.message.reply_text("❌ Invalid choice. Please choose Heads or Tails.")
+    if choice not in game.outcomes:
+        await update.message.reply_text(f"❌ Invalid choice. Please choose one of: {', '.join(game.outcomes)}.")
         return "AWAITING_RESULT_CHOICE"
 
-    # Approve result and get winner/loser lists
-    winners, losers = await db.approve_result(choice)
-
-    # Notify winners
-    for user_id, amount in winners:
-        try:
-            await context.bot.send_message(user_id, f"🎉 You WON ₹{amount * 2}! ({choice})")
-        except Exception:
-            pass  # User might have blocked the bot
-
-    # Notify losers
-    for user_id, amount in losers:
-        try:
-            await context.bot.send_message(user_id, f"❌ You LOST ₹{amount}. Better luck next time!")
-        except Exception:
-            pass
-
-    # Reset the bet summary
-    await db.clear_all_bets()
+    # Approve result and settle every bet of this game; one coalesced message
+    # per user goes into the outbox in the same transaction as the payouts,
+    # and the admin gets a delivery report once they have all gone out.
+    # The game's closed rounds are marked settled in the same transaction.
+    result = await db.approve_result(
+        choice, lambda settlement: build_settlement_messages(choice, settlement, game.id), game.id,
+        report_to=update.effective_chat.id
+    )
+    if result is None:
+        # Rolled back: nothing was paid out and the bets are still open.
+        await update.message.reply_text(
+            f"❌ Could not settle {game.name}. No bets were paid out; please try again.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return ConversationHandler.END
+    outbox_workers.wake()
 
     await update.message.reply_text(
-        f"🎯 *Result Approved!*\n\n🏆 Winning Side: *{choice}*\n"
-        f"🎉 Winners: {len(winners)}\n💸 Losers: {len(losers)}",
+        f"🎯 *Result Approved!*\n\n🎮 Game: *{game.name}*\n🏆 Winning Side: *{choice}*\n"
+        f"🎉 Winners: {result.winning_bets}\n💸 Losers: {result.losing_bets}\n"
+        f"📬 Notifying {len(result)} users…",
         parse_mode="Markdown",
         reply_markup=ReplyKeyboardRemove()
     )
     return ConversationHandler.END
-
-# Admin Result Handler Setup
-admin_result_handler = ConversationHandler(
-    entry_points=[MessageHandler(filters.Regex("✅ Accept Result"), accept_result)],
-    states={
-        "AWAITING_RESULT_CHOICE": [
-            MessageHandler(filters.TEXT & ~filters.COMMAND, handle_result_choice)
-        ]
-    },
-    fallbacks=[MessageHandler(filters.Regex("🔙 Back to Menu"), accept_result)],
-    per_user=True,
-)
\ No newline at end of file
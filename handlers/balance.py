@@ -1,12 +1,16 @@
+import logging
+
 from telegram import Update
 from telegram.ext import ContextTypes
-from database.database import db
+from database.database import db, SELECT_BALANCE_SUMMARY
+
+logger = logging.getLogger(__name__)
 
 async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
         async with db.pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT balance, referral_balance, referral_count FROM users WHERE user_id = $1", user_id)
+            row = await conn.fetchrow(SELECT_BALANCE_SUMMARY, user_id)
             if row:
                 balance = row["balance"]
                 referral_bonus = row["referral_balance"]
@@ -19,5 +23,5 @@ async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await update.message.reply_text(message)
             else:
                 await update.message.reply_text("User not found.")
-    except Exception as e:
-        print(f"Error showing balance for user {user_id}: {e}")
\ No newline at end of file
+    except Exception:
+        logger.error("Error showing balance", extra={"user_id": user_id}, exc_info=True)
\ No newline at end of file
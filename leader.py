@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Optional
+
+import asyncpg
+
+from database.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Any constant shared by all workers; identifies the leader lock.
+LEADER_LOCK_ID = 7_305_118
+LEADER_CHECK_INTERVAL = 5  # seconds
+
+
+class LeaderElection:
+    """Holds a session-level advisory lock on a dedicated connection.
+
+    Only one session can hold the lock, so only one process is leader. The
+    connection is checked every `check_interval` seconds; losing it
+    demotes this process right away.
+    """
+
+    def __init__(self, on_elected: Callable[[], Awaitable], on_demoted: Callable[..., Awaitable],
+                 while_leader: Optional[Callable[[], Awaitable]] = None, dsn: str = DATABASE_URL,
+                 check_interval: float = LEADER_CHECK_INTERVAL):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.while_leader = while_leader
+        self.dsn = dsn
+        self.check_interval = check_interval
+        self.is_leader = False
+        self._conn = None
+        self._task = None
+
+    async def _try_lead(self) -> bool:
+        if self._conn is None or self._conn.is_closed():
+            self._conn = await asyncpg.connect(self.dsn)
+        return await self._conn.fetchval("SELECT pg_try_advisory_lock($1)", LEADER_LOCK_ID)
+
+    async def _still_leading(self) -> bool:
+        try:
+            # The lock lives as long as the session; a working session means we still hold it.
+            await self._conn.fetchval("SELECT 1", timeout=self.check_interval)
+            return True
+        except Exception:
+            logger.warning("Lost leader connection", exc_info=True)
+            return False
+
+    async def _demote(self, *args):
+        self.is_leader = False
+        result = None
+        try:
+            result = await self.on_demoted(*args)
+        except Exception:
+            logger.error("Error stopping leader duties", exc_info=True)
+        if self._conn is not None and not self._conn.is_closed():
+            self._conn.terminate()
+        self._conn = None
+        return result
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.is_leader:
+                    if await self._try_lead():
+                        self.is_leader = True
+                        logger.info("👑 This process is now the leader", extra={"pid": os.getpid()})
+                        await self.on_elected()
+                elif not await self._still_leading():
+                    # Back off for one interval so a healthy worker can win the lock.
+                    await self._demote()
+                if self.is_leader and self.while_leader:
+                    await self.while_leader()
+            except Exception:
+                logger.error("Error in leader election", exc_info=True)
+                if self.is_leader:
+                    await self._demote()
+                elif self._conn is not None:
+                    self._conn.terminate()
+                    self._conn = None
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, *args):
+        """Leave the election. If this process is leader, on_demoted is
+        called with `args` (e.g. a drain timeout) and its result returned."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            return await self._demote(*args)
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+        return None
@@ -0,0 +1,132 @@
+"""Structured, non-blocking logging.
+
+Handlers and database code only put records on an in-memory queue (a
+QueueHandler); a QueueListener thread formats them as JSON lines and
+writes them to stdout, so a slow log pipe never stalls the event loop.
+That thread still shares the GIL with the loop: with a fast pipe a log
+call costs the loop about as much as the print() it replaced, and the
+gain is that it never waits on the pipe (see benchmarks/logging_overhead.py).
+
+    logger.info("Bet placed", extra={"user_id": user_id, "amount": amount})
+    logger.info("User already exists", extra={"user_id": user_id, "sample": 100})
+
+`sample=N` keeps one record in N per logger and message; kept records
+carry `"sampled": N` so counts can be scaled back up. Use a constant
+message with the details in `extra` for anything sampled.
+"""
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+from config import LOG_FORMAT, LOG_LEVEL
+
+# Attributes every LogRecord has; anything else was passed in `extra`.
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "sample"}
+
+# Chatty third-party loggers: httpx logs every Bot API call at INFO.
+QUIET_LOGGERS = ("httpx", "httpcore", "apscheduler", "aiohttp.access")
+
+_listeners = []
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                  .isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain lines, with the record's `extra` fields appended as key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in _STANDARD_ATTRS)
+        if not fields:
+            return line
+        # Keep a traceback below the fields rather than in front of them.
+        first, _, rest = line.partition("\n")
+        return f"{first} {fields}" + (f"\n{rest}" if rest else "")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the message on the caller's thread;
+        # the listener is in the same process, so hand the record over as is
+        # and format it on the writer thread.
+        return record
+
+
+class SampleFilter(logging.Filter):
+    """Keeps one in `sample` records per (logger, message)."""
+
+    def __init__(self):
+        super().__init__()
+        self._seen = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, "sample", 0)
+        if every <= 1:
+            return True
+        key = (record.name, record.msg)
+        seen = self._seen.get(key, 0)
+        self._seen[key] = seen + 1
+        if seen % every:
+            return False
+        record.sampled = every
+        return True
+
+
+def queue_to(target: logging.Handler) -> logging.Handler:
+    """A handler that queues records for `target`, written by its own thread."""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, target)
+    listener.start()
+    _listeners.append(listener)
+    return _QueueHandler(log_queue)
+
+
+def setup_logging(level: str = LOG_LEVEL, stream=None):
+    """Route the root logger through a queue to a background writer thread."""
+    root = logging.getLogger()
+    if any(isinstance(handler, _QueueHandler) for handler in root.handlers):
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    # Neither format prints the caller, thread or process, so don't make
+    # every log call on the event loop look them up.
+    logging._srcfile = None
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+
+    handler = queue_to(output)
+    handler.addFilter(SampleFilter())
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def stop_logging():
+    """Write out everything still queued and stop the writer threads."""
+    while _listeners:
+        _listeners.pop().stop()
+    root = logging.getLogger()
+    root.handlers[:] = [handler for handler in root.handlers if not isinstance(handler, _QueueHandler)]
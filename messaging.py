@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.request import HTTPXRequest
+
+from metrics import telegram_requests
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows roughly 30 messages per second per bot across all chats.
+# Stay a little under it so interactive replies still get through.
+TELEGRAM_GLOBAL_RATE = 25
+
+
+class TokenBucket:
+    """Async token bucket shared by every task that sends through it."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (used for RetryAfter)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class CountingRequest(HTTPXRequest):
+    """HTTPXRequest that counts every Bot API call by method and status.
+
+    Covers handler replies as well as broadcasts and notifications, since
+    they all go through the bot's request object. Calls made while handling
+    a traced update are recorded as "telegram" spans.
+    """
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        try:
+            with span("telegram", method=api_method):
+                status, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            telegram_requests.inc(api_method, "error")
+            raise
+        telegram_requests.inc(api_method, status)
+        return status, payload
+
+
+# Shared by broadcasts and notifications so together they respect the limit.
+telegram_limiter = TokenBucket(TELEGRAM_GLOBAL_RATE)
+
+
+# Outcomes of a single send attempt.
+SENT = "sent"
+RETRY = "retry"  # flood control or a network error; worth trying again
+FAILED = "failed"  # blocked, chat not found, bad request; don't retry
+
+
+async def try_send(bot, chat_id: int, text: str, limiter: TokenBucket = telegram_limiter,
+                   **kwargs) -> Tuple[str, Optional[Exception]]:
+    """Make one send attempt under `limiter` and classify the result."""
+    await limiter.acquire()
+    try:
+        await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        return SENT, None
+    except RetryAfter as e:
+        # Flood control applies to the whole bot, so pause everyone.
+        limiter.pause(float(e.retry_after))
+        return RETRY, e
+    except (Forbidden, BadRequest) as e:
+        return FAILED, e
+    except (TimedOut, NetworkError) as e:
+        return RETRY, e
+    except Exception as e:
+        return FAILED, e
+
+
+async def send_with_retry(bot, chat_id: int, text: str, limiter: TokenBucket = telegram_limiter,
+                          max_attempts: int = 5, **kwargs) -> bool:
+    """Send one message under `limiter`, honouring RetryAfter.
+
+    Returns False when the user blocked the bot, the chat is gone, or the
+    message still failed after `max_attempts`.
+    """
+    for attempt in range(max_attempts):
+        outcome, error = await try_send(bot, chat_id, text, limiter, **kwargs)
+        if outcome == SENT:
+            return True
+        if outcome == FAILED:
+            logger.warning("Failed to send message", extra={"user_id": chat_id, "error": str(error)})
+            return False
+        if not isinstance(error, RetryAfter):
+            await asyncio.sleep(2 ** attempt)
+    logger.warning("Giving up on message", extra={"user_id": chat_id, "attempts": max_attempts})
+    return False
+
+
+async def deliver_all(bot, messages: Dict[int, str], concurrency: int = 20,
+                      limiter: TokenBucket = telegram_limiter) -> Tuple[int, int]:
+    """Send one message per chat with at most `concurrency` in flight.
+
+    Returns (sent, failed).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def deliver(chat_id: int, text: str) -> bool:
+        async with semaphore:
+            return await send_with_retry(bot, chat_id, text, limiter)
+
+    results = await asyncio.gather(*(deliver(chat_id, text) for chat_id, text in messages.items()))
+    sent = sum(results)
+    return sent, len(results) - sent
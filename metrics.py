@@ -0,0 +1,185 @@
+"""Prometheus text-format metrics, served on /metrics by webserver.py.
+
+Recording a value is a dict update (plus a bisect for histograms), so it
+is cheap enough for every update and every Bot API call. Values that are
+cheaper to read than to track (pool size, loop lag, stake totals) are
+read when /metrics is scraped instead.
+"""
+import bisect
+import functools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Seconds; from a cache hit up to a slow settlement.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: List["Metric"] = []
+_collectors: List[Callable[[], Awaitable]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Read at scrape time instead of being recorded.
+        self.function = function
+        self._values: Dict[Tuple, float] = {}
+        if not self.labelnames and function is None:
+            self._values[()] = 0
+        _metrics.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        if self.function is not None:
+            lines.append(f"{self.name} {float(self.function())}")
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def clear(self):
+        self._values.clear()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last)], sum.
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def collector(func: Callable[[], Awaitable]):
+    """Register a coroutine that refreshes gauges before each scrape."""
+    _collectors.append(func)
+    return func
+
+
+async def render() -> str:
+    for refresh in _collectors:
+        try:
+            await refresh()
+        except Exception:
+            logger.error("Error collecting metrics", extra={"collector": refresh.__name__}, exc_info=True)
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ───── METRICS ─────
+handler_latency = Histogram("bot_handler_seconds", "Handler run time by handler and outcome.",
+                            ["handler", "outcome"])
+telegram_requests = Counter("bot_telegram_requests_total", "Bot API calls by method and HTTP status "
+                            "(429 is RetryAfter; 'error' is a network failure).", ["method", "status"])
+bets_placed = Counter("bot_bets_total", "Bets placed.")
+bet_stakes = Counter("bot_bet_stakes_total", "Sum of stakes of bets placed.")
+round_stakes = Gauge("bot_round_stake", "Stake on each side of each game's current round.", ["game", "side"])
+round_liability = Gauge("bot_round_liability", "Net house loss on each game's open bets if a side wins "
+                        "(this process's exposure tracker).", ["game", "side"])
+
+
+# ───── HANDLER TIMING ─────
+def timed(callback, name: str = None):
+    """Wrap a handler callback to count and time its runs (and trace them)."""
+    name = name or callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with span("handler", handler=name):
+                result = await callback(update, context)
+            outcome = "ok"
+            return result
+        finally:
+            handler_latency.observe(time.perf_counter() - started, name, outcome)
+
+    return wrapper
+
+
+def _instrument(handler):
+    for inner in ("entry_points", "fallbacks"):
+        for child in getattr(handler, inner, None) or []:
+            _instrument(child)
+    states = getattr(handler, "states", None)
+    if isinstance(states, dict):
+        for handlers in states.values():
+            for child in handlers:
+                _instrument(child)
+
+    callback = getattr(handler, "callback", None)
+    if callback is None or hasattr(callback, "__wrapped__"):
+        return
+    owner = getattr(callback, "__self__", None)
+    if isinstance(getattr(owner, "routes", None), dict):
+        # A ButtonRouter: time each route rather than the shared dispatch.
+        owner.routes = {text: route if hasattr(route, "__wrapped__") else timed(route)
+                        for text, route in owner.routes.items()}
+    else:
+        handler.callback = timed(callback)
+
+
+def instrument(application):
+    """Time every handler registered on `application`, including the ones
+    inside ConversationHandlers and the ButtonRouter's routes."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument(handler)
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from config import ADMIN_ID, FLOOD_RATE, FLOOD_BURST, SHED_POOL_WAIT_MS, SHED_MAX_PENDING_UPDATES
+from database.database import db
+from utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = "⏳ We're a little busy right now. Please try again in a moment."
+POOL_PROBE_INTERVAL = 0.5  # seconds
+
+# Counters exported on /health and /metrics.
+stats = {"throttled": 0, "shed": 0}
+
+
+class FloodControl:
+    """Per-user token bucket, checked synchronously on every update."""
+
+    def __init__(self, rate: float, burst: int, max_users: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        # (tokens, last refill) per user; idle users age out of the LRU.
+        self._buckets = LRUCache(maxsize=max_users)
+
+    def allow(self, user_id: int) -> bool:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        self._buckets.set(user_id, (tokens - 1 if allowed else tokens, now))
+        return allowed
+
+
+class LoadMonitor:
+    """Tracks how long a pool acquire takes by probing it in the background,
+    and how late the probe's own sleep wakes up (event-loop lag).
+
+    Timing the handlers' own acquires would mean wrapping every Database
+    method; a probe every half second gives the same signal for free.
+    """
+
+    def __init__(self, max_wait_ms: float, max_pending: int):
+        self.max_wait_ms = max_wait_ms
+        self.max_pending = max_pending
+        self.pool_wait_ms = 0.0
+        self.loop_lag_ms = 0.0
+        self._task = None
+
+    async def _probe(self):
+        while True:
+            if db.pool is not None:
+                started = time.perf_counter()
+                try:
+                    async with db.pool.acquire():
+                        pass
+                    wait_ms = (time.perf_counter() - started) * 1000
+                    # Smooth out single slow acquires.
+                    self.pool_wait_ms = 0.7 * self.pool_wait_ms + 0.3 * wait_ms
+                except Exception:
+                    logger.error("Error probing database pool", exc_info=True)
+            # A late wake-up means something is blocking the event loop.
+            expected = time.perf_counter() + POOL_PROBE_INTERVAL
+            await asyncio.sleep(POOL_PROBE_INTERVAL)
+            self.loop_lag_ms = max(time.perf_counter() - expected, 0) * 1000
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def overloaded(self, pending_updates: int) -> bool:
+        return self.pool_wait_ms > self.max_wait_ms or pending_updates > self.max_pending
+
+
+flood_control = FloodControl(FLOOD_RATE, FLOOD_BURST)
+load_monitor = LoadMonitor(SHED_POOL_WAIT_MS, SHED_MAX_PENDING_UPDATES)
+
+
+async def guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs before every other handler (group -2)."""
+    user = update.effective_user
+    if user is None or user.id == ADMIN_ID:
+        return
+
+    if not flood_control.allow(user.id):
+        # Drop silently; answering a flood would only add to it.
+        stats["throttled"] += 1
+        if update.callback_query:
+            await update.callback_query.answer()
+        raise ApplicationHandlerStop
+
+    if load_monitor.overloaded(context.application.update_processor.current_concurrent_updates):
+        stats["shed"] += 1
+        if stats["shed"] % 100 == 1:
+            logger.warning("⚠️ Shedding load",
+                           extra={"pool_wait_ms": round(load_monitor.pool_wait_ms), "shed": stats["shed"]})
+        if update.callback_query:
+            await update.callback_query.answer(BUSY_MESSAGE)
+        elif update.effective_message:
+            await update.effective_message.reply_text(BUSY_MESSAGE)
+        raise ApplicationHandlerStop
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from config import OUTBOX_WORKERS
+from database.database import db
+from messaging import FAILED, SENT, try_send
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_POLL_INTERVAL = 1.0  # seconds to wait when the outbox is empty
+OUTBOX_LEASE_SECONDS = 60
+OUTBOX_MAX_ATTEMPTS = 8
+
+
+class OutboxWorkers:
+    """Drains the outbox table written by approve_* in the same transaction
+    as the balance change.
+
+    Messages are leased in batches with SKIP LOCKED, so any number of
+    workers (in any number of processes) can drain concurrently. Failed
+    sends back off exponentially; blocked users and messages that keep
+    failing are dead-lettered with their last error.
+    """
+
+    def __init__(self, num_workers: int):
+        self.num_workers = num_workers
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._bot = None
+        self._stopping = False
+        # Messages claimed and not yet completed, per worker.
+        self._claimed: List[int] = [0] * num_workers
+
+    def start(self, bot):
+        self._bot = bot
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run(n)) for n in range(self.num_workers)]
+
+    def wake(self):
+        """Tell idle workers new messages were committed."""
+        self._wake.set()
+
+    async def stop(self, timeout: float = 0) -> Tuple[int, int]:
+        """Let workers finish their current batch for up to `timeout` seconds.
+
+        Returns (messages finished, messages abandoned). Abandoned messages
+        keep their lease until it expires and are then sent again.
+        """
+        self._stopping = True
+        self._wake.set()
+        claimed = sum(self._claimed)
+        if self._tasks and timeout > 0:
+            await asyncio.wait(self._tasks, timeout=timeout)
+        abandoned = sum(self._claimed)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._claimed = [0] * self.num_workers
+        self._stopping = False
+        return claimed - abandoned, abandoned
+
+    async def _run(self, worker: int):
+        while not self._stopping:
+            try:
+                batch = await db.claim_outbox(OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS)
+            except Exception:
+                logger.error("Outbox worker failed to claim messages", extra={"worker": worker}, exc_info=True)
+                batch = []
+
+            if not batch:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._claimed[worker] = len(batch)
+            results = await asyncio.gather(*(self._deliver(message) for message in batch))
+            sent = [outbox_id for outbox_id in results if outbox_id is not None]
+            if sent:
+                try:
+                    await db.complete_outbox(sent)
+                except Exception:
+                    # Their leases expire and they are sent again; at-least-once.
+                    logger.error("Outbox worker failed to complete messages", extra={"worker": worker, "outbox_ids": sent}, exc_info=True)
+            self._claimed[worker] = 0
+
+    async def _deliver(self, message: dict) -> Optional[int]:
+        outcome, error = await try_send(self._bot, message["chat_id"], message["text"])
+        if outcome == SENT:
+            return message["id"]
+        try:
+            if outcome == FAILED or message["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                logger.warning("Dead-lettering notification", extra={"outbox_id": message["id"], "user_id": message["chat_id"],
+                                                                     "error": str(error)})
+                await db.dead_letter_outbox(message["id"], str(error))
+            else:
+                await db.retry_outbox(message["id"], str(error), min(2 ** message["attempts"], 300))
+        except Exception:
+            logger.error("Error updating notification", extra={"outbox_id": message["id"], "chat_id": message["chat_id"]}, exc_info=True)
+        return None
+
+
+# Shared instance
+outbox_workers = OutboxWorkers(OUTBOX_WORKERS)
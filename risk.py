@@ -0,0 +1,195 @@
+"""Live exposure of the house on each game's open bets.
+
+The tracker keeps, per game, the total stake of the open (unsettled) bets,
+the stake on each outcome and each user's stake, so that:
+
+- the net house liability if an outcome wins (what it pays on that outcome
+  minus everything staked) is known at all times without a query,
+- per-user and per-round stake caps are checked before a bet reaches the
+  database, and
+- the admin is alerted the first time an outcome's liability crosses
+  EXPOSURE_ALERT_THRESHOLD in a round.
+
+Database.record_bet/place_bet reserve a bet's stake before writing it, then
+confirm it once written or release it if the write doesn't happen;
+approve_result removes the bets it settled. The state is per process: it is
+loaded from the bets table at startup, then follows the bets this process
+places. Settlements and clears made by any process are announced with a
+NOTIFY, and every process reloads that game's open stakes from the bets
+table (Database.watch_settlements), keeping the reservations still in
+flight on top. Behind cluster.py a user's updates always reach the same
+worker, so per-user caps follow that user's bets in the open round; round
+caps and alerts see the round as of the last reload plus the worker's own
+bets.
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from config import EXPOSURE_ALERT_THRESHOLD, MAX_ROUND_STAKE, MAX_USER_ROUND_STAKE
+from games import get_game
+
+logger = logging.getLogger(__name__)
+
+
+class StakeLimitError(Exception):
+    """A bet would go over a stake cap; the message is shown to the user."""
+
+
+class GameExposure:
+    __slots__ = ("total", "by_outcome", "by_user", "alerted")
+
+    def __init__(self):
+        self.total = 0
+        self.by_outcome: Dict[str, int] = {}
+        self.by_user: Dict[int, int] = {}
+        # Outcomes already alerted on this round.
+        self.alerted = set()
+
+
+class ExposureTracker:
+    def __init__(self, max_user_stake: int = MAX_USER_ROUND_STAKE, max_round_stake: int = MAX_ROUND_STAKE,
+                 alert_threshold: int = EXPOSURE_ALERT_THRESHOLD):
+        # 0 turns a limit off.
+        self.max_user_stake = max_user_stake
+        self.max_round_stake = max_round_stake
+        self.alert_threshold = alert_threshold
+        # Called as on_alert(game_id, outcome, liability) when a threshold is crossed.
+        self.on_alert: Optional[Callable[[str, str, int], Awaitable]] = None
+        self._games: Dict[str, GameExposure] = {}
+        # Stakes reserved and not yet confirmed or released, per
+        # (game_id, user_id, outcome); a reload can't see them in the table yet.
+        self._in_flight: Counter = Counter()
+        self._alert_tasks = set()
+
+    def _game(self, game_id: str) -> GameExposure:
+        exposure = self._games.get(game_id)
+        if exposure is None:
+            exposure = self._games[game_id] = GameExposure()
+        return exposure
+
+    # ───── LIABILITY ─────
+    def liability(self, game_id: str, outcome: str) -> int:
+        """What the house loses on the open bets if `outcome` wins (negative: it wins)."""
+        exposure = self._games.get(game_id)
+        if exposure is None:
+            return 0
+        return exposure.by_outcome.get(outcome, 0) * get_game(game_id).payout(outcome) - exposure.total
+
+    def liabilities(self, game_id: str) -> Dict[str, int]:
+        return {outcome: self.liability(game_id, outcome) for outcome in get_game(game_id).outcomes}
+
+    def user_stake(self, game_id: str, user_id: int) -> int:
+        exposure = self._games.get(game_id)
+        return exposure.by_user.get(user_id, 0) if exposure else 0
+
+    # ───── BETS ─────
+    def reserve(self, user_id: int, game_id: str, outcome: str, amount: int):
+        """Count a bet about to be written, or raise StakeLimitError.
+
+        Check and update happen with no await in between, so concurrent
+        bets can't both slip under a cap.
+        """
+        exposure = self._game(game_id)
+        user_stake = exposure.by_user.get(user_id, 0)
+        if self.max_user_stake and user_stake + amount > self.max_user_stake:
+            raise StakeLimitError(
+                f"You can stake at most ₹{self.max_user_stake} per round (₹{user_stake} already placed)."
+            )
+        if self.max_round_stake and exposure.total + amount > self.max_round_stake:
+            raise StakeLimitError("This round is full. Please bet in the next round.")
+
+        self._add(exposure, user_id, outcome, amount)
+        self._in_flight[game_id, user_id, outcome] += amount
+        self._check_alert(game_id, exposure, outcome)
+
+    def confirm(self, user_id: int, game_id: str, outcome: str, amount: int):
+        """A reserved bet was written; from now on reloads find it in the table."""
+        self._take_in_flight(user_id, game_id, outcome, amount)
+
+    def release(self, user_id: int, game_id: str, outcome: str, amount: int):
+        """Undo reserve() for a bet that wasn't written."""
+        self._take_in_flight(user_id, game_id, outcome, amount)
+        self._add(self._game(game_id), user_id, outcome, -amount)
+
+    def _take_in_flight(self, user_id: int, game_id: str, outcome: str, amount: int):
+        key = (game_id, user_id, outcome)
+        self._in_flight[key] -= amount
+        if self._in_flight[key] <= 0:
+            del self._in_flight[key]
+
+    @staticmethod
+    def _add(exposure: GameExposure, user_id: int, outcome: str, amount: int):
+        exposure.total += amount
+        exposure.by_outcome[outcome] = exposure.by_outcome.get(outcome, 0) + amount
+        remaining = exposure.by_user.get(user_id, 0) + amount
+        if remaining > 0:
+            exposure.by_user[user_id] = remaining
+        else:
+            exposure.by_user.pop(user_id, None)
+
+    def remove_settled(self, game_id: str, outcome_stakes: Dict[str, int], user_stakes: Iterable[Tuple[int, int]]):
+        """Take a settled round's bets out; bets placed meanwhile stay counted."""
+        exposure = self._game(game_id)
+        for outcome, stake in outcome_stakes.items():
+            exposure.total -= stake
+            exposure.by_outcome[outcome] = exposure.by_outcome.get(outcome, 0) - stake
+        for user_id, stake in user_stakes:
+            remaining = exposure.by_user.get(user_id, 0) - stake
+            if remaining > 0:
+                exposure.by_user[user_id] = remaining
+            else:
+                exposure.by_user.pop(user_id, None)
+        # A new round: alert again if it gets as lopsided.
+        exposure.alerted.clear()
+
+    def clear(self, game_id: Optional[str] = None):
+        """Drop the open stakes of one game (or all); bets in flight stay."""
+        self.load([], game_id)
+
+    def load(self, rows: Iterable, game_id: Optional[str] = None):
+        """Replace the state of one game (or all) with open stakes from the database.
+
+        `rows` have game_id, user_id, choice and amount (summed per group).
+        Reservations still in flight are added on top, since the rows can't
+        include them yet. A reload starts the game's alerts afresh.
+        """
+        if game_id is None:
+            self._games.clear()
+        else:
+            self._games.pop(game_id, None)
+        for row in rows:
+            if get_game(row["game_id"]) is None or game_id not in (None, row["game_id"]):
+                continue
+            self._add(self._game(row["game_id"]), row["user_id"], row["choice"], int(row["amount"]))
+        for (bet_game_id, user_id, outcome), amount in self._in_flight.items():
+            if game_id in (None, bet_game_id):
+                self._add(self._game(bet_game_id), user_id, outcome, amount)
+
+    # ───── ALERTS ─────
+    def _check_alert(self, game_id: str, exposure: GameExposure, outcome: str):
+        # Only the outcome just bet on can have gone up.
+        if not self.alert_threshold or outcome in exposure.alerted:
+            return
+        liability = self.liability(game_id, outcome)
+        if liability < self.alert_threshold:
+            return
+        exposure.alerted.add(outcome)
+        logger.warning("Exposure threshold reached",
+                       extra={"game_id": game_id, "outcome": outcome, "liability": liability})
+        if self.on_alert is not None:
+            # Sent in the background so the bet that crossed isn't held up.
+            task = asyncio.get_running_loop().create_task(self._send_alert(game_id, outcome, liability))
+            self._alert_tasks.add(task)
+            task.add_done_callback(self._alert_tasks.discard)
+
+    async def _send_alert(self, game_id: str, outcome: str, liability: int):
+        try:
+            await self.on_alert(game_id, outcome, liability)
+        except Exception:
+            logger.error("Error sending exposure alert", extra={"game": game_id, "outcome": outcome, "liability": liability}, exc_info=True)
+
+
+# Shared instance
+exposure = ExposureTracker()
@@ -0,0 +1,57 @@
+import importlib
+from typing import Awaitable, Callable, Dict, Iterable
+
+from telegram import Message, Update
+from telegram.ext import ContextTypes, MessageHandler, filters
+
+Callback = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable]
+
+
+def lazy(target: str) -> Callback:
+    """Callback for "module:function" that imports the module on first use.
+
+    For handlers most users never reach (the admin panel), so their
+    modules stay out of startup.
+    """
+    module_name, name = target.split(":")
+    callback = None
+
+    async def call(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        nonlocal callback
+        if callback is None:
+            callback = getattr(importlib.import_module(module_name), name)
+        return await callback(update, context)
+
+    call.__qualname__ = call.__name__ = name
+    return call
+
+
+class ButtonFilter(filters.MessageFilter):
+    """Matches messages whose text is exactly one of `buttons` (hash lookup)."""
+
+    __slots__ = ("buttons",)
+
+    def __init__(self, buttons: Iterable[str]):
+        self.buttons = frozenset(buttons)
+        super().__init__(name=f"ButtonFilter({len(self.buttons)} buttons)")
+
+    def filter(self, message: Message) -> bool:
+        return message.text in self.buttons
+
+
+class ButtonRouter:
+    """Routes reply-keyboard button presses through one dispatch table.
+
+    A single MessageHandler replaces one handler per button, so the cost of
+    routing a message doesn't grow with the number of buttons.
+    """
+
+    def __init__(self, routes: Dict[str, Callback]):
+        self.routes = dict(routes)
+        self.filter = ButtonFilter(self.routes)
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        return await self.routes[update.message.text](update, context)
+
+    def handler(self) -> MessageHandler:
+        return MessageHandler(self.filter, self.dispatch)
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from config import ADMIN_ID, AUTO_SETTLE, ROUND_MINUTES
+from database.database import db
+from games import DEFAULT_GAME, GAMES, Game, get_game
+from handlers.admin_result import build_settlement_messages
+from outbox import outbox_workers
+from settlement import BetBook, settle
+
+logger = logging.getLogger(__name__)
+
+
+def pick_winning_side(totals: Dict[str, float], game: Game) -> Optional[str]:
+    """The side whose win costs the house least wins: the smallest stake
+    times that side's payout (Game.cheapest_outcome).
+    With bets on fewer than two sides there is no result and the bets carry
+    over to the next round."""
+    if len(totals) < 2:
+        return None
+    return game.cheapest_outcome(totals)
+
+
+class RoundScheduler:
+    """Opens and closes betting rounds on a fixed cadence, one round per game.
+
+    All state lives in the rounds table, and every tick handles *all* rounds
+    that are due, so a restart catches up on anything it missed instead of
+    skipping a settlement. Games are handled side by side: a slow or failing
+    settlement of one game doesn't hold up the others. `store` is the Database by default; the simulation
+    below swaps in an in-memory store and a virtual clock.
+    """
+
+    def __init__(self, store=db, round_minutes: int = ROUND_MINUTES, auto_settle: bool = AUTO_SETTLE,
+                 clock=datetime.datetime.now):
+        self.store = store
+        self.round_minutes = round_minutes
+        self.auto_settle = auto_settle
+        self.clock = clock
+        self.scheduler = None
+        self._running = set()
+
+    def round_bounds(self, now: datetime.datetime):
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed = int((now - midnight).total_seconds() // 60)
+        starts_at = midnight + datetime.timedelta(minutes=elapsed - elapsed % self.round_minutes)
+        return starts_at, starts_at + datetime.timedelta(minutes=self.round_minutes)
+
+    async def tick(self, now: datetime.datetime = None):
+        now = now or self.clock()
+        due_by_game = {}
+        for due in await self.store.get_due_rounds(now):
+            due_by_game.setdefault(due.get("game_id", DEFAULT_GAME), []).append(due)
+        results = await asyncio.gather(
+            *(self.close_rounds(rounds) for rounds in due_by_game.values()), return_exceptions=True
+        )
+        for game_id, result in zip(due_by_game, results):
+            if isinstance(result, Exception):
+                logger.error("Error closing rounds", extra={"game_id": game_id}, exc_info=result)
+
+        starts_at, ends_at = self.round_bounds(now)
+        for game_id in GAMES:
+            await self.store.open_round(starts_at, ends_at, game_id)
+
+    async def close_rounds(self, rounds: List[Dict]):
+        """Close (and maybe settle) one game's due rounds, oldest first."""
+        for due in rounds:
+            game = get_game(due.get("game_id", DEFAULT_GAME))
+            if due["status"] == "open":
+                await self.store.close_round(due["id"])
+                logger.info("[✓] Round closed", extra={"game_id": game.id, "round_id": due["id"], "ends_at": due["ends_at"]})
+                if not self.auto_settle:
+                    await self.store.notify(
+                        ADMIN_ID, f"⏰ {game.name} betting round closed. Use ✅ Accept Result to settle it."
+                    )
+            if self.auto_settle:
+                await self.settle(due)
+
+    async def settle(self, due: Dict):
+        game = get_game(due.get("game_id", DEFAULT_GAME))
+        # The winner is picked from the round's bets in the settlement's own
+        # transaction, which also marks the round settled.
+        result = await self.store.settle_round(
+            due, lambda totals: pick_winning_side(totals, game),
+            lambda settlement: build_settlement_messages(settlement.winning_side, settlement, game.id)
+        )
+        if result:
+            outbox_workers.wake()
+        # winning_side None: no result, the bets carry over.
+        logger.info("[✓] Round settled", extra={"game_id": game.id, "round_id": due["id"],
+                                                "winning_side": result.winning_side if result else None})
+
+    async def _run_safely(self, job):
+        task = asyncio.current_task()
+        self._running.add(task)
+        try:
+            await job()
+        except Exception:
+            logger.error("Error in scheduled job", extra={"job": job.__name__}, exc_info=True)
+        finally:
+            self._running.discard(task)
+
+    def start(self):
+        """Run the round tick and maintenance jobs on APScheduler."""
+        self.scheduler = AsyncIOScheduler()
+        job_defaults = {"coalesce": True, "max_instances": 1, "misfire_grace_time": None}
+        self.scheduler.add_job(
+            self._run_safely, IntervalTrigger(minutes=1), args=[self.tick],
+            next_run_time=datetime.datetime.now(), id="round_tick", **job_defaults
+        )
+        self.scheduler.add_job(
+            self._run_safely, IntervalTrigger(minutes=5), args=[db.apply_approved_deposits],
+            id="apply_approved_deposits", **job_defaults
+        )
+        self.scheduler.add_job(
+            self._run_safely, IntervalTrigger(hours=1), args=[db.purge_idempotency_keys],
+            id="purge_idempotency_keys", **job_defaults
+        )
+        self.scheduler.start()
+
+    async def stop(self, timeout: float = 0) -> Tuple[int, int]:
+        """Stop scheduling and give running jobs up to `timeout` seconds.
+
+        Returns (jobs finished, jobs cancelled). Settlement runs in one
+        transaction, so a cancelled job leaves nothing half-applied and the
+        next tick picks the round up again.
+        """
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False)
+            self.scheduler = None
+        running = list(self._running)
+        if running and timeout > 0:
+            await asyncio.wait(running, timeout=timeout)
+        abandoned = [task for task in running if not task.done()]
+        for task in abandoned:
+            task.cancel()
+        await asyncio.gather(*abandoned, return_exceptions=True)
+        return len(running) - len(abandoned), len(abandoned)
+
+
+# Shared instance
+round_scheduler = RoundScheduler()
+
+
+# ───── SIMULATION ─────
+class MemoryRoundStore:
+    """In-memory stand-in for the Database methods RoundScheduler uses."""
+
+    def __init__(self):
+        self.rounds: List[Dict] = []
+        self.bets: List[Dict] = []
+        self.notifications = 0
+        self.house_profit = 0
+
+    async def open_round(self, starts_at, ends_at, game_id=DEFAULT_GAME):
+        if not any(r["starts_at"] == starts_at and r["game_id"] == game_id for r in self.rounds):
+            self.rounds.append({"id": len(self.rounds) + 1, "game_id": game_id, "starts_at": starts_at,
+                                "ends_at": ends_at, "status": "open", "winning_side": None})
+
+    async def get_due_rounds(self, now):
+        return [dict(r) for r in self.rounds if r["ends_at"] <= now and r["status"] != "settled"]
+
+    async def close_round(self, round_id):
+        self.rounds[round_id - 1]["status"] = "closed"
+
+    async def mark_round_settled(self, round_id, winning_side):
+        self.rounds[round_id - 1].update(status="settled", winning_side=winning_side)
+
+    async def settle_round(self, due, pick_winner, build_notifications=None):
+        game_id = due["game_id"]
+        due_now = [bet["game_id"] == game_id and bet["placed_at"] < due["ends_at"] for bet in self.bets]
+        bets = [bet for bet, is_due in zip(self.bets, due_now) if is_due]
+        book = BetBook.from_records(bets)
+        winning_choice = pick_winner(book.side_totals())
+        if winning_choice is None:
+            await self.mark_round_settled(due["id"], None)
+            return None
+        await self.mark_round_settled(due["id"], winning_choice)
+        self.bets = [bet for bet, is_due in zip(self.bets, due_now) if not is_due]
+        result = settle(book, winning_choice, get_game(game_id).payout(winning_choice))
+        self.house_profit += result.house_pnl
+        if build_notifications:
+            self.notifications += len(build_notifications(result))
+        return result
+
+    async def notify(self, chat_id, text):
+        self.notifications += 1
+
+
+async def simulate(days: int, round_minutes: int, bets_per_round: int):
+    """Run `days` of rounds against a virtual clock, one tick per minute."""
+    store = MemoryRoundStore()
+    now = datetime.datetime(2024, 1, 1)
+    rounds = RoundScheduler(store, round_minutes, auto_settle=True, clock=lambda: now)
+
+    started = time.perf_counter()
+    end = now + datetime.timedelta(days=days)
+    while now < end:
+        await rounds.tick()
+        # Spread the round's bets over its minutes.
+        for _ in range(bets_per_round // round_minutes):
+            game = random.choice(list(GAMES.values()))
+            store.bets.append({"user_id": random.randint(1, 1000), "amount": random.choice([10, 50, 100]),
+                               "choice": random.choice(game.outcomes), "game_id": game.id, "placed_at": now})
+        now += datetime.timedelta(minutes=1)
+    await rounds.tick()
+    elapsed = time.perf_counter() - started
+
+    settled = [r for r in store.rounds if r["status"] == "settled"]
+    print(f"Simulated {days} day(s) in {elapsed:.2f}s")
+    print(f"Rounds settled: {len(settled)} (expected {len(GAMES) * days * 24 * 60 // round_minutes})")
+    print(f"Notifications queued: {store.notifications}")
+    print(f"House profit: ₹{store.house_profit}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Round scheduler")
+    parser.add_argument("--simulate", action="store_true", help="run rounds against a virtual clock")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--bets-per-round", type=int, default=300)
+    args = parser.parse_args()
+    if args.simulate:
+        asyncio.run(simulate(args.days, ROUND_MINUTES, args.bets_per_round))
+    else:
+        parser.print_help()
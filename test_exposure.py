@@ -0,0 +1,204 @@
+"""Exposure tracking across cluster workers.
+
+Each worker has its own ExposureTracker; bets are written to one shared
+table and settlements are announced to every worker, which reloads the
+game's open stakes the way Database.load_exposure does on a NOTIFY.
+
+    python -m pytest test_exposure.py
+"""
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+import asyncpg
+import pytest
+
+os.environ.setdefault("ADMIN_ID", "0")
+
+import database.database as database_module  # noqa: E402
+from database.database import Database  # noqa: E402
+from risk import ExposureTracker, StakeLimitError  # noqa: E402
+
+CAP = 10000
+
+
+class Cluster:
+    """Workers sharing a bets table, with settlements broadcast to all."""
+
+    def __init__(self, workers: int):
+        self.workers = [ExposureTracker(max_user_stake=CAP, max_round_stake=0, alert_threshold=0)
+                        for _ in range(workers)]
+        self.bets = []
+
+    def open_stakes(self, game_id: str):
+        stakes = {}
+        for bet in self.bets:
+            if bet["game_id"] == game_id:
+                key = (bet["game_id"], bet["user_id"], bet["choice"])
+                stakes[key] = stakes.get(key, 0) + bet["amount"]
+        return [{"game_id": g, "user_id": u, "choice": c, "amount": a} for (g, u, c), a in stakes.items()]
+
+    def place(self, worker: int, user_id: int, amount: int, choice: str = "Heads", game_id: str = "coin"):
+        tracker = self.workers[worker]
+        tracker.reserve(user_id, game_id, choice, amount)
+        self.bets.append({"game_id": game_id, "user_id": user_id, "choice": choice, "amount": amount})
+        tracker.confirm(user_id, game_id, choice, amount)
+
+    def settle(self, worker: int, game_id: str = "coin"):
+        settled = [bet for bet in self.bets if bet["game_id"] == game_id]
+        self.bets = [bet for bet in self.bets if bet["game_id"] != game_id]
+        outcome_stakes, user_stakes = {}, {}
+        for bet in settled:
+            outcome_stakes[bet["choice"]] = outcome_stakes.get(bet["choice"], 0) + bet["amount"]
+            user_stakes[bet["user_id"]] = user_stakes.get(bet["user_id"], 0) + bet["amount"]
+        self.workers[worker].remove_settled(game_id, outcome_stakes, user_stakes.items())
+        # The NOTIFY reaches every worker, the settling one included.
+        for tracker in self.workers:
+            tracker.load(self.open_stakes(game_id), game_id)
+
+
+def test_settlement_on_another_worker_frees_the_cap():
+    cluster = Cluster(2)
+    for _ in range(2):
+        cluster.place(0, user_id=1, amount=5000)
+        cluster.settle(1)
+    # Third round: only this round's stakes count towards the cap.
+    cluster.place(0, user_id=1, amount=5000)
+    assert cluster.workers[0].user_stake("coin", 1) == 5000
+
+
+def test_cap_still_holds_within_a_round():
+    cluster = Cluster(2)
+    cluster.place(0, user_id=1, amount=6000)
+    try:
+        cluster.place(0, user_id=1, amount=6000)
+    except StakeLimitError:
+        pass
+    else:
+        raise AssertionError("second bet should go over the cap")
+    assert cluster.workers[0].user_stake("coin", 1) == 6000
+
+
+def test_reload_keeps_bets_in_flight():
+    cluster = Cluster(2)
+    tracker = cluster.workers[0]
+    tracker.reserve(1, "coin", "Heads", 3000)  # not written yet
+    cluster.settle(1)
+    assert tracker.user_stake("coin", 1) == 3000
+    tracker.release(1, "coin", "Heads", 3000)
+    assert tracker.user_stake("coin", 1) == 0
+    assert tracker.liability("coin", "Heads") == 0
+
+
+def test_reload_of_one_game_leaves_the_others():
+    cluster = Cluster(2)
+    cluster.place(0, user_id=1, amount=1000, choice="Red", game_id="color")
+    cluster.place(0, user_id=1, amount=1000)
+    cluster.settle(1, "coin")
+    assert cluster.workers[0].user_stake("coin", 1) == 0
+    assert cluster.workers[0].user_stake("color", 1) == 1000
+
+
+# ───── DATABASE PATHS ─────
+@pytest.fixture
+def tracker(monkeypatch):
+    """A fresh tracker in place of the shared one, so tests don't leak stakes."""
+    fresh = ExposureTracker(max_user_stake=CAP, max_round_stake=0, alert_threshold=0)
+    monkeypatch.setattr(database_module, "exposure", fresh)
+    return fresh
+
+
+class FakeConnection:
+    """Just enough of asyncpg for the betting and exposure methods."""
+
+    def __init__(self, stored: dict, bets: list):
+        self.stored = stored  # idempotency key -> JSON result
+        self.bets = bets
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def fetchval(self, query, *args):
+        if "INSERT INTO idempotency_keys" in query:
+            if args[0] in self.stored:
+                return None
+            self.stored[args[0]] = None
+            return args[0]
+        if "FROM idempotency_keys" in query:
+            return self.stored.get(args[0])
+        if "SELECT balance" in query:
+            return 100000
+
+    async def execute(self, query, *args):
+        if "UPDATE idempotency_keys" in query:
+            self.stored[args[0]] = args[1]
+        elif "INSERT INTO bets" in query:
+            self.bets.append(args)
+
+    async def fetchrow(self, query, user_id, amount, choice, key, game_id):
+        # place_bet's single statement: the key insert fails on a replay.
+        if key in self.stored:
+            raise asyncpg.UniqueViolationError("duplicate key")
+        self.bets.append((user_id, amount, choice, game_id))
+        if key is not None:
+            self.stored[key] = json.dumps([True, 100000 - amount])
+        return {"placed": True, "balance": 100000 - amount}
+
+    async def fetch(self, query, game_id):
+        return [row for row in self.bets if game_id is None or row["game_id"] == game_id]
+
+
+def worker(connection: FakeConnection) -> Database:
+    """A Database with its own (empty) in-process caches, like a restarted worker."""
+    database = Database()
+    database.pool = connection
+    return database
+
+
+def test_replayed_place_bet_at_the_cap_returns_the_stored_result(tracker):
+    async def run():
+        connection = FakeConnection({}, [])
+        first = await worker(connection).place_bet(1, CAP, "Heads", "bet-1")
+        assert first == (True, 100000 - CAP)
+        # The retry misses the LRU (another worker, or after a restart).
+        assert await worker(connection).place_bet(1, CAP, "Heads", "bet-1") == first
+        assert len(connection.bets) == 1
+        assert tracker.user_stake("coin", 1) == CAP
+        with pytest.raises(StakeLimitError):
+            await worker(connection).place_bet(1, 10, "Heads", "bet-2")
+
+    asyncio.run(run())
+
+
+def test_replayed_record_bet_at_the_cap_returns_the_stored_result(tracker):
+    async def run():
+        connection = FakeConnection({}, [])
+        first = await worker(connection).record_bet(1, CAP, "Heads", "bet-1")
+        assert first == (True, "Bet placed successfully")
+        assert await worker(connection).record_bet(1, CAP, "Heads", "bet-1") == first
+        assert len(connection.bets) == 1
+        assert tracker.user_stake("coin", 1) == CAP
+        refused, message = await worker(connection).record_bet(1, 10, "Heads", "bet-2")
+        assert not refused and "at most" in message
+        assert tracker.user_stake("coin", 1) == CAP
+
+    asyncio.run(run())
+
+
+def test_settlement_notification_reloads_the_game(tracker):
+    async def run():
+        connection = FakeConnection({}, [{"game_id": "coin", "user_id": 2, "choice": "Tails", "amount": 700}])
+        database = worker(connection)
+        tracker.load([{"game_id": "coin", "user_id": 1, "choice": "Heads", "amount": 9000}])
+        database._on_settlement(None, 0, "bets_settled", "coin")
+        await asyncio.gather(*database._exposure_tasks)
+        assert tracker.user_stake("coin", 1) == 0
+        assert tracker.user_stake("coin", 2) == 700
+
+    asyncio.run(run())
@@ -0,0 +1,214 @@
+"""Per-update tracing.
+
+A sampled update gets a trace, carried in a contextvar while it is
+processed. Spans are recorded around waiting for a worker, the handler
+(metrics.timed), pool acquires and queries (database.TracedPool) and Bot
+API calls (messaging.CountingRequest). Finished traces are written as
+JSON lines to TRACE_FILE by a background thread (logs.queue_to).
+
+Updates that aren't sampled carry no trace, and a span outside a trace
+costs one contextvar lookup.
+
+    python tracing.py [--file traces.jsonl] [--top 10] [--handler bet_choose_side]
+
+prints the slowest recorded traces with their spans.
+"""
+import argparse
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from config import TRACE_FILE, TRACE_SAMPLE_RATE
+from logs import queue_to
+
+# Keep the sink from filling the disk: rotate at this size, keep one old file.
+TRACE_FILE_MAX_BYTES = 50 * 1024 * 1024
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("span", default=None)
+
+_sink = logging.getLogger("traces")
+_sink.propagate = False
+
+
+class Trace:
+    __slots__ = ("trace_id", "attrs", "started", "started_at", "spans")
+
+    def __init__(self, **attrs):
+        self.trace_id = os.urandom(8).hex()
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[Dict] = []
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "ts": self.started_at,
+            "ms": round((time.perf_counter() - self.started) * 1000, 3),
+            **self.attrs,
+            "spans": list(self.spans),
+        }
+
+
+class Span:
+    __slots__ = ("trace", "record", "started", "token")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict):
+        self.trace = trace
+        self.record = {"id": len(trace.spans), "parent": _current_span.get(), "name": name, **attrs}
+        trace.spans.append(self.record)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.record["start_ms"] = round((self.started - self.trace.started) * 1000, 3)
+        self.token = _current_span.set(self.record["id"])
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record["ms"] = round((time.perf_counter() - self.started) * 1000, 3)
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        _current_span.reset(self.token)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """`with span("query", sql=...):` records a span if a trace is active."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return Span(trace, name, attrs)
+
+
+def annotate(**attrs):
+    """Add attributes to the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def start_trace(sample_rate: float = TRACE_SAMPLE_RATE, **attrs) -> Optional[contextvars.Token]:
+    """Start a trace for the current task with probability `sample_rate`.
+
+    Returns a token for finish_trace, or None if this one isn't sampled.
+    """
+    if not sample_rate or random.random() >= sample_rate:
+        return None
+    return _current_trace.set(Trace(**attrs))
+
+
+def finish_trace(token: Optional[contextvars.Token]):
+    if token is None:
+        return
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if _sink.handlers:
+        _sink.info(trace.to_dict())
+
+
+class _TraceFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str, ensure_ascii=False)
+
+
+def setup_tracing(path: str = TRACE_FILE):
+    """Write finished traces to `path` from a background thread."""
+    if _sink.handlers or not TRACE_SAMPLE_RATE:
+        return
+    output = logging.handlers.RotatingFileHandler(path, maxBytes=TRACE_FILE_MAX_BYTES, backupCount=1,
+                                                  encoding="utf-8")
+    output.setFormatter(_TraceFormatter())
+    _sink.addHandler(queue_to(output))
+    _sink.setLevel(logging.INFO)
+
+
+# ───── CLI ─────
+def load_traces(path: str) -> List[Dict]:
+    traces = []
+    for name in (path + ".1", path):
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    pass  # a line cut short by rotation or a crash
+    return traces
+
+
+def format_trace(trace: Dict) -> List[str]:
+    attrs = " ".join(f"{key}={value}" for key, value in trace.items()
+                     if key not in ("trace_id", "ts", "ms", "spans"))
+    lines = [f"{trace['ms']:9.1f} ms  {trace['trace_id']}  {attrs}"]
+    children: Dict[Optional[int], List[Dict]] = {}
+    for record in trace["spans"]:
+        children.setdefault(record.get("parent"), []).append(record)
+
+    def walk(parent: Optional[int], depth: int):
+        for record in sorted(children.get(parent, []), key=lambda r: r.get("start_ms", 0)):
+            details = " ".join(f"{key}={value}" for key, value in record.items()
+                               if key not in ("id", "parent", "name", "start_ms", "ms"))
+            lines.append(f"{'':11}{record.get('start_ms', 0):+9.1f} {record.get('ms', 0):8.1f} ms  "
+                         f"{'  ' * depth}{record['name']} {details}".rstrip())
+            walk(record["id"], depth + 1)
+
+    walk(None, 0)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the slowest recorded update traces")
+    parser.add_argument("--file", default=TRACE_FILE)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--handler", help="only traces that ran this handler")
+    args = parser.parse_args()
+
+    traces = load_traces(args.file)
+    if args.handler:
+        traces = [trace for trace in traces
+                  if any(record.get("handler") == args.handler for record in trace["spans"])]
+    if not traces:
+        print(f"No traces in {args.file}.")
+        return
+
+    # Where the time goes across all of them, by span name (nested spans
+    # are included in their parent's time too).
+    totals: Dict[str, float] = {}
+    for trace in traces:
+        for record in trace["spans"]:
+            totals[record["name"]] = totals.get(record["name"], 0) + record.get("ms", 0)
+    durations = sorted(trace["ms"] for trace in traces)
+    print(f"{len(traces)} traces, p50 {durations[len(durations) // 2]:.1f} ms, "
+          f"p95 {durations[int(len(durations) * 0.95)]:.1f} ms, max {durations[-1]:.1f} ms")
+    for name, total in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {name:<16} {total / len(traces):8.2f} ms per trace")
+
+    for trace in sorted(traces, key=lambda t: t["ms"], reverse=True)[:args.top]:
+        print()
+        print("\n".join(format_trace(trace)))
+
+
+if __name__ == "__main__":
+    main()
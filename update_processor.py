@@ -0,0 +1,111 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Optional, Set
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from tracing import annotate, finish_trace, span, start_trace
+
+# Upper bound on updates that may be waiting inside the processor at once.
+MAX_PENDING_UPDATES = 10000
+
+
+def ordering_key(update: object) -> Optional[int]:
+    """Updates sharing a key are processed strictly in arrival order."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+def trace_attrs(update: object) -> Dict[str, Any]:
+    if not isinstance(update, Update):
+        return {"kind": type(update).__name__}
+    kind = next((key for key in ("message", "callback_query", "edited_message", "my_chat_member")
+                 if getattr(update, key, None) is not None), "other")
+    return {"kind": kind, "update_id": update.update_id,
+            "user_id": update.effective_user.id if update.effective_user else None}
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates from different users concurrently, each user in order.
+
+    The base class semaphore only caps how many updates may be pending; the
+    worker limit is applied after the per-user lock is taken, so a user with
+    a backlog of updates never occupies more than one worker.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int = MAX_PENDING_UPDATES):
+        super().__init__(max(max_workers, max_pending))
+        self.max_workers = max_workers
+        self._workers = asyncio.Semaphore(max_workers)
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._pending: Dict[int, int] = {}
+        # Tasks of updates running or waiting for their user's lock.
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def cancel_all(self) -> int:
+        """Cancel every update still in flight; returns how many there were."""
+        for task in self._tasks:
+            task.cancel()
+        return len(self._tasks)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        trace = start_trace()
+        if trace is not None:
+            annotate(**trace_attrs(update))
+        try:
+            await self._process_in_order(update, coroutine)
+        finally:
+            self._tasks.discard(task)
+            finish_trace(trace)
+
+    async def _process_in_order(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = ordering_key(update)
+        if key is None:
+            with span("wait_for_worker"):
+                await self._workers.acquire()
+            try:
+                await coroutine
+            finally:
+                self._workers.release()
+            return
+
+        lock = self._user_locks.get(key)
+        if lock is None:
+            lock = self._user_locks[key] = asyncio.Lock()
+        self._pending[key] = self._pending.get(key, 0) + 1
+        try:
+            # Waiting behind this user's earlier updates, then for a worker.
+            with span("wait_for_worker"):
+                await lock.acquire()
+                try:
+                    await self._workers.acquire()
+                except BaseException:
+                    lock.release()
+                    raise
+            try:
+                await coroutine
+            finally:
+                self._workers.release()
+                lock.release()
+        finally:
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+                del self._user_locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
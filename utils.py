@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """Small bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self._data.pop(key, default)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def idempotency_key(update, operation: str) -> Optional[str]:
+    """Build a stable key for a money-moving operation from a Telegram update.
+
+    Telegram re-delivers the same message (same chat and message id) after
+    polling restarts, so the key survives redelivery but differs for every
+    new tap by the user.
+    """
+    if update.callback_query is not None:
+        return f"{operation}:cbq:{update.callback_query.id}"
+    message = update.effective_message
+    if message is None:
+        return None
+    return f"{operation}:{message.chat_id}:{message.message_id}"
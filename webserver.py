@@ -0,0 +1,102 @@
+import hmac
+import json
+import logging
+
+from aiohttp import web
+from telegram import Update
+
+import metrics
+from database.database import db
+from games import GAMES
+from metrics import Counter, Gauge, collector, round_liability, round_stakes
+from middleware import stats, load_monitor
+from risk import exposure
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# aiohttp app keys for the objects the route handlers need.
+APPLICATION_KEY = web.AppKey("application", object)
+SECRET_KEY = web.AppKey("secret", object)
+
+
+async def telegram_webhook(request: web.Request) -> web.Response:
+    secret = request.app[SECRET_KEY]
+    # No secret configured means no way to tell Telegram from anyone else.
+    if not secret or not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+        return web.Response(status=403)
+
+    try:
+        data = json.loads(await request.read())
+    except ValueError:
+        return web.Response(status=400)
+
+    application = request.app[APPLICATION_KEY]
+    update = Update.de_json(data, application.bot)
+    # Hand off to the Application's queue and answer Telegram immediately;
+    # handlers run on the update processor, not inside this request.
+    await application.update_queue.put(update)
+    return web.Response()
+
+
+async def health(request: web.Request) -> web.Response:
+    application = request.app[APPLICATION_KEY]
+    body = {
+        "status": "ok" if application.running else "starting",
+        "db_pool_size": db.pool.get_size() if db.pool else 0,
+        "update_queue": application.update_queue.qsize(),
+        "pool_wait_ms": round(load_monitor.pool_wait_ms, 1),
+        "throttled": stats["throttled"],
+        "shed": stats["shed"],
+    }
+    return web.json_response(body)
+
+
+# Read when /metrics is scraped.
+Gauge("bot_db_pool_size", "Open database connections.", function=lambda: db.pool.get_size() if db.pool else 0)
+Gauge("bot_db_pool_idle", "Idle database connections.", function=lambda: db.pool.get_idle_size() if db.pool else 0)
+Gauge("bot_db_pool_acquire_wait_seconds", "Smoothed time to acquire a pool connection.",
+      function=lambda: load_monitor.pool_wait_ms / 1000)
+Gauge("bot_event_loop_lag_seconds", "How late a 0.5s sleep on the event loop wakes up.",
+      function=lambda: load_monitor.loop_lag_ms / 1000)
+Counter("bot_updates_throttled_total", "Updates dropped by flood control.", function=lambda: stats["throttled"])
+Counter("bot_updates_shed_total", "Updates answered busy by load shedding.", function=lambda: stats["shed"])
+
+
+@collector
+async def collect_round_stakes():
+    round_liability.clear()
+    for game_id in GAMES:
+        for side, liability in exposure.liabilities(game_id).items():
+            round_liability.set(float(liability), game_id, side)
+    round_stakes.clear()
+    if not db.pool:
+        return
+    for game_id in GAMES:
+        for side, total in (await db.get_side_totals(game_id)).items():
+            round_stakes.set(float(total or 0), game_id, side)
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(text=await metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+def create_web_app(application, webhook_path: str = None, secret: str = None) -> web.Application:
+    """/health and /metrics, plus the webhook route when `webhook_path` is given."""
+    app = web.Application()
+    app[APPLICATION_KEY] = application
+    app[SECRET_KEY] = secret
+    if webhook_path:
+        app.router.add_post(webhook_path, telegram_webhook)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+    return app
+
+
+async def start_web_server(web_app: web.Application, port: int, host: str = "0.0.0.0") -> web.AppRunner:
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("🌐 Web server listening", extra={"host": host, "port": port})
+    return runner